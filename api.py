@@ -1,14 +1,105 @@
-from fastapi import FastAPI, Depends, HTTPException
+import asyncio
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from database import get_db, Grievance, create_tables
-from typing import Optional
-import random
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import SessionLocal, get_db, create_tables
+from async_database import async_engine, create_tables_async, get_async_db
+from config import BULK_MAX_ITEMS, CHATBOT_WARMUP, LIST_MAX_LIMIT, STATUS_WORKER_ENABLED, WRITE_QUEUE_ENABLED, PROFILING_ENABLED, PROFILE_MAX_SECONDS
+from concurrency import ConcurrencyLimiter, Overloaded
+import metrics
+from profiler import profiler
+from status_worker import StatusProgressionWorker
+from status_cache import status_cache
+from write_queue import registration_writer
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+import json
+import services
 
-app = FastAPI(title="Grievance Management API")
+status_worker = StatusProgressionWorker()
 
-# Create tables on startup
-create_tables()
+# One chatbot shared by all /chat requests, built at startup (CHATBOT_WARMUP) or on first use
+_chatbot = None
+_chatbot_lock = asyncio.Lock()
+chat_limiter = ConcurrencyLimiter()
+
+async def warm_up_chatbot():
+    """Build the chatbot and load its models off the event loop; /chat retries lazily on failure"""
+    try:
+        chatbot = await load_chatbot()
+        timings = await run_in_threadpool(chatbot.warm_up)
+        print(f"Chatbot warmed up: {', '.join(f'{step} {seconds * 1000:.0f} ms' for step, seconds in timings.items())}")
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else e
+        print(f"Chatbot warm-up skipped: {detail}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema work runs here rather than at import, so importing the app stays cheap; the async
+    # engine repeats it (idempotent) to warm its pool
+    await run_in_threadpool(create_tables)
+    await create_tables_async()
+    if STATUS_WORKER_ENABLED:
+        status_worker.start()
+    if WRITE_QUEUE_ENABLED:
+        registration_writer.start()
+    if CHATBOT_WARMUP:
+        await warm_up_chatbot()
+    try:
+        yield
+    finally:
+        status_worker.stop()
+        # Commits whatever registrations are still queued before the engine goes away
+        registration_writer.stop()
+        if _chatbot is not None:
+            await _chatbot.aclose()
+        await async_engine.dispose()
+
+app = FastAPI(title="Grievance Management API", lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
+
+async def load_chatbot():
+    """The shared chatbot, built once and off the event loop (embedder, knowledge base and intent
+    model loads block for seconds); concurrent first requests wait for the same build"""
+    if _chatbot is None:
+        async with _chatbot_lock:
+            if _chatbot is None:
+                await run_in_threadpool(get_chatbot)
+    return _chatbot
+
+def get_chatbot():
+    global _chatbot
+    if _chatbot is None:
+        from async_chatbot import AsyncRAGChatbot, AsyncInProcessComplaintBackend
+        try:
+            _chatbot = AsyncRAGChatbot(backend=AsyncInProcessComplaintBackend())
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f"Chatbot unavailable: {e}")
+    return _chatbot
+
+metrics.stats_gauge("status_cache_stats", "Status response cache counters", status_cache.stats,
+                    ["entries", "hits", "misses", "evictions", "invalidations"])
+metrics.stats_gauge("write_queue_stats", "Group commit writer counters", registration_writer.stats,
+                    ["queued", "batches", "rows", "failed", "largest_batch"])
+metrics.stats_gauge("chat_limiter_stats", "POST /chat admission counters", lambda: chat_limiter.stats(),
+                    ["active", "waiting", "admitted", "queued", "rejected", "timed_out"])
+# The chatbot is built lazily; until then these report no samples
+metrics.stats_gauge("intent_classifier_stats", "Chat intents decided locally vs. by Gemini",
+                    lambda: _chatbot.intent_classifier.stats(), ["local_hits", "llm_hits", "local_ratio"])
+metrics.stats_gauge("session_store_stats", "Chat session store size and expiry/eviction counters",
+                    lambda: _chatbot.sessions.stats(), ["live_sessions", "approximate_bytes", "expired", "evicted"])
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        {"detail": str(exc)},
+        status_code=429,
+        headers={"Retry-After": str(int(exc.retry_after))}
+    )
 
 class GrievanceCreate(BaseModel):
     name: str
@@ -18,6 +109,8 @@ class GrievanceCreate(BaseModel):
 class GrievanceResponse(BaseModel):
     id: int
     message: str
+    # True when the complaint was linked to an existing open one from the same mobile
+    duplicate: bool = False
 
 class StatusResponse(BaseModel):
     complaint_id: int
@@ -27,63 +120,398 @@ class StatusResponse(BaseModel):
     status: str
     created_at: str
 
+class BulkGrievanceCreate(BaseModel):
+    complaints: List[GrievanceCreate] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+class BulkRegistrationItem(BaseModel):
+    index: int
+    id: Optional[int] = None
+    message: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkRegistrationResponse(BaseModel):
+    registered: int
+    failed: int
+    results: List[BulkRegistrationItem]
+
+class BatchStatusRequest(BaseModel):
+    complaint_ids: List[int] = Field(default_factory=list, max_length=BULK_MAX_ITEMS)
+    mobiles: List[str] = Field(default_factory=list, max_length=BULK_MAX_ITEMS)
+
+class BatchStatusItem(BaseModel):
+    complaint_id: Optional[int] = None
+    mobile: Optional[str] = None
+    found: bool
+    status: Optional[StatusResponse] = None
+
+class BatchStatusResponse(BaseModel):
+    results: List[BatchStatusItem]
+
+class SearchResult(BaseModel):
+    complaint_id: int
+    name: str
+    mobile: str
+    status: str
+    created_at: str
+    snippet: str
+    score: float
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+    next_cursor: Optional[str] = None
+
+class ComplaintListResponse(BaseModel):
+    results: List[StatusResponse]
+    next_cursor: Optional[str] = None
+
+class StatusTotalsResponse(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+
+class DailyCount(BaseModel):
+    day: str
+    total: int
+    by_status: Dict[str, int]
+
+class DailyCountsResponse(BaseModel):
+    results: List[DailyCount]
+
+class ChatRequest(BaseModel):
+    message: str = Field(..., min_length=1)
+    session_id: str = "default"
+
+class ChatResponse(BaseModel):
+    session_id: str
+    reply: str
+
 @app.post("/register_complaint", response_model=GrievanceResponse)
 def register_complaint(grievance: GrievanceCreate, db: Session = Depends(get_db)):
-    """Register a new grievance"""
-    db_grievance = Grievance(
+    """Register a new grievance, or link it to an open duplicate from the same mobile"""
+    db_grievance, is_duplicate = services.register_or_link_grievance(
+        db,
         name=grievance.name,
         mobile=grievance.mobile,
         complaint_details=grievance.complaint_details
     )
-    db.add(db_grievance)
-    db.commit()
-    db.refresh(db_grievance)
     
-    return GrievanceResponse(
-        id=db_grievance.id,
-        message=f"Complaint registered successfully with ID: {db_grievance.id}"
-    )
+    return GrievanceResponse(**services.registration_payload(db_grievance, is_duplicate))
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    candidates = [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+    return "*" in candidates or etag in candidates
+
+def _status_response(request: Request, payload: Dict, etag: str) -> Response:
+    """Full JSON response, or a bodyless 304 when the client already has this version"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
 
 @app.get("/complaint_status/{complaint_id}", response_model=StatusResponse)
-def get_complaint_status(complaint_id: int, db: Session = Depends(get_db)):
+def get_complaint_status(complaint_id: int, request: Request, db: Session = Depends(get_db)):
     """Get complaint status by ID"""
-    grievance = db.query(Grievance).filter(Grievance.id == complaint_id).first()
-    if not grievance:
-        raise HTTPException(status_code=404, detail="Complaint not found")
-    
-    # Simulate status progression
-    statuses = ["Registered", "In Progress", "Under Review", "Resolved", "Closed"]
-    if grievance.status == "Registered":
-        grievance.status = random.choice(["In Progress", "Under Review"])
-        db.commit()
-    
-    return StatusResponse(
-        complaint_id=grievance.id,
-        name=grievance.name,
-        mobile=grievance.mobile,
-        complaint_details=grievance.complaint_details,
-        status=grievance.status,
-        created_at=grievance.created_at.strftime("%Y-%m-%d %H:%M:%S")
-    )
+    key = ("id", complaint_id)
+    cached = status_cache.get(key)
+    if cached is None:
+        generation = status_cache.generation
+        grievance = services.get_grievance(db, complaint_id)
+        if not grievance:
+            raise HTTPException(status_code=404, detail="Complaint not found")
+        cached = status_cache.put(key, services.status_payload(grievance), generation)
+    
+    return _status_response(request, *cached)
 
-@app.get("/complaint_status_by_mobile/{mobile}")
-def get_complaint_by_mobile(mobile: str, db: Session = Depends(get_db)):
+@app.get("/complaint_status_by_mobile/{mobile}", response_model=StatusResponse)
+def get_complaint_by_mobile(mobile: str, request: Request, db: Session = Depends(get_db)):
     """Get latest complaint status by mobile number"""
-    grievance = db.query(Grievance).filter(
-        Grievance.mobile == mobile
-    ).order_by(Grievance.created_at.desc()).first()
+    key = ("mobile", mobile)
+    cached = status_cache.get(key)
+    if cached is None:
+        generation = status_cache.generation
+        grievance = services.get_latest_grievance_by_mobile(db, mobile)
+        if not grievance:
+            raise HTTPException(status_code=404, detail="No complaints found for this mobile number")
+        cached = status_cache.put(key, services.status_payload(grievance), generation)
     
-    if not grievance:
-        raise HTTPException(status_code=404, detail="No complaints found for this mobile number")
+    return _status_response(request, *cached)
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    """Status cache hit/miss/eviction counters for monitoring"""
+    return status_cache.stats()
+
+@app.post("/register_complaints", response_model=BulkRegistrationResponse)
+def register_complaints(batch: BulkGrievanceCreate, db: Session = Depends(get_db)):
+    """Register many grievances, one transaction per chunk, with per-item results"""
+    outcomes = services.register_grievances_bulk(db, [item.model_dump() for item in batch.complaints])
     
-    return StatusResponse(
-        complaint_id=grievance.id,
+    results = []
+    for index, outcome in enumerate(outcomes):
+        if "id" in outcome:
+            results.append(BulkRegistrationItem(
+                index=index,
+                id=outcome["id"],
+                message=services.registration_message(outcome["id"])
+            ))
+        else:
+            results.append(BulkRegistrationItem(index=index, error=outcome["error"]))
+    
+    registered = sum(1 for item in results if item.id is not None)
+    return BulkRegistrationResponse(registered=registered, failed=len(results) - registered, results=results)
+
+@app.post("/complaint_status/batch", response_model=BatchStatusResponse)
+def get_complaint_status_batch(request: BatchStatusRequest, db: Session = Depends(get_db)):
+    """Get statuses for many complaint IDs and/or mobile numbers with one IN query each"""
+    if len(request.complaint_ids) + len(request.mobiles) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} lookups per request")
+    
+    by_id = services.get_grievances_by_ids(db, request.complaint_ids)
+    by_mobile = services.get_latest_grievances_by_mobiles(db, request.mobiles)
+    
+    results = []
+    for complaint_id in request.complaint_ids:
+        grievance = by_id.get(complaint_id)
+        results.append(BatchStatusItem(
+            complaint_id=complaint_id,
+            found=grievance is not None,
+            status=StatusResponse(**services.status_payload(grievance)) if grievance else None
+        ))
+    for mobile in request.mobiles:
+        grievance = by_mobile.get(mobile)
+        results.append(BatchStatusItem(
+            mobile=mobile,
+            found=grievance is not None,
+            status=StatusResponse(**services.status_payload(grievance)) if grievance else None
+        ))
+    
+    return BatchStatusResponse(results=results)
+
+@app.get("/complaints/search", response_model=SearchResponse)
+def search_complaints(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find in complaint details; end a word with * for prefix matching"),
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    order: str = Query("rank", pattern="^(rank|newest)$"),
+    match: str = Query("all", pattern="^(all|any)$"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Full-text search over complaint details, ranked by bm25, with keyset pagination via next_cursor"""
+    try:
+        rows, next_cursor = services.search_grievances(
+            db, q, status=status, created_from=created_from, created_to=created_to,
+            order=order, match_any=match == "any", limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    results = [
+        SearchResult(
+            complaint_id=row["id"],
+            name=row["name"],
+            mobile=row["mobile"],
+            status=row["status"],
+            created_at=str(row["created_at"])[:19],
+            snippet=row["snippet"],
+            score=-row["score"]
+        )
+        for row in rows
+    ]
+    return SearchResponse(results=results, next_cursor=next_cursor)
+
+@app.get("/complaints", response_model=ComplaintListResponse)
+def list_complaints(
+    mobile: Optional[str] = None,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    order: str = Query("newest", pattern="^(newest|oldest)$"),
+    limit: int = Query(50, ge=1, le=LIST_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Complaints ordered by creation time, paged with next_cursor (keyset on created_at, id)"""
+    try:
+        grievances, next_cursor = services.list_grievances(
+            db, mobile=mobile, status=status, created_from=created_from, created_to=created_to,
+            order=order, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ComplaintListResponse(
+        results=[StatusResponse(**services.status_payload(grievance)) for grievance in grievances],
+        next_cursor=next_cursor
+    )
+
+@app.get("/complaints/export")
+def export_complaints(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    mobile: Optional[str] = None,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+):
+    """Stream every matching complaint, oldest first, as NDJSON or CSV"""
+    # The generator opens its own session: it outlives the request handler, and rows are
+    # fetched batch by batch while the body is being sent
+    body = services.export_grievances(
+        SessionLocal, fmt=format, mobile=mobile, status=status,
+        created_from=created_from, created_to=created_to
+    )
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"complaints.{'csv' if format == 'csv' else 'ndjson'}"
+    return StreamingResponse(
+        body, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def _check_date_range(date_from: Optional[date], date_to: Optional[date]) -> None:
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+
+@app.get("/stats", response_model=StatusTotalsResponse)
+def get_stats(date_from: Optional[date] = None, date_to: Optional[date] = None, db: Session = Depends(get_db)):
+    """Complaints created between date_from and date_to (inclusive), by current status"""
+    _check_date_range(date_from, date_to)
+    return StatusTotalsResponse(**services.status_totals(db, date_from=date_from, date_to=date_to))
+
+@app.get("/stats/daily", response_model=DailyCountsResponse)
+def get_daily_stats(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    status: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Complaints per creation day, by current status; read from the rollup table, not grievances"""
+    _check_date_range(date_from, date_to)
+    return DailyCountsResponse(
+        results=services.daily_counts(db, date_from=date_from, date_to=date_to, status=status)
+    )
+
+# Non-blocking versions of the endpoints above: they run on the event loop over the
+# aiosqlite engine instead of occupying a threadpool worker per request.
+
+@app.post("/async/register_complaint", response_model=GrievanceResponse)
+async def register_complaint_async(grievance: GrievanceCreate, db: AsyncSession = Depends(get_async_db)):
+    """Register a new grievance, or link it to an open duplicate (async)"""
+    db_grievance, is_duplicate = await services.register_or_link_grievance_async(
+        db,
         name=grievance.name,
         mobile=grievance.mobile,
-        complaint_details=grievance.complaint_details,
-        status=grievance.status,
-        created_at=grievance.created_at.strftime("%Y-%m-%d %H:%M:%S")
+        complaint_details=grievance.complaint_details
     )
+    
+    return GrievanceResponse(**services.registration_payload(db_grievance, is_duplicate))
+
+@app.get("/async/complaint_status/{complaint_id}", response_model=StatusResponse)
+async def get_complaint_status_async(complaint_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Get complaint status by ID (async)"""
+    key = ("id", complaint_id)
+    cached = status_cache.get(key)
+    if cached is None:
+        generation = status_cache.generation
+        grievance = await services.get_grievance_async(db, complaint_id)
+        if not grievance:
+            raise HTTPException(status_code=404, detail="Complaint not found")
+        cached = status_cache.put(key, services.status_payload(grievance), generation)
+    
+    return _status_response(request, *cached)
+
+@app.get("/async/complaint_status_by_mobile/{mobile}", response_model=StatusResponse)
+async def get_complaint_by_mobile_async(mobile: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Get latest complaint status by mobile number (async)"""
+    key = ("mobile", mobile)
+    cached = status_cache.get(key)
+    if cached is None:
+        generation = status_cache.generation
+        grievance = await services.get_latest_grievance_by_mobile_async(db, mobile)
+        if not grievance:
+            raise HTTPException(status_code=404, detail="No complaints found for this mobile number")
+        cached = status_cache.put(key, services.status_payload(grievance), generation)
+    
+    return _status_response(request, *cached)
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    """Send one message to the chatbot and get the whole reply"""
+    chatbot = await load_chatbot()
+    async with chat_limiter:
+        reply = await chatbot.chat(request.message, request.session_id)
+    return ChatResponse(session_id=request.session_id, reply=reply)
+
+class SlotStreamingResponse(StreamingResponse):
+    """StreamingResponse that frees its /chat slot however sending ends: body finished, client gone
+    before the body started (the generator's own finally would never run), or a send error"""
+    
+    def __init__(self, *args, release: Callable[[], None], **kwargs):
+        super().__init__(*args, **kwargs)
+        self._release = release
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
+def _sse(data: Dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Server-Sent Events variant of /chat: one `data: {"delta": ...}` event per chunk, then `event: done`"""
+    chatbot = await load_chatbot()
+    # Take the slot before responding so an overloaded server still answers 429, not a broken stream
+    await chat_limiter.acquire()
+    
+    async def events() -> AsyncIterator[str]:
+        async for chunk in chatbot.chat_stream(request.message, request.session_id):
+            yield _sse({"delta": chunk})
+        yield _sse({"session_id": request.session_id}, event="done")
+    
+    try:
+        return SlotStreamingResponse(
+            events(),
+            release=chat_limiter.release,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    except BaseException:
+        chat_limiter.release()
+        raise
+
+@app.get("/chat/stats")
+def get_chat_stats():
+    """Admission, coalescing, batching and streaming latency counters for /chat"""
+    stats = {"limiter": chat_limiter.stats()}
+    if _chatbot is not None:
+        stats["coalesced_llm_calls"] = _chatbot.model.coalesced
+        stats["streaming"] = _chatbot.stream_stats()
+        stats["batching"] = _chatbot.batching_stats()
+    return stats
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus scrape endpoint: stage, LLM, DB and HTTP latency histograms and counters"""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.post("/debug/profile", response_class=PlainTextResponse)
+def run_profiler(seconds: float = 10.0):
+    """Sample every thread's stack for `seconds` and return collapsed stacks (flamegraph input)"""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=422, detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS}]")
+    try:
+        return PlainTextResponse(profiler.profile(seconds))
+    except RuntimeError:
+        raise HTTPException(status_code=409, detail="A profile is already being taken")
 
 if __name__ == "__main__":
     import uvicorn
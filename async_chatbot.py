@@ -0,0 +1,326 @@
+import asyncio
+import time
+from functools import partial
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional
+
+from config import (
+    API_BASE_URL,
+    API_TIMEOUT,
+    API_MAX_CONNECTIONS,
+    API_MAX_KEEPALIVE_CONNECTIONS,
+    BOT_RESPONSES,
+    CHATBOT_BACKEND,
+)
+from rag_chatbot import (
+    SimpleRAGChatbot,
+    InProcessComplaintBackend,
+    DETAILS_REPROMPT,
+    REGISTRATION_SLOTS,
+    REGISTRATION_START_PROMPT,
+    STATUS_MISSING_PROMPT,
+    build_intent_batch_prompt,
+    parse_intent,
+    parse_intent_batch,
+    format_status_result,
+    format_registration_result,
+)
+from batching import MicroBatcher
+from llm_client import report_llm_failure
+from session_store import SessionRecord
+from metrics import STAGE_SECONDS, TTFT_SECONDS, timed
+
+if TYPE_CHECKING:
+    import httpx
+
+
+class AsyncHTTPComplaintBackend:
+    """Calls the grievance API through one pooled, keep-alive httpx.AsyncClient"""
+
+    def __init__(self, client: Optional["httpx.AsyncClient"] = None):
+        # httpx is only needed for the HTTP backend; importing it eagerly slows every startup
+        import httpx
+
+        self.client = client or httpx.AsyncClient(
+            base_url=API_BASE_URL,
+            timeout=httpx.Timeout(API_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=API_MAX_CONNECTIONS,
+                max_keepalive_connections=API_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        )
+
+    async def register_complaint(self, name: str, mobile: str, complaint_details: str) -> Dict:
+        """Call API to register complaint over the pooled client"""
+        try:
+            response = await self.client.post(
+                "/register_complaint",
+                json={
+                    "name": name,
+                    "mobile": mobile,
+                    "complaint_details": complaint_details
+                }
+            )
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {"error": "Failed to register complaint"}
+        except Exception as e:
+            return {"error": f"API call failed: {str(e)}"}
+
+    async def get_complaint_status(self, mobile: str = None, complaint_id: int = None) -> Dict:
+        """Call API to get complaint status over the pooled client"""
+        try:
+            if complaint_id:
+                response = await self.client.get(f"/complaint_status/{complaint_id}")
+            elif mobile:
+                response = await self.client.get(f"/complaint_status_by_mobile/{mobile}")
+            else:
+                return {"error": "Either mobile number or complaint ID is required"}
+
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {"error": "Complaint not found"}
+        except Exception as e:
+            return {"error": f"API call failed: {str(e)}"}
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class AsyncInProcessComplaintBackend:
+    """Runs the in-process backend on the default executor so SQLite I/O doesn't block the loop"""
+
+    def __init__(self, backend: Optional[InProcessComplaintBackend] = None):
+        self.backend = backend or InProcessComplaintBackend()
+
+    async def register_complaint(self, name: str, mobile: str, complaint_details: str) -> Dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, partial(self.backend.register_complaint, name, mobile, complaint_details)
+        )
+
+    async def get_complaint_status(self, mobile: str = None, complaint_id: int = None) -> Dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, partial(self.backend.get_complaint_status, mobile=mobile, complaint_id=complaint_id)
+        )
+
+    def warm_up(self) -> None:
+        self.backend.warm_up()
+
+    async def aclose(self) -> None:
+        pass
+
+
+def make_async_backend(kind: str = CHATBOT_BACKEND, client: Optional["httpx.AsyncClient"] = None):
+    """Async counterpart of rag_chatbot.make_backend"""
+    if kind == "http":
+        return AsyncHTTPComplaintBackend(client)
+    if kind == "inprocess":
+        return AsyncInProcessComplaintBackend()
+    raise ValueError(f"Unknown chatbot backend: {kind}")
+
+
+class AsyncRAGChatbot(SimpleRAGChatbot):
+    """Coroutine-based chatbot: async Gemini calls and a non-blocking complaint backend.
+
+    Use as ``async with AsyncRAGChatbot() as bot: reply = await bot.chat(...)`` or call
+    ``aclose()`` on shutdown so pooled connections are released.
+    """
+
+    def __init__(self, backend=None, client: Optional["httpx.AsyncClient"] = None, sessions=None, model=None):
+        super().__init__(backend=backend or make_async_backend(client=client), sessions=sessions, model=model)
+        self.intent_batcher = MicroBatcher("intent", run_batch_async=self._classify_batch_async)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.backend.aclose()
+
+    @staticmethod
+    async def _run_blocking(func, *args):
+        """Run retrieval (embedding + matrix product) or session store I/O on the default executor"""
+        return await asyncio.get_running_loop().run_in_executor(None, partial(func, *args))
+
+    @timed("intent")
+    async def _classify_intent(self, user_message: str) -> str:
+        """Classify user intent locally, falling back to async Gemini for low-confidence messages"""
+        intent = self.intent_classifier.classify(user_message)
+        if intent:
+            return intent
+
+        try:
+            return await self.intent_batcher.submit_async(user_message)
+        except Exception as e:
+            report_llm_failure("intent", e)
+            return self._fallback_intent(user_message)
+
+    async def _classify_batch_async(self, messages: List[str]) -> List:
+        """Async counterpart of _classify_batch"""
+        if len(messages) == 1:
+            prompt = await self._run_blocking(self._intent_prompt, messages[0])
+            response = await self.model.generate_content_async(prompt)
+            return [parse_intent(response.text)]
+        contexts = await self._run_blocking(self._get_relevant_contexts, messages)
+        prompt = build_intent_batch_prompt(messages, contexts)
+        response = await self.model.generate_content_async(prompt)
+        return parse_intent_batch(response.text, len(messages))
+
+    @timed("answer")
+    async def _generate_answer(self, user_message: str) -> str:
+        """Answer a message that isn't a registration or status request"""
+        prompt = await self._run_blocking(self._answer_prompt, user_message)
+        try:
+            response = await self.model.generate_content_async(prompt)
+            return response.text.strip() or BOT_RESPONSES["unknown"]
+        except Exception as e:
+            report_llm_failure("answer", e)
+            return await self._run_blocking(self._fallback_answer, user_message)
+
+    async def _generate_answer_stream(self, user_message: str) -> AsyncIterator[str]:
+        """Yield answer text chunks as Gemini streams them"""
+        produced = False
+        prompt = await self._run_blocking(self._answer_prompt, user_message)
+        try:
+            response = await self.model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                text = chunk.text
+                if text:
+                    produced = True
+                    yield text
+        except Exception as e:
+            report_llm_failure("answer", e)
+            if not produced:
+                yield await self._run_blocking(self._fallback_answer, user_message)
+                return
+        if not produced:
+            yield BOT_RESPONSES["unknown"]
+
+    @timed("extraction")
+    async def _extract_information(self, user_message: str, slots: List[str], expect: Optional[str] = None,
+                                   need_all: bool = True) -> Dict:
+        """Extract slots with local extractors, then one async Gemini call for the rest"""
+        return await self.slot_extractor.extract_async(user_message, slots, expect=expect, need_all=need_all)
+
+    @timed("api_register")
+    async def _register_complaint_api(self, name: str, mobile: str, complaint_details: str) -> Dict:
+        """Register a complaint through the configured async backend"""
+        return await self.backend.register_complaint(name, mobile, complaint_details)
+
+    @timed("api_status")
+    async def _get_complaint_status_api(self, mobile: str = None, complaint_id: int = None) -> Dict:
+        """Look up complaint status through the configured async backend"""
+        return await self.backend.get_complaint_status(mobile=mobile, complaint_id=complaint_id)
+
+    @timed("turn")
+    async def chat(self, user_message: str, session_id: str = "default") -> str:
+        """Main chat coroutine"""
+        session = await self._run_blocking(self.sessions.get, session_id)
+        try:
+            return await self._respond(user_message, session)
+        finally:
+            await self._run_blocking(self.sessions.save, session)
+
+    async def chat_stream(self, user_message: str, session_id: str = "default") -> AsyncIterator[str]:
+        """Async generator counterpart of SimpleRAGChatbot.chat_stream"""
+        started = time.perf_counter()
+        first_chunk = None
+        session = await self._run_blocking(self.sessions.get, session_id)
+        try:
+            async for chunk in self._respond_stream(user_message, session):
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - started
+                yield chunk
+        finally:
+            await self._run_blocking(self.sessions.save, session)
+            if first_chunk is not None:
+                elapsed = time.perf_counter() - started
+                self.stream_timings.append((first_chunk, elapsed))
+                TTFT_SECONDS.observe(first_chunk)
+                STAGE_SECONDS.observe(elapsed, stage="turn")
+
+    async def _respond_stream(self, user_message: str, session: SessionRecord) -> AsyncIterator[str]:
+        if session.registration is not None:
+            yield await self._handle_complaint_registration(user_message, session)
+            return
+
+        intent = await self._classify_intent(user_message)
+        if intent == "unknown" and self.llm_answers:
+            async for chunk in self._generate_answer_stream(user_message):
+                yield chunk
+        else:
+            yield await self._respond(user_message, session, intent)
+
+    async def _respond(self, user_message: str, session: SessionRecord, intent: Optional[str] = None) -> str:
+        """Produce the reply for one turn, updating the session record in place"""
+        if session.registration is not None:
+            return await self._handle_complaint_registration(user_message, session)
+
+        if intent is None:
+            intent = await self._classify_intent(user_message)
+
+        if intent == "greeting":
+            return BOT_RESPONSES["greeting"]
+
+        elif intent == "complaint_registration":
+            registration = await self._extract_information(user_message, REGISTRATION_SLOTS)
+            session.registration = registration
+            if not registration:
+                registration["step"] = "name"
+                return REGISTRATION_START_PROMPT
+            return await self._continue_registration(session)
+
+        elif intent == "status_inquiry":
+            found = await self._extract_information(user_message, ["complaint_id", "mobile"], need_all=False)
+            mobile = found.get("mobile")
+            complaint_id = found.get("complaint_id")
+
+            if mobile or complaint_id:
+                result = await self._get_complaint_status_api(mobile=mobile, complaint_id=complaint_id)
+                return format_status_result(result)
+            else:
+                return STATUS_MISSING_PROMPT
+
+        elif self.llm_answers:
+            return await self._generate_answer(user_message)
+
+        else:
+            return BOT_RESPONSES["unknown"]
+
+    async def _handle_complaint_registration(self, user_message: str, session: SessionRecord) -> str:
+        """Handle the complaint registration flow"""
+        registration = session.registration
+        step = registration["step"]
+        if step == "complaint_details" and not self._is_complaint_description(user_message):
+            return DETAILS_REPROMPT
+
+        missing = [slot for slot in REGISTRATION_SLOTS if slot not in registration]
+        registration.update(await self._extract_information(user_message, missing, expect=step))
+
+        retry_prompt = self._registration_retry_prompt(registration, step, user_message)
+        if retry_prompt:
+            return retry_prompt
+        return await self._continue_registration(session)
+
+    async def _continue_registration(self, session: SessionRecord) -> str:
+        """Ask for the next missing slot, or register once everything is collected"""
+        registration = session.registration
+        prompt = self._next_registration_prompt(registration)
+        if prompt:
+            return prompt
+
+        # Clear before awaiting so a concurrent turn in the same session can't register twice
+        session.registration = None
+
+        result = await self._register_complaint_api(
+            name=registration["name"],
+            mobile=registration["mobile"],
+            complaint_details=registration["complaint_details"]
+        )
+
+        return format_registration_result(result, registration)
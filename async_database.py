@@ -0,0 +1,32 @@
+import os
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from config import ASYNC_DB_POOL_SIZE, ASYNC_DB_MAX_OVERFLOW
+from database import DATABASE_URL, Base, apply_migrations, apply_sqlite_pragmas, pool_args
+from metrics import instrument_engine
+
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL", DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **pool_args(ASYNC_DATABASE_URL, ASYNC_DB_POOL_SIZE, ASYNC_DB_MAX_OVERFLOW, poolclass=AsyncAdaptedQueuePool),
+)
+
+if async_engine.dialect.name == "sqlite":
+    event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+instrument_engine(async_engine.sync_engine, "async")
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+async def create_tables_async():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(apply_migrations)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,188 @@
+"""Micro-batching: concurrent requests that arrive within a short window share one LLM call.
+
+Callers submit one item and get back that item's result. Whoever opens a batch waits up to
+`window` seconds (less if `max_batch` items arrive first), then makes one call for every item
+collected and fans the per-item results out. A caller with no other submitter in flight doesn't
+wait: batches only form under concurrency, so an idle service pays no window. A result that is
+an exception is raised in the caller that submitted that item only.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from config import LLM_BATCH_MAX_SIZE, LLM_BATCH_WINDOW
+from metrics import LLM_BATCH_SIZE
+
+
+class _Batch:
+    __slots__ = ("items", "results", "done", "full")
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.results: Optional[List[Any]] = None
+        self.done = threading.Event()
+        self.full = threading.Event()
+
+
+class _AsyncBatch:
+    __slots__ = ("items", "futures", "timer")
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.futures: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatcher:
+    """Groups submit() calls from threads, or submit_async() calls on an event loop, into batch calls.
+
+    `run_batch(items)` / `run_batch_async(items)` return one result per item, in order. With
+    window <= 0 or max_batch <= 1 every item is sent on its own.
+    """
+
+    def __init__(self, kind: str, run_batch: Optional[Callable[[List], Sequence]] = None,
+                 run_batch_async: Optional[Callable[[List], Awaitable[Sequence]]] = None,
+                 window: float = LLM_BATCH_WINDOW, max_batch: int = LLM_BATCH_MAX_SIZE):
+        self.kind = kind
+        self.run_batch = run_batch
+        self.run_batch_async = run_batch_async
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.items = 0
+        self.full_batches = 0
+        self.largest_batch = 0
+        self._pending: Optional[_Batch] = None
+        self._async_pending: Dict[asyncio.AbstractEventLoop, _AsyncBatch] = {}
+        # Submitters between submit() and their result, including those whose batch is running
+        self._active = 0
+        self._async_active: Dict[asyncio.AbstractEventLoop, int] = {}
+        self._tasks = set()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_batch > 1
+
+    def _record(self, size: int) -> None:
+        with self._lock:
+            self.batches += 1
+            self.items += size
+            self.largest_batch = max(self.largest_batch, size)
+            if size >= self.max_batch > 1:
+                self.full_batches += 1
+        LLM_BATCH_SIZE.observe(size, kind=self.kind)
+
+    def _results(self, items: List, results: Sequence) -> List:
+        if len(results) != len(items):
+            raise ValueError(f"{self.kind} batch returned {len(results)} results for {len(items)} items")
+        return list(results)
+
+    @staticmethod
+    def _unwrap(result):
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    def submit(self, item):
+        if not self.enabled:
+            self._record(1)
+            return self._unwrap(self._results([item], self.run_batch([item]))[0])
+
+        with self._lock:
+            self._active += 1
+            alone = self._active == 1
+            batch = self._pending
+            leader = batch is None
+            if leader:
+                batch = self._pending = _Batch()
+            index = len(batch.items)
+            batch.items.append(item)
+            if len(batch.items) >= self.max_batch:
+                # Closed: the next submitter opens a new batch
+                self._pending = None
+                batch.full.set()
+
+        try:
+            if leader:
+                if not alone:
+                    batch.full.wait(self.window)
+                with self._lock:
+                    if self._pending is batch:
+                        self._pending = None
+                self._run(batch)
+            else:
+                batch.done.wait()
+            return self._unwrap(batch.results[index])
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def _run(self, batch: _Batch) -> None:
+        self._record(len(batch.items))
+        try:
+            batch.results = self._results(batch.items, self.run_batch(batch.items))
+        except Exception as e:
+            batch.results = [e] * len(batch.items)
+        finally:
+            batch.done.set()
+
+    async def submit_async(self, item):
+        if not self.enabled:
+            self._record(1)
+            return self._unwrap(self._results([item], await self.run_batch_async([item]))[0])
+
+        loop = asyncio.get_running_loop()
+        active = self._async_active
+        active[loop] = active.get(loop, 0) + 1
+        try:
+            batch = self._async_pending.get(loop)
+            if batch is None:
+                batch = self._async_pending[loop] = _AsyncBatch()
+                # Alone on this loop: flush on the next iteration, so only same-tick submitters join
+                delay = self.window if active[loop] > 1 else 0
+                batch.timer = loop.call_later(delay, self._flush_async, loop, batch)
+            future = loop.create_future()
+            batch.items.append(item)
+            batch.futures.append(future)
+            if len(batch.items) >= self.max_batch:
+                batch.timer.cancel()
+                self._flush_async(loop, batch)
+            return self._unwrap(await future)
+        finally:
+            active[loop] -= 1
+            if not active[loop]:
+                del active[loop]
+
+    def _flush_async(self, loop: asyncio.AbstractEventLoop, batch: _AsyncBatch) -> None:
+        if self._async_pending.get(loop) is batch:
+            del self._async_pending[loop]
+        task = loop.create_task(self._run_async(batch))
+        # The loop only keeps weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_async(self, batch: _AsyncBatch) -> None:
+        self._record(len(batch.items))
+        try:
+            results = self._results(batch.items, await self.run_batch_async(batch.items))
+        except Exception as e:
+            results = [e] * len(batch.items)
+        for future, result in zip(batch.futures, results):
+            # Callers that gave up (cancelled) just don't get their result
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict:
+        """Batching efficiency: items per upstream call, and calls saved by batching"""
+        with self._lock:
+            return {
+                "window_ms": self.window * 1000,
+                "max_batch": self.max_batch,
+                "batches": self.batches,
+                "items": self.items,
+                "items_per_batch": self.items / self.batches if self.batches else 0.0,
+                "calls_saved": self.items - self.batches,
+                "full_batches": self.full_batches,
+                "largest_batch": self.largest_batch,
+            }
@@ -0,0 +1,61 @@
+"""Bulk vs. per-row endpoint benchmark: python -m benchmarks.bench_bulk --rows 5000
+
+Runs api.py in-process against a throwaway SQLite database.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+    from fastapi.testclient import TestClient
+    from api import app
+
+    client = TestClient(app)
+    rng = random.Random(0)
+    complaints = [
+        {
+            "name": f"User {i}",
+            "mobile": f"9{rng.randint(100000000, 999999999)}",
+            "complaint_details": "Laptop screen is flickering",
+        }
+        for i in range(args.rows)
+    ]
+
+    start = time.perf_counter()
+    ids = [client.post("/register_complaint", json=item).json()["id"] for item in complaints]
+    per_row_register = time.perf_counter() - start
+
+    start = time.perf_counter()
+    response = client.post("/register_complaints", json={"complaints": complaints}).json()
+    bulk_register = time.perf_counter() - start
+    assert response["registered"] == args.rows
+
+    start = time.perf_counter()
+    for complaint_id in ids:
+        client.get(f"/complaint_status/{complaint_id}")
+    per_row_status = time.perf_counter() - start
+
+    start = time.perf_counter()
+    client.post("/complaint_status/batch", json={"complaint_ids": ids})
+    batch_status = time.perf_counter() - start
+
+    print(f"Register {args.rows} rows:  per-row {per_row_register:.2f}s "
+          f"({args.rows / per_row_register:.0f}/s), bulk {bulk_register:.2f}s "
+          f"({args.rows / bulk_register:.0f}/s)")
+    print(f"Status of {args.rows} IDs: per-row {per_row_status:.2f}s "
+          f"({args.rows / per_row_status:.0f}/s), batch {batch_status:.2f}s "
+          f"({args.rows / batch_status:.0f}/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Duplicate-check latency at scale: python -m benchmarks.bench_duplicates --rows 200000
+
+Builds a throwaway database and complaint vector store (hashing embedder), then times the
+duplicate check done at registration (candidate query + embedding + memory-mapped vector
+lookup) and a cold start of the store from disk.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.bench_retrieval import WORDS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--mobiles", type=int, default=50_000)
+    parser.add_argument("--checks", type=int, default=1000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from database import SessionLocal, create_tables, engine
+    from duplicates import DuplicateDetector
+    from retrieval import HashingEmbedder
+
+    create_tables()
+    rng = random.Random(0)
+    mobiles = [f"9{n:09d}" for n in rng.sample(range(10 ** 9), args.mobiles)]
+    now = datetime.utcnow()
+
+    raw = engine.raw_connection()
+    raw.executemany(
+        "INSERT INTO grievances (name, mobile, complaint_details, status, created_at) VALUES (?, ?, ?, ?, ?)",
+        (
+            (f"User {i}", rng.choice(mobiles), " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16))),
+             "Registered", now - timedelta(seconds=rng.randint(0, 30 * 24 * 3600)))
+            for i in range(args.rows)
+        ),
+    )
+    raw.commit()
+    raw.close()
+
+    store_dir = os.path.join(workdir, "complaints")
+    detector = DuplicateDetector(embedder=HashingEmbedder(), directory=store_dir)
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        detector.index_existing(db)
+    print(f"Embedded {len(detector.store)} complaints in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    detector = DuplicateDetector(embedder=HashingEmbedder(), directory=store_dir)
+    print(f"Reopened store in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    latencies = []
+    with SessionLocal() as db:
+        for _ in range(args.checks):
+            mobile = rng.choice(mobiles)
+            text = " ".join(rng.choice(WORDS) for _ in range(10))
+            start = time.perf_counter()
+            detector.match(db.execute(detector.candidates_query(mobile)).all(), detector.embed(text))
+            latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(f"Duplicate check: p50 {statistics.median(latencies):.3f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.3f} ms over {args.checks} checks")
+
+
+if __name__ == "__main__":
+    main()
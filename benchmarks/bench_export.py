@@ -0,0 +1,65 @@
+"""Streaming export memory and throughput: python -m benchmarks.bench_export --rows 1000000
+
+Builds a throwaway database, then drains export_grievances (NDJSON and CSV) twice and the first
+pages of list_grievances, reporting rows/s and the peak Python heap (tracemalloc), which
+should stay flat as --rows grows.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from benchmarks.bench_retrieval import WORDS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+    from database import SessionLocal, create_tables, engine
+    from services import export_grievances, list_grievances
+
+    create_tables()
+    rng = random.Random(0)
+    epoch = datetime(2024, 1, 1)
+    raw = engine.raw_connection()
+    raw.executemany(
+        "INSERT INTO grievances (name, mobile, complaint_details, status, created_at) VALUES (?, ?, ?, ?, ?)",
+        (
+            (f"User {i}", f"9{rng.randrange(10 ** 9):09d}", " ".join(rng.choice(WORDS) for _ in range(12)),
+             "Registered", (epoch + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S.%f"))
+            for i in range(args.rows)
+        ),
+    )
+    raw.commit()
+    raw.close()
+
+    for fmt in ("ndjson", "csv"):
+        start = time.perf_counter()
+        size = sum(len(chunk) for chunk in export_grievances(SessionLocal, fmt=fmt))
+        elapsed = time.perf_counter() - start
+        # Second pass for memory: tracemalloc slows allocation-heavy code severalfold
+        tracemalloc.start()
+        for _ in export_grievances(SessionLocal, fmt=fmt):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"export {fmt:<6} {args.rows / elapsed:10,.0f} rows/s, {size / 2 ** 20:7.1f} MiB out, "
+              f"peak heap {peak / 2 ** 20:.1f} MiB")
+
+    with SessionLocal() as db:
+        cursor = None
+        start = time.perf_counter()
+        for _ in range(100):
+            _, cursor = list_grievances(db, limit=100, cursor=cursor)
+        print(f"list_grievances: {(time.perf_counter() - start) * 10:.2f} ms per page over 100 pages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Latest-complaint-by-mobile latency at scale: python -m benchmarks.bench_mobile_lookup --rows 1000000
+
+Builds a throwaway SQLite database, then times get_latest_grievance_by_mobile
+with the (mobile, created_at DESC) index and again after dropping it.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def _time_lookups(session_factory, mobiles, lookup) -> list:
+    latencies = []
+    with session_factory() as db:
+        for mobile in mobiles:
+            start = time.perf_counter()
+            lookup(db, mobile)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def _report(label: str, latencies: list) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label}: p50 {statistics.median(latencies):.3f} ms, p95 {p95:.3f} ms over {len(latencies)} lookups")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--mobiles", type=int, default=200_000, help="distinct mobile numbers")
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from database import SessionLocal, create_tables, engine
+    from services import get_latest_grievance_by_mobile
+
+    create_tables()
+    rng = random.Random(0)
+    mobiles = [f"9{n:09d}" for n in rng.sample(range(10 ** 9), args.mobiles)]
+    epoch = datetime(2024, 1, 1)
+
+    start = time.perf_counter()
+    raw = engine.raw_connection()
+    raw.executemany(
+        "INSERT INTO grievances (name, mobile, complaint_details, status, created_at) VALUES (?, ?, ?, ?, ?)",
+        (
+            (f"User {i}", rng.choice(mobiles), "Laptop screen is flickering", "Registered",
+             epoch + timedelta(seconds=rng.randint(0, 365 * 24 * 3600)))
+            for i in range(args.rows)
+        ),
+    )
+    raw.commit()
+    raw.close()
+    print(f"Inserted {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+    sample = [rng.choice(mobiles) for _ in range(args.lookups)]
+    _report("Indexed  ", _time_lookups(SessionLocal, sample, get_latest_grievance_by_mobile))
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_grievances_mobile_created_at")
+    _report("No index ", _time_lookups(SessionLocal, sample[:20], get_latest_grievance_by_mobile))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Registration throughput under concurrency: python -m benchmarks.bench_registration --threads 32
+
+Registers complaints from many threads against a throwaway SQLite database, first with one
+commit per registration, then through the group commit writer (WRITE_QUEUE_*), and checks
+that every acknowledged ID is in the database. Then checks that an async caller cancelled while
+its batch is open doesn't fail the other callers in that batch.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+
+def run(register, threads: int, per_thread: int):
+    latencies = []
+    ids = []
+    lock = threading.Lock()
+
+    def worker(n: int):
+        local_latencies, local_ids = [], []
+        for i in range(per_thread):
+            start = time.perf_counter()
+            local_ids.append(register(f"User {n}-{i}", f"9{n:04d}{i:05d}", "Laptop screen is flickering").id)
+            local_latencies.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local_latencies)
+            ids.extend(local_ids)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return ids, {
+        "per_second": round(len(ids) / elapsed),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+async def check_cancellation(writer, callers: int = 5, cancel_after: float = 0.0):
+    """Cancel one of `callers` concurrent registrations; the rest must get committed IDs"""
+    tasks = [
+        asyncio.ensure_future(writer.register_async(f"Cancel {i}", f"8{i:09d}", "Keyboard keys not working"))
+        for i in range(callers)
+    ]
+    await asyncio.sleep(cancel_after)
+    tasks[callers // 2].cancel()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    others = [result for i, result in enumerate(results) if i != callers // 2]
+    failures = [repr(result) for result in others if isinstance(result, BaseException)]
+    return [result.id for result in others if not isinstance(result, BaseException)], failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--per-thread", type=int, default=200)
+    parser.add_argument("--max-latency-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=256)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["WRITE_QUEUE_ENABLED"] = "true"
+    os.environ["DUPLICATE_DETECTION_ENABLED"] = "false"
+
+    import services
+    from database import SessionLocal, create_tables, engine
+    from write_queue import registration_writer
+
+    create_tables()
+
+    def register(name, mobile, details):
+        with SessionLocal() as db:
+            return services.register_grievance(db, name, mobile, details)
+
+    _, direct = run(register, args.threads, args.per_thread)
+    print(f"Commit per registration: {direct}")
+
+    for synchronous in ("NORMAL", "FULL"):
+        registration_writer.max_latency = args.max_latency_ms / 1000
+        registration_writer.max_batch = args.max_batch
+        registration_writer.synchronous = synchronous
+        registration_writer.batches = registration_writer.rows = 0
+        registration_writer.start()
+        ids, grouped = run(register, args.threads, args.per_thread)
+        registration_writer.stop()
+        stats = registration_writer.stats()
+        with engine.connect() as conn:
+            stored = conn.exec_driver_sql(
+                f"SELECT COUNT(*) FROM grievances WHERE id IN ({','.join(map(str, ids))})"
+            ).scalar()
+        print(f"Group commit (synchronous={synchronous}): {grouped}, "
+              f"{stats['rows_per_batch']:.1f} rows/commit, {stored}/{len(ids)} acknowledged IDs stored")
+
+    # A long window keeps the batch open while one caller is cancelled, before or after the
+    # writer has taken its row
+    registration_writer.max_latency = 0.05
+    registration_writer.start()
+    failed = 0
+    for cancel_after in (0.0, 0.01):
+        ids, failures = asyncio.run(check_cancellation(registration_writer, cancel_after=cancel_after))
+        with engine.connect() as conn:
+            stored = conn.exec_driver_sql(
+                f"SELECT COUNT(*) FROM grievances WHERE id IN ({','.join(map(str, ids)) or 'NULL'})"
+            ).scalar()
+        print(f"Cancelled caller after {cancel_after * 1000:.0f} ms: {len(ids)} other callers acknowledged "
+              f"({stored} stored), {len(failures)} failed {failures[:1]}")
+        failed += len(failures) + len(ids) - stored
+    registration_writer.stop()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Retrieval latency benchmark: python -m benchmarks.bench_retrieval --passages 50000"""
+import argparse
+import random
+import time
+
+from retrieval import HashingEmbedder, VectorIndex
+
+WORDS = ("laptop battery screen keyboard overheating slow crash wifi charger display "
+         "software update driver boot fan noise touchpad speaker warranty repair "
+         "replacement refund status complaint register mobile flicker bluetooth").split()
+
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--passages", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    index = VectorIndex(HashingEmbedder())
+    start = time.perf_counter()
+    index.add([_sentence(rng) for _ in range(args.passages)])
+    print(f"Indexed {len(index)} passages in {time.perf_counter() - start:.2f}s")
+
+    queries = [_sentence(rng) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query, top_k=args.top_k)
+    single = (time.perf_counter() - start) / len(queries)
+    print(f"Single query:  {single * 1000:.3f} ms/query")
+
+    start = time.perf_counter()
+    for i in range(0, len(queries), args.batch):
+        index.search_batch(queries[i:i + args.batch], top_k=args.top_k)
+    batched = (time.perf_counter() - start) / len(queries)
+    print(f"Batched ({args.batch}): {batched * 1000:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
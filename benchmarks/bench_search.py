@@ -0,0 +1,83 @@
+"""Full-text complaint search latency at scale: python -m benchmarks.bench_search --rows 1000000
+
+Builds a throwaway SQLite database (the FTS triggers index rows as they are inserted), then
+times search_grievances for rare and common terms, first page and a deep keyset page, and
+compares with a LIKE scan.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.bench_retrieval import WORDS
+
+
+def _time(label: str, func, runs: int) -> None:
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{label:<34} p50 {statistics.median(latencies):8.2f} ms, p95 {p95:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from sqlalchemy import text
+
+    from database import SessionLocal, create_tables, engine
+    from services import search_grievances
+
+    create_tables()
+    rng = random.Random(0)
+    epoch = datetime(2024, 1, 1)
+    statuses = ["Registered", "In Progress", "Under Review", "Resolved"]
+
+    start = time.perf_counter()
+    raw = engine.raw_connection()
+    raw.executemany(
+        "INSERT INTO grievances (name, mobile, complaint_details, status, created_at) VALUES (?, ?, ?, ?, ?)",
+        (
+            (f"User {i}", f"9{rng.randrange(10 ** 9):09d}",
+             " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16))) + f" ref{i}",
+             rng.choice(statuses), epoch + timedelta(seconds=rng.randint(0, 365 * 24 * 3600)))
+            for i in range(args.rows)
+        ),
+    )
+    raw.commit()
+    raw.close()
+    print(f"Inserted and indexed {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+    with SessionLocal() as db:
+        rare = f"ref{args.rows // 2}"
+        _time(f"rare term ({rare})", lambda: search_grievances(db, rare), args.runs)
+        _time("common term, newest first", lambda: search_grievances(db, "battery", order="newest"), args.runs)
+        _time("two terms, newest, status filter",
+              lambda: search_grievances(db, "battery overheating", status="Resolved", order="newest"), args.runs)
+
+        cursor = None
+        for _ in range(50):
+            _, cursor = search_grievances(db, "battery", order="newest", cursor=cursor)
+        _time("common term, newest, page 51",
+              lambda: search_grievances(db, "battery", order="newest", cursor=cursor), args.runs)
+        _time("common term, bm25 rank", lambda: search_grievances(db, "battery"), max(3, args.runs // 10))
+        _time("LIKE scan (no index)", lambda: db.execute(
+            text("SELECT id FROM grievances WHERE complaint_details LIKE :q ORDER BY id DESC LIMIT 20"),
+            {"q": f"% {rare}"},
+        ).all(), 3)
+
+
+if __name__ == "__main__":
+    main()
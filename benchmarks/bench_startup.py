@@ -0,0 +1,110 @@
+"""Cold-start cost: python -m benchmarks.bench_startup --runs 5 --output startup.json
+
+Each measurement runs in a fresh interpreter: importing api, rag_chatbot and services, running
+the API lifespan startup (tables, migrations, pools), and building plus warming up a chatbot
+against the local Gemini stand-in. Prints the median and min per step as JSON; with
+--baseline, exits 1 if a median grew by more than --tolerance and --min-delta-ms.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+# Each snippet prints the seconds it measured
+STEPS = {
+    "import_api": "import api",
+    "import_rag_chatbot": "import rag_chatbot",
+    "import_services": "import services",
+    "api_startup": """
+import asyncio, api
+async def startup():
+    async with api.app.router.lifespan_context(api.app):
+        pass
+asyncio.run(startup())
+""",
+    "chatbot_warm": """
+from benchmarks.fake_gemini import FakeGenerativeModel
+from rag_chatbot import SimpleRAGChatbot, InProcessComplaintBackend
+SimpleRAGChatbot(backend=InProcessComplaintBackend(), model=FakeGenerativeModel(latency=0, jitter=0)).warm_up()
+""",
+}
+
+TIMER = """
+import time
+_start = time.perf_counter()
+{code}
+print(time.perf_counter() - _start)
+"""
+
+
+def measure(code: str, env: Dict[str, str]) -> float:
+    result = subprocess.run([sys.executable, "-c", TIMER.format(code=code)], env=env, capture_output=True,
+                            text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def compare(result: Dict, baseline: Dict, tolerance: float, min_delta_ms: float) -> List[str]:
+    regressions = []
+    for step, stats in result["steps"].items():
+        before = baseline.get("steps", {}).get(step)
+        if (before and stats["median_ms"] > before["median_ms"] * (1 + tolerance)
+                and stats["median_ms"] - before["median_ms"] > min_delta_ms):
+            regressions.append(f"{step} {before['median_ms']:.0f} -> {stats['median_ms']:.0f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--steps", nargs="+", choices=list(STEPS), default=list(STEPS))
+    parser.add_argument("--embedding", default="hashing", help="EMBEDDING_BACKEND for the chatbot step")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="JSON report of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--min-delta-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.db"),
+        "STATUS_WORKER_ENABLED": "false",
+        "CHATBOT_WARMUP": "false",
+        "DUPLICATE_DETECTION_ENABLED": "false",
+        "EMBEDDING_BACKEND": args.embedding,
+        "PYTHONWARNINGS": "ignore",
+    }
+    # First run creates the database and compiles bytecode; it isn't counted
+    measure(STEPS["api_startup"], env)
+
+    steps = {}
+    for step in args.steps:
+        samples = [measure(STEPS[step], env) * 1000 for _ in range(args.runs)]
+        steps[step] = {"median_ms": round(statistics.median(samples), 1), "min_ms": round(min(samples), 1)}
+    result = {"python": sys.version.split()[0], "runs": args.runs, "steps": steps}
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance, args.min_delta_ms)
+        result["regressions"] = regressions
+
+    report = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+    for line in regressions:
+        print(f"REGRESSION: {line}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
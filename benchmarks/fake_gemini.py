@@ -0,0 +1,133 @@
+"""Local stand-in for google.generativeai.GenerativeModel with configurable latency.
+
+Answers the chatbot's prompts plausibly (intent labels, empty extraction JSON, a short
+grounded answer) so benchmarks exercise every code path without network access.
+"""
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from typing import List, Optional, Tuple
+
+ANSWER = ("Our support team handles laptop hardware, battery, screen and software issues. "
+          "You can register a complaint or check its status here at any time.")
+
+_REGISTRATION_RE = re.compile(r"\b(register|complaint|issue|problem|broken|not working)\b", re.IGNORECASE)
+_STATUS_RE = re.compile(r"\b(status|track|update|progress)\b", re.IGNORECASE)
+_GREETING_RE = re.compile(r"\b(hello|hi|hey|good (morning|evening|afternoon))\b", re.IGNORECASE)
+_USER_MESSAGE_RE = re.compile(r'User message: "(.*)"', re.DOTALL)
+_BATCH_MESSAGE_RE = re.compile(r"^\s*User message: (\".*\")$", re.MULTILINE)
+_BATCH_FIELDS_RE = re.compile(r"^\s*(\d+)\. Fields:", re.MULTILINE)
+
+
+class FakeAPIError(Exception):
+    """Mimics a google.api_core error, which carries the HTTP status as `code`"""
+
+    def __init__(self, code: int):
+        super().__init__(f"{code} fake upstream error")
+        self.code = code
+
+
+class FakeResponse:
+    """Mimics the parts of GenerateContentResponse the chatbot reads"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeStream:
+    """Iterable (sync or async) of FakeResponse chunks, paced like token streaming"""
+
+    def __init__(self, chunks: List[str], first_delay: float, chunk_delay: float):
+        self.chunks = chunks
+        self.first_delay = first_delay
+        self.chunk_delay = chunk_delay
+
+    def __iter__(self):
+        for index, chunk in enumerate(self.chunks):
+            time.sleep(self.first_delay if index == 0 else self.chunk_delay)
+            yield FakeResponse(chunk)
+
+    async def __aiter__(self):
+        for index, chunk in enumerate(self.chunks):
+            await asyncio.sleep(self.first_delay if index == 0 else self.chunk_delay)
+            yield FakeResponse(chunk)
+
+
+class FakeGenerativeModel:
+    """Drop-in for GenerativeModel: each call takes latency ± jitter seconds.
+
+    Streaming calls deliver the first chunk after that delay and every further
+    chunk after chunk_delay. A share `error_rate` of calls fail (429 or 503) after
+    the delay. `calls` counts upstream requests.
+    """
+
+    def __init__(self, latency: float = 0.4, jitter: float = 0.1, chunk_delay: float = 0.02,
+                 seed: int = 0, error_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.chunk_delay = chunk_delay
+        self.error_rate = error_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self) -> Tuple[float, Optional[int]]:
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            error = self._rng.choice((429, 503)) if self._rng.random() < self.error_rate else None
+            return delay, error
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        delay, error = self._delay()
+        text = respond(str(prompt))
+        if stream and error is None:
+            return FakeStream(_chunks(text), delay, self.chunk_delay)
+        time.sleep(delay)
+        if error is not None:
+            raise FakeAPIError(error)
+        return FakeResponse(text)
+
+    async def generate_content_async(self, prompt, stream: bool = False, **kwargs):
+        delay, error = self._delay()
+        text = respond(str(prompt))
+        if stream and error is None:
+            return FakeStream(_chunks(text), delay, self.chunk_delay)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise FakeAPIError(error)
+        return FakeResponse(text)
+
+
+def _intent(message: str) -> str:
+    if _STATUS_RE.search(message):
+        return "status_inquiry"
+    if _REGISTRATION_RE.search(message):
+        return "complaint_registration"
+    if _GREETING_RE.search(message):
+        return "greeting"
+    return "unknown"
+
+
+def respond(prompt: str) -> str:
+    """Reply to one of the chatbot's prompt templates (single or batched)"""
+    if "Classify the intent of each numbered" in prompt:
+        messages = [json.loads(quoted) for quoted in _BATCH_MESSAGE_RE.findall(prompt)]
+        return json.dumps({str(number): _intent(message) for number, message in enumerate(messages, start=1)})
+    if "from each numbered user message" in prompt:
+        return json.dumps({number: {} for number in _BATCH_FIELDS_RE.findall(prompt)})
+    match = _USER_MESSAGE_RE.search(prompt)
+    message = match.group(1) if match else prompt
+    if "classify the intent" in prompt:
+        return _intent(message)
+    if "JSON schema" in prompt:
+        return "{}"
+    return ANSWER
+
+
+def _chunks(text: str, words_per_chunk: int = 3) -> List[str]:
+    words = text.split(" ")
+    return [" ".join(words[i:i + words_per_chunk]) + " " for i in range(0, len(words), words_per_chunk)]
@@ -0,0 +1,84 @@
+"""Throughput of the sync vs. async (aiosqlite) endpoints:
+python -m benchmarks.load_async_vs_sync --requests 5000 --concurrency 200
+
+Drives api.py in-process through httpx's ASGI transport against a throwaway
+database, or a running server with --url.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import httpx
+
+
+async def _run(client: httpx.AsyncClient, paths, concurrency: int):
+    latencies = []
+    queue = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+
+    async def worker():
+        while True:
+            try:
+                path = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.95)] * 1000
+
+
+async def main_async(args):
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60,
+                                   limits=httpx.Limits(max_connections=args.concurrency))
+    else:
+        from api import app
+        from database import create_tables
+        from async_database import create_tables_async
+
+        create_tables()
+        await create_tables_async()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+    async with client:
+        ids = []
+        for i in range(args.seed_rows):
+            response = await client.post("/register_complaint", json={
+                "name": f"User {i}", "mobile": f"98765{i:05d}", "complaint_details": "Laptop screen is flickering",
+            })
+            ids.append(response.json()["id"])
+
+        rng = random.Random(0)
+        sample = [rng.choice(ids) for _ in range(args.requests)]
+        for label, prefix in (("sync ", ""), ("async", "/async")):
+            rps, p50, p95 = await _run(client, [f"{prefix}/complaint_status/{i}" for i in sample], args.concurrency)
+            print(f"{label} GET /complaint_status: {rps:8.0f} req/s  p50 {p50:7.2f} ms  p95 {p95:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--seed-rows", type=int, default=200)
+    parser.add_argument("--url", help="target a running server instead of the in-process app")
+    args = parser.parse_args()
+
+    if not args.url:
+        os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+        os.environ.setdefault("STATUS_WORKER_ENABLED", "false")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""End-to-end chatbot load test against the local Gemini stand-in:
+python -m benchmarks.load_chat --target chatbot --concurrency 32 --repeat 20 --output results.json
+
+Replays recorded sessions (see benchmarks.recording) against SimpleRAGChatbot.chat in
+threads, or against POST /chat through an in-process ASGI client (--target api), on a
+throwaway database. Prints per-stage p50/p95/p99 as JSON; with --baseline, exits 1 if
+any stage's p95 or the throughput regressed by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Dict, List
+
+DEFAULT_SESSIONS = os.path.join(os.path.dirname(__file__), "data", "sample_sessions.jsonl")
+
+# Chatbot methods timed as stages (some nest: intent classification includes retrieval)
+STAGES = {
+    "_classify_intent": "intent",
+    "_extract_information": "extraction",
+    "_get_relevant_context": "retrieval",
+    "_register_complaint_api": "backend",
+    "_get_complaint_status_api": "backend",
+    "_generate_answer": "answer",
+}
+
+
+class StageTimer:
+    """Collects wall-clock samples per stage name from any thread or task"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def wrap(self, stage: str, func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - start)
+            return timed_async
+
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return timed
+
+    def instrument(self, chatbot, upstream) -> None:
+        """Time the chatbot's stages and every upstream (uncached) model call"""
+        for method, stage in STAGES.items():
+            setattr(chatbot, method, self.wrap(stage, getattr(chatbot, method)))
+        upstream.generate_content = self.wrap("llm_upstream", upstream.generate_content)
+        upstream.generate_content_async = self.wrap("llm_upstream", upstream.generate_content_async)
+
+    def report(self) -> Dict[str, Dict]:
+        from rag_chatbot import percentile
+
+        report = {}
+        for stage, values in sorted(self.samples.items()):
+            report[stage] = {
+                "count": len(values),
+                "mean_ms": round(sum(values) / len(values) * 1000, 3),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+            }
+        return report
+
+
+def _workload(sessions: List[List[str]], repeat: int) -> List[tuple]:
+    return [(f"load-{copy}-{index}", messages)
+            for copy in range(repeat) for index, messages in enumerate(sessions)]
+
+
+def _model(args):
+    from benchmarks.fake_gemini import FakeGenerativeModel
+    from llm_cache import CachedModel, LLMResponseCache
+
+    upstream = FakeGenerativeModel(latency=args.latency, jitter=args.jitter, chunk_delay=args.chunk_delay,
+                                   seed=args.seed, error_rate=args.error_rate)
+    cache = LLMResponseCache(path=None, max_entries=args.llm_cache_entries)
+    if args.resilient:
+        from llm_client import ResilientModel
+
+        return upstream, CachedModel(ResilientModel(upstream, "fake", rate_limit_rpm=args.rpm), "fake", cache=cache)
+    return upstream, CachedModel(upstream, "fake", cache=cache)
+
+
+def _llm_stats(model) -> Dict:
+    from metrics import LLM_CLIENT_EVENTS, LLM_FALLBACKS
+
+    stats = {
+        "fallbacks": {stage: LLM_FALLBACKS.value(stage=stage) for stage in ("intent", "answer", "extraction")},
+        "client_events": {event: LLM_CLIENT_EVENTS.value(model="fake", event=event)
+                          for event in ("throttled", "rate_limited", "no_slot", "retry", "timeout",
+                                        "upstream_error", "circuit_trip", "circuit_open")},
+    }
+    if hasattr(model.model, "stats"):
+        stats["client"] = model.model.stats()
+    return stats
+
+
+def _batching_stats(chatbot) -> Dict:
+    return {kind: {key: stats[key] for key in ("batches", "items", "items_per_batch", "calls_saved")}
+            for kind, stats in chatbot.batching_stats().items()}
+
+
+def run_chatbot(args, workload, timer: StageTimer) -> Dict:
+    from rag_chatbot import SimpleRAGChatbot, InProcessComplaintBackend
+    from session_store import MemorySessionStore
+
+    upstream, model = _model(args)
+    chatbot = SimpleRAGChatbot(backend=InProcessComplaintBackend(), sessions=MemorySessionStore(), model=model)
+    timer.instrument(chatbot, upstream)
+    errors = []
+
+    def run_session(session_id, messages):
+        for message in messages:
+            start = time.perf_counter()
+            try:
+                chatbot.chat(message, session_id)
+            except Exception as e:
+                errors.append(repr(e))
+            timer.record("turn", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for future in [pool.submit(run_session, *item) for item in workload]:
+            future.result()
+    elapsed = time.perf_counter() - start
+    return {"elapsed_s": elapsed, "errors": errors, "upstream_calls": upstream.calls,
+            "coalesced_calls": model.coalesced, "llm": _llm_stats(model), "batching": _batching_stats(chatbot)}
+
+
+async def run_api(args, workload, timer: StageTimer) -> Dict:
+    import httpx
+
+    import api
+    from async_chatbot import AsyncRAGChatbot, AsyncInProcessComplaintBackend
+    from concurrency import ConcurrencyLimiter
+    from session_store import MemorySessionStore
+
+    upstream, model = _model(args)
+    chatbot = AsyncRAGChatbot(backend=AsyncInProcessComplaintBackend(), sessions=MemorySessionStore(), model=model)
+    timer.instrument(chatbot, upstream)
+    api._chatbot = chatbot
+    if args.api_concurrency:
+        api.chat_limiter = ConcurrencyLimiter(max_concurrency=args.api_concurrency)
+    errors = []
+    queue = asyncio.Queue()
+    for item in workload:
+        queue.put_nowait(item)
+
+    async def worker(client):
+        while not queue.empty():
+            session_id, messages = queue.get_nowait()
+            for message in messages:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/chat", json={"message": message, "session_id": session_id})
+                    if response.status_code != 200:
+                        errors.append(f"HTTP {response.status_code}")
+                except Exception as e:
+                    errors.append(repr(e))
+                timer.record("http_chat", time.perf_counter() - start)
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+    return {"elapsed_s": elapsed, "errors": errors, "upstream_calls": upstream.calls,
+            "coalesced_calls": model.coalesced, "limiter": api.chat_limiter.stats(), "llm": _llm_stats(model),
+            "batching": _batching_stats(chatbot)}
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(result: Dict, baseline: Dict, tolerance: float, min_delta_ms: float = 1.0) -> List[str]:
+    """Regressions of result against baseline, as human-readable lines.
+
+    A stage regresses when its p95 grows by more than tolerance (relative) and min_delta_ms.
+    """
+    regressions = []
+    for stage, stats in result["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if (before and stats["p95_ms"] > before["p95_ms"] * (1 + tolerance)
+                and stats["p95_ms"] - before["p95_ms"] > min_delta_ms):
+            regressions.append(f"{stage} p95 {before['p95_ms']:.1f} -> {stats['p95_ms']:.1f} ms")
+    before = baseline.get("throughput_turns_per_s")
+    if before and result["throughput_turns_per_s"] < before * (1 - tolerance):
+        regressions.append(f"throughput {before:.1f} -> {result['throughput_turns_per_s']:.1f} turns/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["chatbot", "api"], default="chatbot")
+    parser.add_argument("--sessions", default=DEFAULT_SESSIONS, help="JSONL recording to replay")
+    parser.add_argument("--repeat", type=int, default=10, help="copies of each recorded session")
+    parser.add_argument("--concurrency", type=int, default=16, help="sessions replayed at once")
+    parser.add_argument("--latency", type=float, default=0.4, help="fake Gemini latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake Gemini calls failing with 429/503")
+    parser.add_argument("--resilient", action="store_true", help="put the rate-limiting, retrying client in front")
+    parser.add_argument("--rpm", type=float, default=6000, help="token bucket rate for --resilient")
+    parser.add_argument("--llm-cache-entries", type=int, default=10000, help="0 disables the LLM cache")
+    parser.add_argument("--api-concurrency", type=int, default=0, help="override CHAT_MAX_CONCURRENCY")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="JSON report of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    os.environ.setdefault("STATUS_WORKER_ENABLED", "false")
+    os.environ.setdefault("EMBEDDING_BACKEND", "hashing")
+    # Exercise the answer stage too; it is off by default
+    os.environ.setdefault("LLM_ANSWERS_ENABLED", "true")
+
+    from benchmarks.recording import load_sessions
+
+    workload = _workload(load_sessions(args.sessions), args.repeat)
+    turns = sum(len(messages) for _, messages in workload)
+    timer = StageTimer()
+    if args.target == "chatbot":
+        outcome = run_chatbot(args, workload, timer)
+    else:
+        outcome = asyncio.run(run_api(args, workload, timer))
+
+    result = {
+        "target": args.target,
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "tolerance", "min_delta_ms")},
+        "sessions": len(workload),
+        "turns": turns,
+        "elapsed_s": round(outcome.pop("elapsed_s"), 3),
+        "errors": len(outcome["errors"]),
+        "error_samples": outcome.pop("errors")[:5],
+        **outcome,
+        "stages": timer.report(),
+    }
+    result["throughput_turns_per_s"] = round(turns / result["elapsed_s"], 2)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance, args.min_delta_ms)
+        result["regressions"] = regressions
+
+    report = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+    for line in regressions:
+        print(f"REGRESSION: {line}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Record chat sessions to JSONL for replay by benchmarks.load_chat:
+python -m benchmarks.recording --output benchmarks/data/my_sessions.jsonl
+
+Type messages at the prompt; "/new" starts a new session, an empty line or EOF stops.
+Uses the real Gemini model unless --fake is given.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import List
+
+
+class SessionRecorder:
+    """Wraps a chatbot and appends every turn to a JSONL file"""
+
+    def __init__(self, chatbot, path: str):
+        self.chatbot = chatbot
+        self.path = path
+        self._turns = {}
+        self._lock = threading.Lock()
+
+    def chat(self, user_message: str, session_id: str = "default") -> str:
+        start = time.perf_counter()
+        reply = self.chatbot.chat(user_message, session_id)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            turn = self._turns.get(session_id, 0)
+            self._turns[session_id] = turn + 1
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "session_id": session_id,
+                    "turn": turn,
+                    "message": user_message,
+                    "reply": reply,
+                    "elapsed_ms": round(elapsed_ms, 3),
+                    "recorded_at": time.time(),
+                }) + "\n")
+        return reply
+
+
+def load_sessions(path: str) -> List[List[str]]:
+    """Read a recording back as one list of user messages per session, in turn order"""
+    sessions: "OrderedDict[str, list]" = OrderedDict()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                sessions.setdefault(record["session_id"], []).append((record.get("turn", 0), record["message"]))
+    return [[message for _, message in sorted(turns, key=lambda turn: turn[0])] for turns in sessions.values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--fake", action="store_true", help="use the local Gemini stand-in")
+    args = parser.parse_args()
+
+    from rag_chatbot import SimpleRAGChatbot
+
+    model = None
+    if args.fake:
+        from benchmarks.fake_gemini import FakeGenerativeModel
+        from llm_cache import CachedModel, LLMResponseCache
+
+        model = CachedModel(FakeGenerativeModel(), "fake", cache=LLMResponseCache(path=None))
+    recorder = SessionRecorder(SimpleRAGChatbot(model=model), args.output)
+
+    session_id = uuid.uuid4().hex
+    while True:
+        try:
+            message = input("you> ").strip()
+        except EOFError:
+            break
+        if not message:
+            break
+        if message == "/new":
+            session_id = uuid.uuid4().hex
+            continue
+        print(f"bot> {recorder.chat(message, session_id)}\n")
+
+
+if __name__ == "__main__":
+    main()
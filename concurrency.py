@@ -0,0 +1,94 @@
+import asyncio
+from collections import deque
+from typing import Dict
+
+from config import CHAT_MAX_CONCURRENCY, CHAT_MAX_QUEUE, CHAT_QUEUE_TIMEOUT, CHAT_RETRY_AFTER
+
+
+class Overloaded(Exception):
+    """Raised when a request can't get a slot; carries the Retry-After hint in seconds"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Server is busy, try again later")
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """Caps concurrent work on one event loop, queueing a bounded number of waiters in FIFO order.
+
+    Requests beyond the queue, or that wait longer than queue_timeout, raise Overloaded.
+    """
+
+    def __init__(self, max_concurrency: int = CHAT_MAX_CONCURRENCY, max_queue: int = CHAT_MAX_QUEUE,
+                 queue_timeout: float = CHAT_QUEUE_TIMEOUT, retry_after: float = CHAT_RETRY_AFTER):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+
+    async def acquire(self) -> None:
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.retry_after)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # The slot was handed over just as the timeout fired
+                self.admitted += 1
+                return
+            self.timed_out += 1
+            raise Overloaded(self.retry_after)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            if waiter.cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+        self.admitted += 1
+
+    def release(self) -> None:
+        # Hand the slot straight to the next live waiter so `active` never dips below the cap
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def stats(self) -> Dict:
+        return {
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
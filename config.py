@@ -5,10 +5,141 @@ load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 API_BASE_URL = "http://localhost:8000"
+API_TIMEOUT = 10.0  # seconds, per request to the grievance API
+API_MAX_CONNECTIONS = 100
+API_MAX_KEEPALIVE_CONNECTIONS = 20
+# "http" calls api.py at API_BASE_URL; "inprocess" runs the same service logic on a local session
+CHATBOT_BACKEND = os.getenv("CHATBOT_BACKEND", "http")
+# Build and warm up the API's /chat chatbot during startup instead of on the first request
+CHATBOT_WARMUP = os.getenv("CHATBOT_WARMUP", "true").lower() == "true"
+GEMINI_MODEL = "gemini-1.5-flash"
+
+# Applied to every SQLite connection
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,  # KiB, i.e. 64 MB
+    "mmap_size": 268435456,  # 256 MB
+    "busy_timeout": 5000,  # ms
+    "temp_store": "MEMORY",
+}
+
+# Connection pools (file databases only; an in-memory database keeps SQLAlchemy's own pool).
+# Sync endpoints run on AnyIO's threadpool (40 threads) and each holds one connection until
+# get_db's teardown. A pool smaller than the threadpool can deadlock when teardowns wait for a
+# thread that is itself waiting on the pool, so pool size plus overflow (50) covers all 40 request
+# threads plus the status worker, the group commit writer and streaming exports. A finite cap
+# means a leak or a larger threadpool raises a pool timeout instead of opening connections forever.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "30"))
+# Async database path (aiosqlite)
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "20"))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "10"))
+
+# Background status progression (GET endpoints never write)
+STATUS_WORKER_ENABLED = os.getenv("STATUS_WORKER_ENABLED", "true").lower() == "true"
+STATUS_WORKER_INTERVAL = float(os.getenv("STATUS_WORKER_INTERVAL", "30"))  # seconds
+STATUS_WORKER_BATCH_SIZE = 500
+
+# Status endpoint response cache (TTL bounds staleness from writers in other processes)
+STATUS_CACHE_MAX_ENTRIES = 10000
+STATUS_CACHE_TTL = float(os.getenv("STATUS_CACHE_TTL", "30"))  # seconds
+
+# Bulk endpoints: rows per INSERT/IN query and max items per request
+BULK_CHUNK_SIZE = 500
+BULK_MAX_ITEMS = 50000
+
+# Group commit for single registrations (off by default): one writer thread commits queued
+# inserts together, waiting at most WRITE_QUEUE_MAX_LATENCY_MS after the first one for more
+# (up to WRITE_QUEUE_MAX_BATCH). Callers get their ID only after the commit; the writer's
+# connection uses synchronous=FULL, which the shared fsync makes affordable.
+WRITE_QUEUE_ENABLED = os.getenv("WRITE_QUEUE_ENABLED", "false").lower() == "true"
+WRITE_QUEUE_MAX_LATENCY = float(os.getenv("WRITE_QUEUE_MAX_LATENCY_MS", "2")) / 1000
+WRITE_QUEUE_MAX_BATCH = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "256"))
+WRITE_QUEUE_SYNCHRONOUS = os.getenv("WRITE_QUEUE_SYNCHRONOUS", "FULL")
+
+# GET /complaints page size cap, and rows fetched per round trip by the streaming export
+LIST_MAX_LIMIT = 500
+EXPORT_BATCH_SIZE = 1000
+
+# POST /chat: concurrent conversations served at once, how many may queue for a slot and for how
+# long, and the Retry-After (seconds) sent with 429 when the queue is full
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "16"))
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "64"))
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "10"))
+CHAT_RETRY_AFTER = 2
+
+# Sampling profiler behind POST /debug/profile (off unless PROFILING_ENABLED=true)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+PROFILE_MAX_SECONDS = 60
 
 # RAG Configuration
 VECTOR_DB_PATH = "./chroma_db"
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# "sentence-transformers" or "hashing" (deterministic, runs offline)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+HASHING_EMBEDDING_DIM = 256
+RETRIEVAL_TOP_K = 2
+RETRIEVAL_MIN_SCORE = 0.1
+
+# Knowledge base: FAQ/troubleshooting documents (.md, .txt, .jsonl) in KB_DOCS_PATH are chunked,
+# embedded and stored under KB_INDEX_PATH by `python manage.py ingest-kb`; chunks whose text is
+# unchanged keep their stored vectors
+KB_DOCS_PATH = os.getenv("KB_DOCS_PATH", "./data/knowledge")
+KB_INDEX_PATH = os.path.join(VECTOR_DB_PATH, "knowledge")
+KB_CHUNK_CHARS = 800
+KB_CHUNK_OVERLAP = 100
+KB_EMBED_BATCH_SIZE = 64
+
+# Duplicate complaint detection at registration: an open complaint from the same mobile within
+# the window whose text embedding is at least this cosine-similar is linked instead of re-filed
+DUPLICATE_DETECTION_ENABLED = os.getenv("DUPLICATE_DETECTION_ENABLED", "true").lower() == "true"
+DUPLICATE_INDEX_PATH = os.path.join(VECTOR_DB_PATH, "complaints")
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.85"))
+DUPLICATE_WINDOW_HOURS = float(os.getenv("DUPLICATE_WINDOW_HOURS", "72"))
+DUPLICATE_MAX_CANDIDATES = 50
+
+# Gemini client resilience. The token bucket is sized to the project quota (requests per minute,
+# shared by every chatbot in the process); concurrency adapts between the min and max (AIMD) as
+# upstream throttles or recovers. Each call gets LLM_CALL_TIMEOUT seconds in total, retries
+# included. After LLM_BREAKER_FAILURES consecutive upstream failures, calls fail fast (and the
+# chatbot answers from local fallbacks) for LLM_BREAKER_RESET seconds before one probe is let through.
+LLM_RATE_LIMIT_RPM = float(os.getenv("LLM_RATE_LIMIT_RPM", "60"))
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "10"))
+LLM_MIN_CONCURRENCY = 1
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "20"))  # seconds
+LLM_MAX_RETRIES = 3
+LLM_BACKOFF_BASE = 0.5  # seconds; attempt n sleeps uniform(0, min(max, base * 2**n))
+LLM_BACKOFF_MAX = 8.0
+LLM_BREAKER_FAILURES = 5
+LLM_BREAKER_RESET = 30.0  # seconds
+
+# Micro-batching: intent classification and slot extraction requests that reach Gemini within
+# LLM_BATCH_WINDOW_MS of each other are sent as one prompt of up to LLM_BATCH_MAX_SIZE items
+# (a window of 0 sends each request on its own)
+LLM_BATCH_WINDOW = float(os.getenv("LLM_BATCH_WINDOW_MS", "10")) / 1000  # seconds
+LLM_BATCH_MAX_SIZE = int(os.getenv("LLM_BATCH_MAX_SIZE", "16"))
+
+# Local intent classifier (messages below the threshold go to Gemini)
+INTENT_DATA_PATH = "./data/intents.jsonl"
+INTENT_MODEL_PATH = "./models/intent_classifier.pkl"
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.6"))
+INTENT_RELOAD_INTERVAL = 30  # seconds between model file mtime checks
+
+# LLM response cache (bump PROMPT_TEMPLATE_VERSION whenever a prompt template changes)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./llm_cache.db")
+LLM_CACHE_MAX_ENTRIES = 10000
+LLM_CACHE_TTL = 24 * 60 * 60  # seconds
+PROMPT_TEMPLATE_VERSION = "1"
+
+# Chat session state: "memory" (per process) or "sqlite" (shared by processes on the host)
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "./sessions.db")
+SESSION_TTL = 30 * 60  # seconds of inactivity before a session is dropped
+SESSION_MAX_SESSIONS = 10000
+SESSION_MAX_BYTES = 16 * 1024 * 1024  # approximate memory cap for the in-memory store
 
 # Chatbot responses
 BOT_RESPONSES = {
@@ -16,4 +147,9 @@ BOT_RESPONSES = {
     "complaint_registration": "I can help you register a complaint. I'll need some information from you.",
     "status_inquiry": "I can help you check the status of your complaint.",
     "unknown": "I'm sorry, I didn't understand that. I can help you register a complaint or check complaint status."
-} 
\ No newline at end of file
+}
+
+# Answer messages that are neither registrations nor status requests with a Gemini call grounded
+# in the knowledge base (streamed token by token by chat_stream). Off by default: those turns get
+# BOT_RESPONSES["unknown"] without an upstream call.
+LLM_ANSWERS_ENABLED = os.getenv("LLM_ANSWERS_ENABLED", "false").lower() == "true" 
\ No newline at end of file
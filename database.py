@@ -1,10 +1,43 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
+from sqlalchemy import create_engine, event, Column, Integer, Float, String, Date, DateTime, Text, Index, ForeignKey
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
+from config import SQLITE_PRAGMAS, DB_POOL_SIZE, DB_MAX_OVERFLOW
+from metrics import instrument_engine
+import os
 
-DATABASE_URL = "sqlite:///./grievances.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./grievances.db")
+
+def is_memory_database(url) -> bool:
+    """True for an in-memory SQLite URL, where SQLAlchemy picks a pool that keeps the one database"""
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+def pool_args(url, pool_size: int, max_overflow: int, **kwargs) -> dict:
+    """Queue pool sizing for file and server databases; none for in-memory SQLite"""
+    if is_memory_database(url):
+        return {}
+    return {"pool_size": pool_size, "max_overflow": max_overflow, **kwargs}
+
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    **pool_args(DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW),
+)
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    """Tune every new SQLite connection (WAL, synchronous, cache, mmap, busy timeout)"""
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+instrument_engine(engine, "sync")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
@@ -18,9 +51,169 @@ class Grievance(Base):
     complaint_details = Column(Text, nullable=False)
     status = Column(String(50), default="Registered")
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Serves "latest complaint for a mobile" without a scan or sort
+        Index("ix_grievances_mobile_created_at", "mobile", created_at.desc()),
+        Index("ix_grievances_status_created_at", "status", "created_at"),
+        # Keyset pagination over all complaints (the rowid id is implicitly the second key)
+        Index("ix_grievances_created_at", "created_at"),
+    )
+
+class StatusHistory(Base):
+    __tablename__ = "status_history"
+    
+    id = Column(Integer, primary_key=True)
+    grievance_id = Column(Integer, ForeignKey("grievances.id"), nullable=False, index=True)
+    from_status = Column(String(50), nullable=False)
+    to_status = Column(String(50), nullable=False)
+    changed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class DuplicateReport(Base):
+    """A repeat report of an open complaint, linked to it instead of opening a new ticket"""
+    __tablename__ = "complaint_duplicates"
+    
+    id = Column(Integer, primary_key=True)
+    grievance_id = Column(Integer, ForeignKey("grievances.id"), nullable=False, index=True)
+    complaint_details = Column(Text, nullable=False)
+    similarity = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class ComplaintDailyCount(Base):
+    """Complaints created on `day` that are currently in `status`; kept current by triggers"""
+    __tablename__ = "complaint_daily_counts"
+    
+    day = Column(Date, primary_key=True)
+    status = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+# Recounts complaint_daily_counts from scratch (migration 6 and `manage.py rebuild-stats`)
+ROLLUP_BACKFILL = [
+    "DELETE FROM complaint_daily_counts",
+    """INSERT INTO complaint_daily_counts (day, status, count)
+        SELECT date(created_at), coalesce(status, 'Registered'), COUNT(*)
+        FROM grievances WHERE created_at IS NOT NULL GROUP BY 1, 2""",
+]
+
+# Versioned schema migrations for existing databases, tracked in PRAGMA user_version.
+# Append new steps; never edit or reorder applied ones.
+MIGRATIONS = [
+    # 1: composite index for get_complaint_by_mobile
+    [
+        "CREATE INDEX IF NOT EXISTS ix_grievances_mobile_created_at ON grievances (mobile, created_at DESC)",
+    ],
+    # 2: status transitions recorded by the progression worker
+    [
+        """CREATE TABLE IF NOT EXISTS status_history (
+            id INTEGER NOT NULL PRIMARY KEY,
+            grievance_id INTEGER NOT NULL REFERENCES grievances (id),
+            from_status VARCHAR(50) NOT NULL,
+            to_status VARCHAR(50) NOT NULL,
+            changed_at DATETIME NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_status_history_grievance_id ON status_history (grievance_id)",
+        # Lets the worker pick the oldest Registered complaints without a scan
+        "CREATE INDEX IF NOT EXISTS ix_grievances_status_created_at ON grievances (status, created_at)",
+    ],
+    # 3: full-text index over complaint_details (external content, so the text isn't stored twice)
+    [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS grievances_fts USING fts5(
+            complaint_details, content='grievances', content_rowid='id', tokenize='porter unicode61'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS grievances_fts_insert AFTER INSERT ON grievances BEGIN
+            INSERT INTO grievances_fts (rowid, complaint_details) VALUES (new.id, new.complaint_details);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS grievances_fts_delete AFTER DELETE ON grievances BEGIN
+            INSERT INTO grievances_fts (grievances_fts, rowid, complaint_details)
+            VALUES ('delete', old.id, old.complaint_details);
+        END""",
+        # Only text edits touch the index; status updates from the worker don't
+        """CREATE TRIGGER IF NOT EXISTS grievances_fts_update AFTER UPDATE OF complaint_details ON grievances BEGIN
+            INSERT INTO grievances_fts (grievances_fts, rowid, complaint_details)
+            VALUES ('delete', old.id, old.complaint_details);
+            INSERT INTO grievances_fts (rowid, complaint_details) VALUES (new.id, new.complaint_details);
+        END""",
+        "INSERT INTO grievances_fts (grievances_fts) VALUES ('rebuild')",
+    ],
+    # 4: repeat reports linked to an existing complaint by duplicate detection
+    [
+        """CREATE TABLE IF NOT EXISTS complaint_duplicates (
+            id INTEGER NOT NULL PRIMARY KEY,
+            grievance_id INTEGER NOT NULL REFERENCES grievances (id),
+            complaint_details TEXT NOT NULL,
+            similarity FLOAT NOT NULL,
+            created_at DATETIME NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_complaint_duplicates_grievance_id ON complaint_duplicates (grievance_id)",
+    ],
+    # 5: GET /complaints and the export page through all complaints by (created_at, id)
+    [
+        "CREATE INDEX IF NOT EXISTS ix_grievances_created_at ON grievances (created_at)",
+    ],
+    # 6: per (creation day, status) complaint counts for GET /stats, maintained in the same
+    # transaction as every insert, delete and status change, then backfilled from grievances
+    [
+        """CREATE TABLE IF NOT EXISTS complaint_daily_counts (
+            day DATE NOT NULL,
+            status VARCHAR(50) NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (day, status)
+        )""",
+        # A NULL status (raw SQL inserts only) counts as the column default
+        """CREATE TRIGGER IF NOT EXISTS complaint_daily_counts_insert AFTER INSERT ON grievances BEGIN
+            INSERT INTO complaint_daily_counts (day, status, count)
+            SELECT date(new.created_at), coalesce(new.status, 'Registered'), 1 WHERE new.created_at IS NOT NULL
+            ON CONFLICT (day, status) DO UPDATE SET count = count + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS complaint_daily_counts_delete AFTER DELETE ON grievances BEGIN
+            UPDATE complaint_daily_counts SET count = count - 1
+            WHERE day = date(old.created_at) AND status = coalesce(old.status, 'Registered');
+        END""",
+        # Fires for status worker transitions; the WHEN skips updates that don't move the row
+        """CREATE TRIGGER IF NOT EXISTS complaint_daily_counts_update AFTER UPDATE OF status, created_at ON grievances
+            WHEN old.status IS NOT new.status OR date(old.created_at) IS NOT date(new.created_at) BEGIN
+            UPDATE complaint_daily_counts SET count = count - 1
+            WHERE day = date(old.created_at) AND status = coalesce(old.status, 'Registered');
+            INSERT INTO complaint_daily_counts (day, status, count)
+            SELECT date(new.created_at), coalesce(new.status, 'Registered'), 1 WHERE new.created_at IS NOT NULL
+            ON CONFLICT (day, status) DO UPDATE SET count = count + 1;
+        END""",
+        *ROLLUP_BACKFILL,
+    ],
+]
+
+def apply_migrations(conn) -> int:
+    """Apply pending migrations on an open connection and return the resulting schema version"""
+    version = conn.exec_driver_sql("PRAGMA user_version").scalar()
+    for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+        for statement in statements:
+            conn.exec_driver_sql(statement)
+        conn.exec_driver_sql(f"PRAGMA user_version = {number}")
+        version = number
+    return version
+
+def migrate(bind=engine) -> int:
+    """Apply pending migrations in one transaction"""
+    with bind.begin() as conn:
+        return apply_migrations(conn)
+
+def rebuild_search_index(bind=engine) -> int:
+    """Re-index every complaint in grievances_fts and merge its segments; returns rows indexed"""
+    with bind.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO grievances_fts (grievances_fts) VALUES ('rebuild')")
+        conn.exec_driver_sql("INSERT INTO grievances_fts (grievances_fts) VALUES ('optimize')")
+        return conn.exec_driver_sql("SELECT COUNT(*) FROM grievances").scalar()
+
+def rebuild_daily_counts(bind=engine) -> int:
+    """Recount complaint_daily_counts from grievances in one transaction; returns rows written"""
+    with bind.begin() as conn:
+        for statement in ROLLUP_BACKFILL:
+            conn.exec_driver_sql(statement)
+        return conn.exec_driver_sql("SELECT COUNT(*) FROM complaint_daily_counts").scalar()
 
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    migrate()
 
 def get_db():
     db = SessionLocal()
@@ -0,0 +1,253 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from config import (
+    DUPLICATE_DETECTION_ENABLED,
+    DUPLICATE_INDEX_PATH,
+    DUPLICATE_THRESHOLD,
+    DUPLICATE_WINDOW_HOURS,
+    DUPLICATE_MAX_CANDIDATES,
+)
+from database import Grievance
+from file_lock import file_lock
+from retrieval import shared_embedder
+
+# Out-of-order IDs kept in the tail dict before the sorted index is rebuilt
+TAIL_LIMIT = 4096
+
+# Complaints in these statuses are finished; a new report is a recurrence, not a duplicate
+CLOSED_STATUSES = ("Resolved", "Closed")
+
+
+class ComplaintVectorStore:
+    """Append-only embeddings of complaints, persisted as memory-mapped float32/int64 files.
+
+    vectors.f32 and ids.i64 hold one row per complaint; meta.json records the committed row
+    count (written last, so a crash mid-append just drops the partial rows) and the embedder
+    signature (a different embedder starts a fresh store).
+
+    Several processes may share a directory (the API and an in-process Streamlit chatbot):
+    appends happen under an inter-process lock at the committed count read from meta.json, and
+    lookups first pick up rows other processes have committed since.
+    """
+
+    def __init__(self, directory: str, dim: int, signature: str):
+        self.directory = directory
+        self.dim = dim
+        self.signature = signature
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._ids_path = os.path.join(directory, "ids.i64")
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._lock_path = os.path.join(directory, "store.lock")
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        with file_lock(self._lock_path):
+            self.count = self._load_count()
+        self._map()
+        self._reindex()
+
+    def _committed_count(self) -> int:
+        """Row count in meta.json (0 if missing or written by another embedder); replaced atomically,
+        so it can be read without the lock"""
+        try:
+            with open(self._meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return 0
+        if meta.get("signature") == self.signature and meta.get("dim") == self.dim:
+            return meta["count"]
+        return 0
+
+    def _load_count(self) -> int:
+        """The committed count, dropping anything past it. Only call under the file lock: then no
+        writer is mid-append, so the extra rows are a dead writer's partial append (or another
+        embedder's store), never rows another process has committed."""
+        count = self._committed_count()
+        for path, itemsize in ((self._vectors_path, 4 * self.dim), (self._ids_path, 8)):
+            with open(path, "ab") as f:
+                f.truncate(count * itemsize)
+        return count
+
+    def _write_meta(self, count: int) -> None:
+        tmp_path = f"{self._meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"signature": self.signature, "dim": self.dim, "count": count}, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _map(self) -> None:
+        if self.count:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+            self._ids = np.memmap(self._ids_path, dtype=np.int64, mode="r", shape=(self.count,))
+        else:
+            self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+            self._ids = np.zeros(0, dtype=np.int64)
+
+    def _reindex(self) -> None:
+        # Rows [0, sorted_count) are found by binary search (through `order` if IDs arrived out of
+        # order); later rows that broke the ordering sit in a small dict until the next reindex
+        ids = np.asarray(self._ids)
+        increasing = bool(np.all(ids[1:] > ids[:-1])) if len(ids) > 1 else True
+        self._order = None if increasing else np.argsort(ids, kind="stable")
+        self._sorted_ids = ids if increasing else ids[self._order]
+        self._sorted_count = self.count
+        self._tail = {}
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, complaint_ids: Sequence[int], vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(complaint_ids), self.dim)
+        new_ids = np.asarray(complaint_ids, dtype=np.int64)
+        with self._lock:
+            with file_lock(self._lock_path):
+                # Append after what is committed on disk, which may include other processes' rows
+                committed = self._load_count()
+                with open(self._vectors_path, "ab") as f:
+                    f.write(vectors.tobytes())
+                with open(self._ids_path, "ab") as f:
+                    f.write(new_ids.tobytes())
+                self._write_meta(committed + len(new_ids))
+            self._sync(committed + len(new_ids))
+
+    def refresh(self) -> None:
+        """Map rows other processes have committed since this one last looked"""
+        count = self._committed_count()
+        if count != self.count:
+            with self._lock:
+                self._sync(count)
+
+    def _sync(self, count: int) -> None:
+        if count == self.count:
+            return
+        first_row = self.count
+        self.count = count
+        self._map()
+        if count < first_row:
+            # The store was reset (another embedder took it over)
+            self._reindex()
+            return
+
+        new_ids = np.asarray(self._ids[first_row:count])
+        in_order = (
+            self._order is None and not self._tail
+            and (self._sorted_count == 0 or new_ids[0] > self._sorted_ids[-1])
+            and bool(np.all(new_ids[1:] > new_ids[:-1]))
+        )
+        if in_order:
+            self._sorted_ids = np.asarray(self._ids)
+            self._sorted_count = self.count
+        else:
+            for offset, complaint_id in enumerate(new_ids.tolist()):
+                self._tail[complaint_id] = first_row + offset
+            if len(self._tail) > TAIL_LIMIT:
+                self._reindex()
+
+    def rows(self, complaint_ids: Sequence[int]) -> np.ndarray:
+        """Row number of each ID in the store, or -1 where it isn't stored"""
+        self.refresh()
+        wanted = np.asarray(complaint_ids, dtype=np.int64)
+        rows = np.full(len(wanted), -1, dtype=np.int64)
+        with self._lock:
+            sorted_ids, order, tail = self._sorted_ids, self._order, self._tail
+            if len(sorted_ids):
+                positions = np.minimum(np.searchsorted(sorted_ids, wanted), len(sorted_ids) - 1)
+                hit = sorted_ids[positions] == wanted
+                rows[hit] = positions[hit] if order is None else order[positions[hit]]
+            for i, complaint_id in enumerate(wanted.tolist()):
+                if rows[i] < 0:
+                    rows[i] = tail.get(complaint_id, -1)
+        return rows
+
+    def vectors(self, rows: np.ndarray) -> np.ndarray:
+        return np.asarray(self._vectors[rows])
+
+
+class DuplicateDetector:
+    """Finds an open complaint from the same mobile, within the window, whose text is near-identical"""
+
+    def __init__(self, embedder=None, directory: str = DUPLICATE_INDEX_PATH,
+                 threshold: float = DUPLICATE_THRESHOLD, window_hours: float = DUPLICATE_WINDOW_HOURS,
+                 max_candidates: int = DUPLICATE_MAX_CANDIDATES):
+        self.embedder = embedder or shared_embedder()
+        self.threshold = threshold
+        self.window = timedelta(hours=window_hours)
+        self.max_candidates = max_candidates
+        signature = f"{type(self.embedder).__name__}:{getattr(self.embedder, 'model_name', '')}"
+        self.store = ComplaintVectorStore(directory, self.embedder.dim, signature)
+
+    def candidates_query(self, mobile: str):
+        """Recent open complaints for the mobile, served by ix_grievances_mobile_created_at"""
+        return (
+            select(Grievance.id, Grievance.complaint_details, Grievance.status)
+            .where(Grievance.mobile == mobile, Grievance.created_at >= datetime.utcnow() - self.window)
+            .order_by(Grievance.created_at.desc())
+            .limit(self.max_candidates)
+        )
+
+    def embed(self, complaint_details: str) -> np.ndarray:
+        return self.embedder.embed([complaint_details])[0]
+
+    def match(self, candidates, vector: np.ndarray) -> Optional[Tuple[int, float]]:
+        """Best (complaint_id, similarity) among candidate rows above the threshold, or None.
+
+        Candidates not in the store yet (registered by another process, bulk-loaded, or from
+        before the store existed) are embedded now and appended.
+        """
+        candidates = [row for row in candidates if row.status not in CLOSED_STATUSES]
+        if not candidates:
+            return None
+        rows = self.store.rows([row.id for row in candidates])
+        missing = [row for row, position in zip(candidates, rows) if position < 0]
+        if missing:
+            self.store.add([row.id for row in missing], self.embedder.embed([row.complaint_details for row in missing]))
+            rows = self.store.rows([row.id for row in candidates])
+
+        scores = self.store.vectors(rows) @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return candidates[best].id, float(scores[best])
+
+    def add(self, complaint_id: int, vector: np.ndarray) -> None:
+        self.store.add([complaint_id], vector[None, :])
+
+    def index_existing(self, db, batch_size: int = 1024) -> int:
+        """Embed every complaint that isn't in the store yet; returns how many were added"""
+        added = 0
+        last_id = 0
+        while True:
+            ids = db.scalars(
+                select(Grievance.id).where(Grievance.id > last_id).order_by(Grievance.id).limit(batch_size)
+            ).all()
+            if not ids:
+                return added
+            last_id = ids[-1]
+            missing = [complaint_id for complaint_id, row in zip(ids, self.store.rows(ids)) if row < 0]
+            if missing:
+                texts = dict(db.execute(
+                    select(Grievance.id, Grievance.complaint_details).where(Grievance.id.in_(missing))
+                ).all())
+                self.store.add(missing, self.embedder.embed([texts[complaint_id] for complaint_id in missing]))
+                added += len(missing)
+
+
+_detector: Optional[DuplicateDetector] = None
+_detector_lock = threading.Lock()
+
+
+def get_duplicate_detector() -> Optional[DuplicateDetector]:
+    """Process-wide detector, built on first use; None when DUPLICATE_DETECTION_ENABLED is off"""
+    global _detector
+    if not DUPLICATE_DETECTION_ENABLED:
+        return None
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = DuplicateDetector()
+    return _detector
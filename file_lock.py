@@ -0,0 +1,28 @@
+"""Advisory inter-process locks for files that several processes write (API workers, Streamlit).
+
+`file_lock(path)` holds fcntl.flock on a lock file for the duration of a with block. flock
+locks belong to the open file, so two threads of one process also exclude each other. Where
+fcntl isn't available (Windows) the lock is a no-op and only one writer process is supported.
+"""
+import os
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: str, shared: bool = False) -> Iterator[None]:
+    """Exclusive (or shared) lock on `path`, which is created if missing"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "ab") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
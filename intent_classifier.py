@@ -0,0 +1,192 @@
+import json
+import math
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import (
+    INTENT_DATA_PATH,
+    INTENT_MODEL_PATH,
+    INTENT_CONFIDENCE_THRESHOLD,
+    INTENT_RELOAD_INTERVAL,
+)
+from file_lock import file_lock
+
+INTENTS = ["complaint_registration", "status_inquiry", "greeting", "unknown"]
+
+# Same token pattern as TfidfVectorizer's default so the compiled model matches training
+_TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+
+
+def _analyze(text: str) -> List[str]:
+    tokens = _TOKEN_RE.findall(text.lower())
+    return tokens + [" ".join(tokens[i:i + 2]) for i in range(len(tokens) - 1)]
+
+
+class LinearIntentModel:
+    """TF-IDF + linear model weights compiled to plain numpy for microsecond inference"""
+
+    __slots__ = ("labels", "vocabulary", "idf", "coef", "intercept")
+
+    def __init__(self, labels: List[str], vocabulary: Dict[str, int], idf: np.ndarray,
+                 coef: np.ndarray, intercept: np.ndarray):
+        self.labels = labels
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.coef = coef
+        self.intercept = intercept
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Return (intent, probability) for a single message"""
+        counts = Counter(self.vocabulary[t] for t in _analyze(text) if t in self.vocabulary)
+        scores = self.intercept.copy()
+        if counts:
+            cols = np.fromiter(counts.keys(), dtype=np.int64)
+            # sublinear tf * idf, l2-normalized, matches TfidfVectorizer(sublinear_tf=True)
+            weights = np.fromiter((1.0 + math.log(c) for c in counts.values()), dtype=np.float64) * self.idf[cols]
+            weights /= np.linalg.norm(weights)
+            scores += self.coef[:, cols] @ weights
+        scores = np.exp(scores - scores.max())
+        probs = scores / scores.sum()
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+
+def load_training_data(path: str = INTENT_DATA_PATH) -> Tuple[List[str], List[str]]:
+    """Read labeled utterances from a JSONL file of {"text": ..., "intent": ...} lines"""
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record["intent"] not in INTENTS:
+                raise ValueError(f"Unknown intent label: {record['intent']}")
+            texts.append(record["text"])
+            labels.append(record["intent"])
+    return texts, labels
+
+
+def train_model(data_path: str = INTENT_DATA_PATH) -> LinearIntentModel:
+    """Fit TF-IDF + logistic regression with scikit-learn and compile the weights"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    texts, labels = load_training_data(data_path)
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True)
+    features = vectorizer.fit_transform(texts)
+    classifier = LogisticRegression(C=10.0, max_iter=1000)
+    classifier.fit(features, labels)
+
+    return LinearIntentModel(
+        labels=[str(label) for label in classifier.classes_],
+        vocabulary={term: int(col) for term, col in vectorizer.vocabulary_.items()},
+        idf=vectorizer.idf_.astype(np.float64),
+        coef=classifier.coef_.astype(np.float64),
+        intercept=classifier.intercept_.astype(np.float64),
+    )
+
+
+def save_model(model: LinearIntentModel, path: str = INTENT_MODEL_PATH) -> None:
+    """Write the model atomically so running processes never load a partial file"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    # A unique temp file per writer: a shared name could be renamed while another process writes it
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=f".{os.path.basename(path)}.",
+                                     suffix=".tmp", delete=False) as f:
+        tmp_path = f.name
+        try:
+            pickle.dump(model, f)
+        except BaseException:
+            f.close()
+            os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, path)
+
+
+class IntentClassifier:
+    """Local fast-path intent classifier with hot reload and local/LLM hit accounting"""
+
+    def __init__(self, data_path: str = INTENT_DATA_PATH, model_path: str = INTENT_MODEL_PATH,
+                 threshold: float = INTENT_CONFIDENCE_THRESHOLD,
+                 reload_interval: float = INTENT_RELOAD_INTERVAL):
+        self.data_path = data_path
+        self.model_path = model_path
+        self.threshold = threshold
+        self.reload_interval = reload_interval
+        self.model: Optional[LinearIntentModel] = None
+        self.local_hits = 0
+        self.llm_hits = 0
+        self._model_mtime = 0.0
+        self._next_reload_check = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self) -> bool:
+        """Load the saved model, training one first if it is missing or older than the data"""
+        with self._lock:
+            try:
+                data_mtime = os.path.getmtime(self.data_path) if os.path.exists(self.data_path) else 0.0
+                model_mtime = os.path.getmtime(self.model_path) if os.path.exists(self.model_path) else 0.0
+                if data_mtime and model_mtime < data_mtime:
+                    self._train_stale(data_mtime)
+                    model_mtime = os.path.getmtime(self.model_path)
+                if not model_mtime:
+                    return False
+                if model_mtime != self._model_mtime:
+                    with open(self.model_path, "rb") as f:
+                        self.model = pickle.load(f)
+                    self._model_mtime = model_mtime
+                return True
+            except Exception as e:
+                print(f"Error loading intent classifier: {e}")
+                return False
+            finally:
+                self._next_reload_check = time.monotonic() + self.reload_interval
+
+    def _train_stale(self, data_mtime: float) -> None:
+        """Train and save a model older than the data, once across every process sharing the file"""
+        with file_lock(f"{self.model_path}.lock"):
+            # Another worker may have trained it while this one waited for the lock
+            if not os.path.exists(self.model_path) or os.path.getmtime(self.model_path) < data_mtime:
+                save_model(train_model(self.data_path), self.model_path)
+
+    def retrain(self) -> None:
+        """Retrain from the labeled utterance file and swap the new model in"""
+        save_model(train_model(self.data_path), self.model_path)
+        self.reload()
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """Return (intent, confidence), or (None, 0.0) if no model is loaded"""
+        if time.monotonic() >= self._next_reload_check:
+            self.reload()
+        model = self.model
+        if model is None:
+            return None, 0.0
+        return model.predict(text)
+
+    def classify(self, text: str) -> Optional[str]:
+        """Return the intent when confidence clears the threshold, else None (defer to the LLM)"""
+        intent, confidence = self.predict(text)
+        if intent is not None and confidence >= self.threshold:
+            self.local_hits += 1
+            return intent
+        self.llm_hits += 1
+        return None
+
+    def stats(self) -> Dict:
+        """Report how many messages were answered locally vs. sent to the LLM"""
+        total = self.local_hits + self.llm_hits
+        return {
+            "local_hits": self.local_hits,
+            "llm_hits": self.llm_hits,
+            "local_ratio": self.local_hits / total if total else 0.0,
+        }
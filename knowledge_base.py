@@ -0,0 +1,280 @@
+"""Knowledge base ingestion: FAQ and troubleshooting documents -> chunks -> embeddings on disk.
+
+Documents under KB_DOCS_PATH (.md, .markdown, .txt, .jsonl) are split into chunks of at most
+KB_CHUNK_CHARS characters. Each chunk is identified by its source path and position and keyed
+by the SHA-256 of its text. Re-ingesting embeds only chunks whose hash isn't stored yet, so
+editing one FAQ re-embeds just that FAQ's changed chunks.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from config import KB_CHUNK_CHARS, KB_CHUNK_OVERLAP, KB_DOCS_PATH, KB_EMBED_BATCH_SIZE, KB_INDEX_PATH
+from retrieval import VectorIndex, shared_embedder
+
+DOCUMENT_EXTENSIONS = (".md", ".markdown", ".txt", ".jsonl")
+
+# vectors.f32 layout recorded in meta.json; a store without it is rebuilt
+STORE_LAYOUT = "dim_major"
+
+# Used when no documents have been ingested, so a fresh checkout still answers the basics
+DEFAULT_KNOWLEDGE = {
+    "complaint_registration": "To register a complaint, I need your name, mobile number, and complaint details. I can help you with laptop issues, software problems, hardware malfunctions, and other technical grievances.",
+    "status_inquiry": "To check complaint status, I can look up your complaint using your mobile number or complaint ID. Status can be: Registered, In Progress, Under Review, Resolved, or Closed.",
+    "laptop_issues": "Common laptop issues include: slow performance, battery problems, screen issues, keyboard malfunctions, overheating, connectivity problems, and software crashes.",
+    "greeting": "Hello! I'm here to help you with your grievances. I can register complaints and check status of existing complaints. How can I assist you today?"
+}
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _split_long(text: str, max_chars: int, overlap: int) -> List[str]:
+    """Cut a paragraph longer than max_chars into overlapping windows, at word boundaries"""
+    pieces = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            space = text.rfind(" ", start + 1, end)
+            if space > start:
+                end = space
+        pieces.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        next_start = max(end - overlap, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space >= 0 else next_start
+    return [piece for piece in pieces if piece]
+
+
+def split_text(text: str, max_chars: int = KB_CHUNK_CHARS, overlap: int = KB_CHUNK_OVERLAP) -> List[str]:
+    """Pack whole paragraphs (then sentences) into chunks of at most max_chars"""
+    units = []
+    for paragraph in _PARAGRAPH_BREAK_RE.split(text):
+        paragraph = " ".join(paragraph.split())
+        if len(paragraph) <= max_chars:
+            units.append(paragraph)
+            continue
+        for sentence in _SENTENCE_END_RE.split(paragraph):
+            units.extend(_split_long(sentence, max_chars, overlap) if len(sentence) > max_chars else [sentence])
+
+    chunks = []
+    current = ""
+    for unit in filter(None, units):
+        if current and len(current) + 1 + len(unit) > max_chars:
+            chunks.append(current)
+            current = unit
+        else:
+            current = f"{current} {unit}" if current else unit
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _markdown_sections(text: str) -> Iterator[Tuple[str, str]]:
+    """(heading path, body) per section; the path ("Laptop > Battery") gives each chunk its context"""
+    path: List[Tuple[int, str]] = []
+    body: List[str] = []
+    in_code = False
+    for line in text.splitlines():
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+        match = None if in_code else _HEADING_RE.match(line)
+        if match:
+            yield " > ".join(title for _, title in path), "\n".join(body)
+            level = len(match.group(1))
+            path = [(lvl, title) for lvl, title in path if lvl < level] + [(level, match.group(2))]
+            body = []
+        else:
+            body.append(line)
+    yield " > ".join(title for _, title in path), "\n".join(body)
+
+
+def _jsonl_records(text: str, source: str) -> Iterator[Tuple[str, str]]:
+    """(record id, text) per line: question/answer, title/text, or a bare "text" field"""
+    for line_number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{source}:{line_number}: invalid JSON: {e}") from e
+        if "question" in record:
+            body = f"Q: {record['question']}\nA: {record.get('answer', '')}"
+        elif "text" in record:
+            body = f"{record['title']}\n{record['text']}" if record.get("title") else record["text"]
+        else:
+            raise ValueError(f"{source}:{line_number}: expected question/answer or text fields")
+        yield str(record.get("id", line_number)), body
+
+
+def chunk_document(source: str, text: str, max_chars: int = KB_CHUNK_CHARS,
+                   overlap: int = KB_CHUNK_OVERLAP) -> List[Dict]:
+    """Split one document into chunks: dicts with id ("<source>#<n>"), source, hash and text"""
+    extension = os.path.splitext(source)[1].lower()
+    chunks = []
+    if extension == ".jsonl":
+        for record_id, body in _jsonl_records(text, source):
+            pieces = split_text(body, max_chars, overlap)
+            for n, piece in enumerate(pieces):
+                suffix = f".{n}" if len(pieces) > 1 else ""
+                chunks.append({"id": f"{source}#{record_id}{suffix}", "text": piece})
+    else:
+        sections = _markdown_sections(text) if extension in (".md", ".markdown") else [("", text)]
+        for heading, body in sections:
+            # The heading is repeated in each chunk of its section, so budget for it
+            budget = max(max_chars - len(heading) - 2, max_chars // 2) if heading else max_chars
+            for piece in split_text(body, budget, overlap):
+                chunks.append({"id": f"{source}#{len(chunks)}", "text": f"{heading}: {piece}" if heading else piece})
+    for chunk in chunks:
+        chunk["source"] = source
+        chunk["hash"] = content_hash(chunk["text"])
+    return chunks
+
+
+def iter_documents(docs_path: str) -> Iterator[Tuple[str, str]]:
+    """(path relative to docs_path, text) of every supported document, in a stable order"""
+    for root, dirs, files in os.walk(docs_path):
+        dirs.sort()
+        for name in sorted(files):
+            if name.startswith(".") or not name.lower().endswith(DOCUMENT_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, encoding="utf-8") as f:
+                yield os.path.relpath(path, docs_path).replace(os.sep, "/"), f.read()
+
+
+class KnowledgeStore:
+    """Chunk embeddings persisted as a memory-mapped float32 matrix plus a JSONL of chunk metadata.
+
+    vectors.f32 is stored dimension-major (dim x chunks; column i is line i of chunks.jsonl), the
+    layout VectorIndex scores, so the index searches the mapping directly instead of a copy.
+    meta.json (embedder signature, dim, layout, row count) is removed before the data files are
+    replaced and written back last, so a store caught mid-write, built by a different embedder or
+    in the old passage-major layout loads as empty and is rebuilt in full.
+    """
+
+    def __init__(self, directory: str = KB_INDEX_PATH, embedder=None):
+        self.directory = directory
+        self.embedder = embedder or shared_embedder()
+        self.dim = self.embedder.dim
+        self.signature = f"{type(self.embedder).__name__}:{getattr(self.embedder, 'model_name', '')}"
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._chunks_path = os.path.join(directory, "chunks.jsonl")
+        self._meta_path = os.path.join(directory, "meta.json")
+
+    def load(self) -> Tuple[List[Dict], np.ndarray]:
+        """Stored (chunks, vectors); vectors is a read-only (chunks x dim) view of the mapped file"""
+        empty = [], np.zeros((0, self.dim), dtype=np.float32)
+        if not os.path.exists(self._meta_path):
+            return empty
+        with open(self._meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        count = meta.get("count", 0)
+        if (meta.get("signature") != self.signature or meta.get("dim") != self.dim
+                or meta.get("layout") != STORE_LAYOUT or not count):
+            return empty
+        with open(self._chunks_path, encoding="utf-8") as f:
+            chunks = [json.loads(line) for line in f if line.strip()]
+        if len(chunks) != count or os.path.getsize(self._vectors_path) != count * self.dim * 4:
+            return empty
+        return chunks, np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self.dim, count)).T
+
+    def save(self, chunks: List[Dict], vectors: np.ndarray) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(f"{self._vectors_path}.tmp", "wb") as f:
+            f.write(np.ascontiguousarray(np.asarray(vectors, dtype=np.float32).T).tobytes())
+        with open(f"{self._chunks_path}.tmp", "w", encoding="utf-8") as f:
+            for chunk in chunks:
+                f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+        if os.path.exists(self._meta_path):
+            os.remove(self._meta_path)
+        os.replace(f"{self._vectors_path}.tmp", self._vectors_path)
+        os.replace(f"{self._chunks_path}.tmp", self._chunks_path)
+        with open(f"{self._meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"signature": self.signature, "dim": self.dim, "layout": STORE_LAYOUT,
+                       "count": len(chunks)}, f)
+        os.replace(f"{self._meta_path}.tmp", self._meta_path)
+
+
+def ingest(docs_path: str = KB_DOCS_PATH, store: Optional[KnowledgeStore] = None,
+           batch_size: int = KB_EMBED_BATCH_SIZE, rebuild: bool = False) -> Dict:
+    """Bring the store in line with the documents under docs_path, embedding only new chunk texts.
+
+    Returns counts: documents and chunks ingested, chunks embedded, reused (vector kept) and
+    removed (no longer in any document), plus whether the store was rewritten.
+    """
+    start = time.perf_counter()
+    store = store or KnowledgeStore()
+    old_chunks, old_vectors = ([], None) if rebuild else store.load()
+    old_rows = {chunk["hash"]: row for row, chunk in enumerate(old_chunks)}
+
+    documents = 0
+    chunks = []
+    for source, text in iter_documents(docs_path):
+        documents += 1
+        chunks.extend(chunk_document(source, text))
+
+    vectors = np.empty((len(chunks), store.dim), dtype=np.float32)
+    pending: Dict[str, List[int]] = {}
+    for row, chunk in enumerate(chunks):
+        old_row = old_rows.get(chunk["hash"])
+        if old_row is not None:
+            vectors[row] = old_vectors[old_row]
+        else:
+            pending.setdefault(chunk["hash"], []).append(row)
+
+    # Identical texts (say, a disclaimer repeated across FAQs) are embedded once
+    texts = [chunks[rows[0]]["text"] for rows in pending.values()]
+    row_groups = list(pending.values())
+    for offset in range(0, len(texts), batch_size):
+        embedded = store.embedder.embed(texts[offset:offset + batch_size])
+        for rows, vector in zip(row_groups[offset:offset + batch_size], embedded):
+            vectors[rows] = vector
+
+    new_hashes = {chunk["hash"] for chunk in chunks}
+    changed = rebuild or [(c["id"], c["hash"]) for c in chunks] != [(c["id"], c["hash"]) for c in old_chunks]
+    if changed:
+        store.save(chunks, vectors)
+    return {
+        "documents": documents,
+        "chunks": len(chunks),
+        "embedded": len(texts),
+        "reused": len(chunks) - sum(len(rows) for rows in row_groups),
+        "removed": sum(1 for chunk in old_chunks if chunk["hash"] not in new_hashes),
+        "written": bool(changed),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def load_knowledge_index(store: Optional[KnowledgeStore] = None, docs_path: str = KB_DOCS_PATH) -> VectorIndex:
+    """Retrieval index over the ingested knowledge base.
+
+    An empty store is ingested from docs_path first (later document changes are picked up by
+    `python manage.py ingest-kb`); with no documents at all, the built-in DEFAULT_KNOWLEDGE is used.
+    """
+    store = store or KnowledgeStore()
+    chunks, vectors = store.load()
+    if not chunks and os.path.isdir(docs_path):
+        try:
+            ingest(docs_path, store)
+            chunks, vectors = store.load()
+        except (OSError, ValueError) as e:
+            print(f"Error ingesting knowledge base from {docs_path}, using built-in passages: {e}")
+    if not chunks:
+        index = VectorIndex(store.embedder)
+        index.add(DEFAULT_KNOWLEDGE.values(), ids=DEFAULT_KNOWLEDGE.keys())
+        return index
+    return VectorIndex.from_vectors(vectors, [chunk["text"] for chunk in chunks],
+                                    [chunk["id"] for chunk in chunks], store.embedder)
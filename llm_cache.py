@@ -0,0 +1,322 @@
+import asyncio
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from metrics import LLM_REQUESTS, record_llm_response, stats_gauge
+
+from config import (
+    LLM_CACHE_PATH,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_TTL,
+    PROMPT_TEMPLATE_VERSION,
+)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so indentation changes in prompt templates don't miss the cache"""
+    return _WHITESPACE_RE.sub(" ", prompt).strip()
+
+
+def make_key(model_name: str, prompt: str, template_version: str = PROMPT_TEMPLATE_VERSION) -> str:
+    raw = f"{model_name}\0{template_version}\0{normalize_prompt(prompt)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """In-process LRU with TTL in front of an on-disk SQLite store that survives restarts"""
+
+    def __init__(self, path: Optional[str] = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 ttl: float = LLM_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    template_version TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        text = self.get_memory(key)
+        return text if text is not None else self.get_disk(key)
+
+    def get_memory(self, key: str) -> Optional[str]:
+        """In-process lookup only, never touches SQLite; a miss is counted by get_disk"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, text = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def get_disk(self, key: str) -> Optional[str]:
+        """On-disk lookup after a memory miss (blocking SQLite I/O); a hit is promoted into memory"""
+        now = time.time()
+        with self._lock:
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT response, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?",
+                    (key, now),
+                ).fetchone()
+                if row:
+                    self._remember(key, row[1], row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, text: str, model_name: str = "",
+            template_version: str = PROMPT_TEMPLATE_VERSION) -> None:
+        self.persist(key, text, self.remember(key, text), model_name, template_version)
+
+    def remember(self, key: str, text: str) -> float:
+        """Cache in memory only and return the expiry time to persist it with"""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, text)
+        return expires_at
+
+    def persist(self, key: str, text: str, expires_at: float, model_name: str = "",
+                template_version: str = PROMPT_TEMPLATE_VERSION) -> None:
+        """Write an entry to the on-disk store (blocking SQLite I/O and a commit)"""
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, template_version, response, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, template_version, text, expires_at),
+            )
+            self._conn.commit()
+
+    def _remember(self, key: str, expires_at: float, text: str) -> None:
+        self._entries[key] = (expires_at, text)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, model_name: Optional[str] = None,
+                   template_version: Optional[str] = None) -> None:
+        """Drop everything, or only disk entries that don't match the current model/template version"""
+        with self._lock:
+            self._entries.clear()
+            if self._conn is None:
+                return
+            if model_name is None and template_version is None:
+                self._conn.execute("DELETE FROM llm_cache")
+            else:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE expires_at <= ? OR model != ? OR template_version != ?",
+                    (time.time(), model_name or "", template_version or PROMPT_TEMPLATE_VERSION),
+                )
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_shared_cache: Optional[LLMResponseCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache() -> LLMResponseCache:
+    """The one cache instance shared by every chatbot in this process"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = LLMResponseCache()
+            stats_gauge(
+                "llm_cache_stats", "Gemini response cache entries, hits (memory and disk), misses and evictions",
+                _shared_cache.stats, ["entries", "hits", "disk_hits", "misses", "evictions"],
+            )
+        return _shared_cache
+
+
+class CachedResponse:
+    """Minimal stand-in for a GenerateContentResponse served from the cache"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _Flight:
+    """One upstream call that concurrent identical prompts wait on"""
+
+    __slots__ = ("done", "response", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+def _cacheable_text(response) -> Optional[str]:
+    try:
+        return response.text
+    except Exception:
+        # Blocked or empty candidates: nothing worth caching
+        return None
+
+
+class CachedModel:
+    """Wraps a GenerativeModel so plain generate_content calls go through the shared cache.
+
+    Identical prompts that miss the cache while a call for them is already in flight wait
+    for that call instead of making their own (singleflight).
+    """
+
+    def __init__(self, model, model_name: str, cache: Optional[LLMResponseCache] = None,
+                 template_version: str = PROMPT_TEMPLATE_VERSION):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache or get_shared_cache()
+        self.template_version = template_version
+        self.coalesced = 0
+        self._flights: Dict[str, _Flight] = {}
+        self._async_flights: Dict[str, "asyncio.Future"] = {}
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        # Only plain string prompts are cacheable; streaming and custom configs go straight through
+        if kwargs or not isinstance(prompt, str):
+            LLM_REQUESTS.inc(model=self.model_name, outcome="passthrough")
+            return self.model.generate_content(prompt, **kwargs)
+
+        key = make_key(self.model_name, prompt, self.template_version)
+        text = self.cache.get(key)
+        if text is not None:
+            LLM_REQUESTS.inc(model=self.model_name, outcome="cache_hit")
+            return CachedResponse(text)
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            LLM_REQUESTS.inc(model=self.model_name, outcome="coalesced")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+
+        try:
+            flight.response = self._call(key, prompt)
+            return flight.response
+        except Exception as e:
+            LLM_REQUESTS.inc(model=self.model_name, outcome="error")
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _call(self, key: str, prompt: str):
+        start = time.perf_counter()
+        response = self.model.generate_content(prompt)
+        record_llm_response(self.model_name, prompt, response, time.perf_counter() - start)
+        self._store(key, response)
+        return response
+
+    def _store(self, key: str, response) -> None:
+        text = _cacheable_text(response)
+        if text:
+            self.cache.set(key, text, self.model_name, self.template_version)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        """Async counterpart of generate_content sharing the same cache; its SQLite reads and
+        writes run on the default executor so they never block the event loop"""
+        if kwargs or not isinstance(prompt, str):
+            LLM_REQUESTS.inc(model=self.model_name, outcome="passthrough")
+            return await self.model.generate_content_async(prompt, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        key = make_key(self.model_name, prompt, self.template_version)
+        text = self.cache.get_memory(key)
+        if text is None:
+            text = await loop.run_in_executor(None, self.cache.get_disk, key)
+        if text is not None:
+            LLM_REQUESTS.inc(model=self.model_name, outcome="cache_hit")
+            return CachedResponse(text)
+
+        future = self._async_flights.get(key)
+        if future is not None and future.get_loop() is loop:
+            self.coalesced += 1
+            LLM_REQUESTS.inc(model=self.model_name, outcome="coalesced")
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Only carry on if it was the leader that got cancelled, not this caller
+                if not future.cancelled():
+                    raise
+            return await self.generate_content_async(prompt)
+
+        future = self._async_flights[key] = loop.create_future()
+        try:
+            start = time.perf_counter()
+            response = await self.model.generate_content_async(prompt)
+            record_llm_response(self.model_name, prompt, response, time.perf_counter() - start)
+            text = _cacheable_text(response)
+            # In memory before the flight ends, so a repeat of the prompt hits instead of calling again
+            expires_at = self.cache.remember(key, text) if text else None
+            future.set_result(response)
+        except Exception as e:
+            LLM_REQUESTS.inc(model=self.model_name, outcome="error")
+            future.set_exception(e)
+            # Followers retrieve it; don't let an unawaited future log a warning
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            if self._async_flights.get(key) is future:
+                del self._async_flights[key]
+
+        if expires_at is not None:
+            await loop.run_in_executor(
+                None, self.cache.persist, key, text, expires_at, self.model_name, self.template_version
+            )
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
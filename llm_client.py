@@ -0,0 +1,486 @@
+"""Gemini calls that stay within quota and fail fast while the upstream is unhealthy.
+
+ResilientModel wraps a GenerativeModel (below the response cache, so cache hits cost no quota)
+with a token bucket, an adaptive (AIMD) concurrency cap, retries with exponential backoff and
+full jitter, a deadline per call and a circuit breaker. Errors it gives up on are re-raised;
+the chatbot answers those turns from local fallbacks.
+"""
+import asyncio
+import inspect
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Dict, Optional
+
+from config import (
+    GEMINI_MODEL,
+    LLM_BACKOFF_BASE,
+    LLM_BACKOFF_MAX,
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_RESET,
+    LLM_CALL_TIMEOUT,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_MIN_CONCURRENCY,
+    LLM_RATE_BURST,
+    LLM_RATE_LIMIT_RPM,
+)
+from metrics import LLM_CLIENT_EVENTS, LLM_FALLBACKS, stats_gauge
+
+# HTTP statuses (google.api_core exceptions carry them as `code`) worth retrying
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+# Of those, the ones that mean "send less": they shrink the concurrency limit
+OVERLOAD_CODES = {429, 503}
+
+
+class LLMUnavailable(Exception):
+    """Raised without calling upstream: circuit open, no quota or slot before the deadline, or deadline hit"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Gemini unavailable: {reason}")
+        self.reason = reason
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    code = getattr(exc, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    return isinstance(exc, (TimeoutError, asyncio.TimeoutError, ConnectionError)) or _status_code(exc) in RETRYABLE_CODES
+
+
+def is_overload(exc: BaseException) -> bool:
+    return isinstance(exc, (TimeoutError, asyncio.TimeoutError)) or _status_code(exc) in OVERLOAD_CODES
+
+
+def report_llm_failure(stage: str, error: Exception) -> None:
+    """Count a chatbot stage served by its local fallback; fast failures (LLMUnavailable) aren't logged"""
+    LLM_FALLBACKS.inc(stage=stage)
+    if not isinstance(error, LLMUnavailable):
+        print(f"Gemini call failed in {stage}: {error}")
+
+
+class TokenBucket:
+    """`rate` tokens per second up to `burst`; callers reserve a token and sleep until it is theirs"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """Seconds to wait before the reserved token may be used, or None (nothing reserved) if over max_wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens go negative while reservations queue up, which keeps them first come first served
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+
+class AdaptiveConcurrency:
+    """Concurrency cap that grows by 1/limit per success and halves on overload (at most once per cooldown).
+
+    Usable from threads and from event loops at the same time: sync callers wait on a condition,
+    async callers on a future resolved from whichever thread frees a slot.
+    """
+
+    def __init__(self, minimum: int = LLM_MIN_CONCURRENCY, maximum: int = LLM_MAX_CONCURRENCY,
+                 cooldown: float = 1.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.cooldown = cooldown
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._async_waiters: deque = deque()
+
+    def _try_acquire(self) -> bool:
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def acquire(self, timeout: float) -> bool:
+        with self._cond:
+            return self._cond.wait_for(self._try_acquire, timeout)
+
+    async def acquire_async(self, timeout: float) -> bool:
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if self._try_acquire():
+                    return True
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    return False
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                if not waiter.done():
+                    waiter.cancel()
+
+    def release(self, success: bool = True, overloaded: bool = False) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if overloaded:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = now
+            elif success:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            free = int(self.limit) - self.in_flight
+            if free <= 0:
+                return
+            self._cond.notify(free)
+            # Woken tasks re-check under the lock, so a wakeup lost to a thread is harmless
+            while free and self._async_waiters:
+                loop, waiter = self._async_waiters.popleft()
+                if not waiter.done():
+                    loop.call_soon_threadsafe(_wake, waiter)
+                    free -= 1
+
+
+def _wake(waiter: "asyncio.Future") -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; after `reset_timeout` one probe call decides"""
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_timeout: float = LLM_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> bool:
+        """Count a failure; True if this one opened the circuit"""
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self.trips += 1
+                return True
+            return False
+
+    def cancel(self) -> None:
+        """The allowed call never reached upstream; let another caller probe"""
+        with self._lock:
+            self._probing = False
+
+
+class _SlotStream:
+    """A streaming response that holds its concurrency slot until it is exhausted, fails or is closed.
+
+    A consumer that stops part-way frees the slot when its iterator is closed or garbage-collected.
+    `chunks`, if given, replaces iterating the response itself (sync reads bounded by the deadline).
+    """
+
+    def __init__(self, response, end, chunks=None):
+        self._response = response
+        self._chunks = response if chunks is None else chunks
+        self._end = end
+        self._ended = False
+        self._lock = threading.Lock()
+
+    def _release(self, error: Optional[BaseException]) -> None:
+        with self._lock:
+            if self._ended:
+                return
+            self._ended = True
+        self._end(error)
+
+    def __iter__(self):
+        try:
+            for chunk in self._chunks:
+                yield chunk
+        except BaseException as e:
+            self._release(e)
+            raise
+        self._release(None)
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._response:
+                yield chunk
+        except BaseException as e:
+            self._release(e)
+            raise
+        self._release(None)
+
+    def close(self) -> None:
+        """Give up on the rest of the stream and free its slot"""
+        self._release(GeneratorExit())
+
+    def __del__(self):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class ResilientModel:
+    """GenerativeModel wrapper applying quota, concurrency, retry, deadline and circuit-breaker policy.
+
+    Streaming calls are admitted the same way but not retried once chunks start arriving; they keep
+    their concurrency slot until the stream has been read to the end or closed.
+    """
+
+    def __init__(self, model, model_name: str = GEMINI_MODEL, rate_limit_rpm: float = LLM_RATE_LIMIT_RPM,
+                 burst: int = LLM_RATE_BURST, timeout: float = LLM_CALL_TIMEOUT,
+                 max_retries: int = LLM_MAX_RETRIES, backoff_base: float = LLM_BACKOFF_BASE,
+                 backoff_max: float = LLM_BACKOFF_MAX, concurrency: Optional[AdaptiveConcurrency] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.model = model
+        self.model_name = model_name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(rate_limit_rpm / 60, burst)
+        self.concurrency = concurrency or AdaptiveConcurrency()
+        self.breaker = breaker or CircuitBreaker()
+        # The SDK only accepts a per-request timeout from 0.4 on. With older ones, sync calls run on
+        # worker threads that the caller stops waiting for at the deadline (async ones use wait_for).
+        self._request_options = "request_options" in inspect.signature(model.generate_content).parameters
+        self._workers = None
+        if not self._request_options:
+            self._workers = ThreadPoolExecutor(2 * self.concurrency.maximum, thread_name_prefix="gemini")
+            print(f"{model_name}: SDK has no per-request timeout; sync call deadlines are enforced from worker threads")
+        self._random = random.Random()
+
+    def _event(self, event: str) -> None:
+        LLM_CLIENT_EVENTS.inc(model=self.model_name, event=event)
+
+    def _backoff(self, attempt: int) -> float:
+        return self._random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _check_breaker(self) -> None:
+        if not self.breaker.allow():
+            self._event("circuit_open")
+            raise LLMUnavailable("circuit open")
+
+    def _reserve_token(self, deadline: float) -> float:
+        wait = self.bucket.reserve(deadline - time.monotonic())
+        if wait is None:
+            self.breaker.cancel()
+            self._event("rate_limited")
+            raise LLMUnavailable("rate limit")
+        if wait:
+            self._event("throttled")
+        return wait
+
+    def _no_slot(self) -> LLMUnavailable:
+        self.breaker.cancel()
+        self._event("no_slot")
+        return LLMUnavailable("concurrency limit")
+
+    def _call_kwargs(self, kwargs: Dict, deadline: float) -> Dict:
+        if self._request_options and "request_options" not in kwargs:
+            return {**kwargs, "request_options": {"timeout": max(0.001, deadline - time.monotonic())}}
+        return kwargs
+
+    def _bounded(self, deadline: float, call, *args, **kwargs):
+        """Run a blocking SDK call, raising TimeoutError at the deadline (the call itself is left to finish)"""
+        if self._workers is None:
+            return call(*args, **kwargs)
+        future = self._workers.submit(call, *args, **kwargs)
+        try:
+            return future.result(max(0.001, deadline - time.monotonic()))
+        except FutureTimeout:
+            # Still queued behind hung calls: never start it
+            future.cancel()
+            raise TimeoutError(f"no response from Gemini within {self.timeout:g}s") from None
+
+    def _bounded_chunks(self, response, deadline: float):
+        chunks = iter(response)
+        end = object()
+        while True:
+            chunk = self._bounded(deadline, next, chunks, end)
+            if chunk is end:
+                return
+            yield chunk
+
+    def _finish(self, error: Optional[BaseException]) -> bool:
+        """Update breaker and concurrency after an attempt; True if the error is worth retrying"""
+        if error is None or not is_retryable(error):
+            # Any answer from upstream, even a rejection of this prompt, means it is healthy
+            self.breaker.record_success()
+            self.concurrency.release(success=error is None)
+            return False
+        overloaded = is_overload(error)
+        self.concurrency.release(success=False, overloaded=overloaded)
+        self._event("timeout" if isinstance(error, (TimeoutError, asyncio.TimeoutError)) else "upstream_error")
+        if self.breaker.record_failure():
+            self._event("circuit_trip")
+        return True
+
+    def _abandon(self) -> None:
+        """The attempt was interrupted (cancelled, closed, KeyboardInterrupt): free the slot, blame nobody"""
+        self.breaker.cancel()
+        self.concurrency.release(success=False)
+
+    def _end_stream(self, error: Optional[BaseException]) -> None:
+        if error is None or isinstance(error, Exception):
+            self._finish(error)
+        else:
+            self._abandon()
+
+    def _admitted(self, response, kwargs: Dict, chunks=None):
+        """A successful attempt's response; a stream takes over the slot and releases it once read"""
+        if kwargs.get("stream"):
+            return _SlotStream(response, self._end_stream, chunks)
+        self._finish(None)
+        return response
+
+    def _retry_delay(self, attempt: int, deadline: float) -> Optional[float]:
+        if attempt >= self.max_retries or self.breaker.state == CircuitBreaker.OPEN:
+            return None
+        delay = self._backoff(attempt)
+        if time.monotonic() + delay >= deadline:
+            return None
+        self._event("retry")
+        return delay
+
+    def generate_content(self, prompt, **kwargs):
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            self._check_breaker()
+            time.sleep(self._reserve_token(deadline))
+            if not self.concurrency.acquire(deadline - time.monotonic()):
+                raise self._no_slot()
+            try:
+                response = self._bounded(deadline, self.model.generate_content, prompt,
+                                         **self._call_kwargs(kwargs, deadline))
+            except Exception as e:
+                if not self._finish(e):
+                    raise
+                delay = self._retry_delay(attempt, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self._abandon()
+                raise
+            chunks = self._bounded_chunks(response, deadline) if self._workers and kwargs.get("stream") else None
+            return self._admitted(response, kwargs, chunks)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            self._check_breaker()
+            await asyncio.sleep(self._reserve_token(deadline))
+            if not await self.concurrency.acquire_async(deadline - time.monotonic()):
+                raise self._no_slot()
+            try:
+                response = await asyncio.wait_for(
+                    self.model.generate_content_async(prompt, **self._call_kwargs(kwargs, deadline)),
+                    max(0.001, deadline - time.monotonic()),
+                )
+            except Exception as e:
+                if not self._finish(e):
+                    raise
+                delay = self._retry_delay(attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self._abandon()
+                raise
+            return self._admitted(response, kwargs)
+
+    def stats(self) -> Dict:
+        return {
+            "concurrency_limit": int(self.concurrency.limit),
+            "in_flight": self.concurrency.in_flight,
+            "breaker_state": self.breaker.state,
+            "breaker_open": int(self.breaker.state == CircuitBreaker.OPEN),
+            "consecutive_failures": self.breaker.failures,
+            "breaker_trips": self.breaker.trips,
+        }
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+_shared_models: Dict[str, ResilientModel] = {}
+_shared_models_lock = threading.Lock()
+_configured_key: Optional[str] = None
+
+
+def configure_gemini(api_key: str) -> None:
+    """Configure the SDK once per key; importing it costs about half a second, so it waits until now"""
+    global _configured_key
+    with _shared_models_lock:
+        if _configured_key != api_key:
+            import google.generativeai as genai
+
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
+
+
+def get_resilient_model(model_name: str = GEMINI_MODEL) -> ResilientModel:
+    """The one client per model in this process, so every chatbot draws on the same quota"""
+    with _shared_models_lock:
+        client = _shared_models.get(model_name)
+        if client is None:
+            import google.generativeai as genai
+
+            client = _shared_models[model_name] = ResilientModel(genai.GenerativeModel(model_name), model_name)
+            stats_gauge(
+                "llm_client_state", "Gemini client concurrency limit, in-flight calls and breaker state",
+                client.stats, ["concurrency_limit", "in_flight", "breaker_open", "consecutive_failures"],
+            )
+        return client
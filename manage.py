@@ -0,0 +1,89 @@
+import argparse
+
+
+def train_intents(args):
+    from intent_classifier import save_model, train_model
+
+    save_model(train_model(args.data), args.output)
+    print(f"✅ Intent classifier trained from {args.data} and saved to {args.output}")
+
+
+def migrate(args):
+    from database import Base, engine, migrate as run_migrations
+
+    Base.metadata.create_all(bind=engine)
+    version = run_migrations()
+    print(f"✅ Database schema is at version {version}")
+
+
+def rebuild_search(args):
+    from database import create_tables, rebuild_search_index
+
+    create_tables()
+    rows = rebuild_search_index()
+    print(f"✅ Full-text search index rebuilt over {rows} complaints")
+
+
+def rebuild_stats(args):
+    from database import create_tables, rebuild_daily_counts
+
+    create_tables()
+    rows = rebuild_daily_counts()
+    print(f"✅ Daily complaint counts rebuilt ({rows} day/status rows)")
+
+
+def index_complaints(args):
+    from database import SessionLocal, create_tables
+    from duplicates import DuplicateDetector
+
+    create_tables()
+    detector = DuplicateDetector()
+    with SessionLocal() as db:
+        added = detector.index_existing(db)
+    print(f"✅ Embedded {added} complaints; duplicate index holds {len(detector.store)}")
+
+
+def ingest_kb(args):
+    from knowledge_base import KnowledgeStore, ingest
+
+    stats = ingest(args.docs, KnowledgeStore(args.output), rebuild=args.rebuild)
+    print(f"✅ Knowledge base: {stats['chunks']} chunks from {stats['documents']} documents "
+          f"({stats['embedded']} embedded, {stats['reused']} reused, {stats['removed']} removed) "
+          f"in {stats['seconds']:.2f}s")
+
+
+def main():
+    from config import INTENT_DATA_PATH, INTENT_MODEL_PATH, KB_DOCS_PATH, KB_INDEX_PATH
+
+    parser = argparse.ArgumentParser(description="Grievance bot maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train = subparsers.add_parser("train-intents", help="Retrain the local intent classifier")
+    train.add_argument("--data", default=INTENT_DATA_PATH)
+    train.add_argument("--output", default=INTENT_MODEL_PATH)
+    train.set_defaults(func=train_intents)
+
+    migrate_parser = subparsers.add_parser("migrate", help="Create tables and apply pending schema migrations")
+    migrate_parser.set_defaults(func=migrate)
+
+    rebuild = subparsers.add_parser("rebuild-search", help="Rebuild and optimize the complaint full-text index")
+    rebuild.set_defaults(func=rebuild_search)
+
+    stats = subparsers.add_parser("rebuild-stats", help="Backfill the daily complaint counts behind GET /stats")
+    stats.set_defaults(func=rebuild_stats)
+
+    index = subparsers.add_parser("index-complaints", help="Embed existing complaints for duplicate detection")
+    index.set_defaults(func=index_complaints)
+
+    kb = subparsers.add_parser("ingest-kb", help="Chunk and embed knowledge base documents (changed chunks only)")
+    kb.add_argument("--docs", default=KB_DOCS_PATH)
+    kb.add_argument("--output", default=KB_INDEX_PATH)
+    kb.add_argument("--rebuild", action="store_true", help="re-embed every chunk")
+    kb.set_defaults(func=ingest_kb)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
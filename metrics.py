@@ -0,0 +1,353 @@
+"""Process-wide counters and histograms rendered in the Prometheus text format.
+
+Kept dependency-free: a few metric types, one registry, an ASGI middleware for request
+latency and SQLAlchemy hooks for query timings.
+"""
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; covers sub-millisecond cache hits up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return lines + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Set directly, or computed at scrape time by `function` returning {label values: value}"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> List[str]:
+        if self.function is not None:
+            try:
+                items = sorted(self.function().items())
+            except Exception:
+                return []
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, ([*series[0]], series[1], series[2])) for key, series in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = _labels(self.labelnames, key, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            # Re-registering a name (e.g. on module reload) returns the existing metric
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = (), function=None) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames, function))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# Chatbot
+STAGE_SECONDS = histogram("chatbot_stage_seconds", "Time spent in each chatbot stage", ["stage"])
+TTFT_SECONDS = histogram("chatbot_time_to_first_chunk_seconds", "Time to the first streamed reply chunk")
+
+# LLM
+LLM_REQUESTS = counter("llm_requests_total", "Gemini generate_content calls by outcome",
+                       ["model", "outcome"])
+LLM_TOKENS = counter("llm_tokens_total", "Tokens sent to and received from Gemini", ["model", "kind"])
+LLM_SECONDS = histogram("llm_request_seconds", "Latency of upstream Gemini calls", ["model"])
+LLM_CLIENT_EVENTS = counter("llm_client_events_total",
+                            "Gemini client throttling, retries, timeouts and circuit breaker activity",
+                            ["model", "event"])
+LLM_BATCH_SIZE = histogram("llm_batch_size", "Requests answered by each micro-batched Gemini call", ["kind"],
+                           buckets=(1, 2, 4, 8, 16, 32, 64))
+LLM_FALLBACKS = counter("llm_fallbacks_total", "Chatbot stages answered locally because Gemini failed", ["stage"])
+
+# Database and HTTP
+DB_WRITE_BATCH_SIZE = histogram("db_write_batch_size", "Registrations committed by each group commit",
+                                buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+DB_QUERY_SECONDS = histogram("db_query_seconds", "SQL statement execution time", ["engine", "statement"])
+HTTP_REQUEST_SECONDS = histogram("http_request_seconds", "HTTP request latency until the response completes",
+                                 ["method", "route", "status"])
+HTTP_IN_FLIGHT = gauge("http_requests_in_flight", "HTTP requests currently being served")
+
+
+def timed(stage: str):
+    """Decorator recording a function's (or coroutine's) duration as a chatbot stage"""
+    def decorate(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+            return timed_async
+
+        @wraps(func)
+        def timed_sync(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+        return timed_sync
+    return decorate
+
+
+def record_llm_response(model_name: str, prompt: str, response, seconds: float) -> None:
+    """Count an upstream call and its tokens (usage metadata when the SDK reports it, else ~4 chars/token)"""
+    LLM_REQUESTS.inc(model=model_name, outcome="upstream")
+    LLM_SECONDS.observe(seconds, model=model_name)
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) if usage is not None else 0
+    completion_tokens = getattr(usage, "candidates_token_count", 0) if usage is not None else 0
+    if not prompt_tokens:
+        prompt_tokens = len(prompt) // 4
+    if not completion_tokens:
+        try:
+            completion_tokens = len(response.text) // 4
+        except Exception:
+            completion_tokens = 0
+    LLM_TOKENS.inc(prompt_tokens, model=model_name, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model_name, kind="completion")
+
+
+def instrument_engine(engine, name: str) -> None:
+    """Time every statement on a (sync) SQLAlchemy engine, labelled by its leading keyword"""
+    from sqlalchemy import event
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if starts:
+            keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+            DB_QUERY_SECONDS.observe(time.perf_counter() - starts.pop(), engine=name, statement=keyword)
+
+    def on_error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+    event.listen(engine, "handle_error", on_error)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request, labelled by route template to bound cardinality"""
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[Callable, str] = {}
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            for candidate in getattr(scope.get("app"), "routes", ()):
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    route = candidate.path
+                    break
+            else:
+                route = getattr(endpoint, "__name__", "unknown")
+            self._routes[endpoint] = route
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=self._route(scope),
+                status=str(status[0]),
+            )
+
+
+def stats_gauge(name: str, documentation: str, stats: Callable[[], Dict], keys: Iterable[str]) -> Gauge:
+    """Expose selected numeric fields of a stats() dict as one gauge labelled by field; missing fields are skipped"""
+    keys = tuple(keys)
+
+    def collect() -> Dict[Tuple[str, ...], float]:
+        values = stats()
+        return {(key,): values[key] for key in keys if key in values}
+
+    return gauge(name, documentation, ["field"], function=collect)
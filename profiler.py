@@ -0,0 +1,81 @@
+"""Low-overhead sampling profiler for hot-path investigation in a running process.
+
+A background thread snapshots every other thread's Python stack at a fixed interval and
+counts identical stacks. Output is the "collapsed" format read by flamegraph.pl and
+speedscope: one `frame;frame;frame count` line per distinct stack.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from config import PROFILE_SAMPLE_INTERVAL
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    """Samples all thread stacks every `interval` seconds between start() and stop()"""
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Held while checking/starting and while stopping/collecting, so two callers can't both
+        # pass the running check, and a new start can't reset the stacks a stop is returning
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                raise RuntimeError("Profiler is already running")
+            self.samples = 0
+            self.stacks.clear()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> str:
+        with self._lock:
+            self._stop.set()
+            if self._thread:
+                self._thread.join()
+            return self.collapsed()
+
+    def profile(self, seconds: float) -> str:
+        """Sample for `seconds` (blocking the caller) and return collapsed stacks"""
+        self.start()
+        time.sleep(seconds)
+        return self.stop()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# One profile at a time per process
+profiler = SamplingProfiler()
@@ -1,110 +1,142 @@
-import google.generativeai as genai
-import requests
 import json
 import re
-from typing import Dict, List, Optional
-from config import GEMINI_API_KEY, API_BASE_URL, BOT_RESPONSES
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+from config import GEMINI_API_KEY, GEMINI_MODEL, API_BASE_URL, API_TIMEOUT, CHATBOT_BACKEND, BOT_RESPONSES, RETRIEVAL_TOP_K, RETRIEVAL_MIN_SCORE, LLM_ANSWERS_ENABLED
+from knowledge_base import load_knowledge_index
+from batching import MicroBatcher
+from intent_classifier import IntentClassifier
+from slot_extraction import SlotExtractor
+from llm_cache import CachedModel
+from llm_client import configure_gemini, get_resilient_model, report_llm_failure
+from session_store import SessionRecord, SessionStore, make_session_store
+from metrics import STAGE_SECONDS, TTFT_SECONDS, timed
 import os
 
-class SimpleRAGChatbot:
-    def __init__(self):
-        # Check API key
-        api_key = GEMINI_API_KEY or os.getenv("GEMINI_API_KEY", "")
-        if not api_key or api_key == "your_gemini_api_key_here":
-            raise ValueError("Gemini API key not found or not set properly.")
-        
-        # Configure Gemini
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        # Simple keyword-based knowledge base (no embeddings needed)
-        self.knowledge_base = {
-            "complaint_registration": "To register a complaint, I need your name, mobile number, and complaint details. I can help you with laptop issues, software problems, hardware malfunctions, and other technical grievances.",
-            "status_inquiry": "To check complaint status, I can look up your complaint using your mobile number or complaint ID. Status can be: Registered, In Progress, Under Review, Resolved, or Closed.",
-            "laptop_issues": "Common laptop issues include: slow performance, battery problems, screen issues, keyboard malfunctions, overheating, connectivity problems, and software crashes.",
-            "greeting": "Hello! I'm here to help you with your grievances. I can register complaints and check status of existing complaints. How can I assist you today?"
-        }
-        
-        # Conversation state
-        self.conversation_state = {}
-        self.pending_registrations = {}
-    
-    def _get_relevant_context(self, query: str) -> str:
-        """Simple keyword-based context retrieval"""
-        query_lower = query.lower()
-        context_parts = []
-        
-        # Check for keywords and add relevant context
-        if any(word in query_lower for word in ["register", "complaint", "issue", "problem", "laptop"]):
-            context_parts.append(self.knowledge_base["complaint_registration"])
-            
-        if any(word in query_lower for word in ["status", "check", "complaint"]):
-            context_parts.append(self.knowledge_base["status_inquiry"])
-            
-        if any(word in query_lower for word in ["hello", "hi", "hey", "greet"]):
-            context_parts.append(self.knowledge_base["greeting"])
-            
-        return " ".join(context_parts)
-    
-    def _classify_intent(self, user_message: str) -> str:
-        """Classify user intent using Gemini with simple context"""
-        context = self._get_relevant_context(user_message)
-        
-        prompt = f"""
-        Analyze the following user message and classify the intent. Return only one of these intents:
+REGISTRATION_SLOTS = ["name", "mobile", "complaint_details"]
+REGISTRATION_START_PROMPT = "I'll help you register a complaint. Let me collect some information.\n\nFirst, could you please provide your full name?"
+DETAILS_REPROMPT = ("I still need a description of the problem to register your complaint. "
+                    "Please describe your complaint or issue in detail.")
+STATUS_MISSING_PROMPT = "To check your complaint status, please provide your mobile number or complaint ID."
+STREAM_TIMING_WINDOW = 1000
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+def parse_intent(text: str) -> str:
+    """Map a free-text model reply onto one of the known intents"""
+    intent = text.strip().lower()
+    if "complaint_registration" in intent:
+        return "complaint_registration"
+    elif "status_inquiry" in intent:
+        return "status_inquiry"
+    elif "greeting" in intent:
+        return "greeting"
+    else:
+        return "unknown"
+
+def build_intent_batch_prompt(messages: List[str], contexts: List[str]) -> str:
+    """One prompt classifying several messages, each with its own retrieved context"""
+    numbered = "\n".join(
+        f"        {number}. Context: {context}\n           User message: {json.dumps(message)}"
+        for number, (message, context) in enumerate(zip(messages, contexts), start=1)
+    )
+    return f"""
+        Classify the intent of each numbered user message. Use only these intents:
         - complaint_registration: User wants to register a new complaint
         - status_inquiry: User wants to check complaint status
         - greeting: User is greeting or asking general questions
         - unknown: Intent is unclear
         
-        Context: {context}
-        User message: "{user_message}"
+        Respond with only a JSON object that maps each message number to its intent,
+        for example {{"1": "greeting", "2": "status_inquiry"}}.
         
-        Intent:
+        Messages:
+{numbered}
         """
+
+def parse_intent_batch(text: str, count: int) -> List:
+    """Per-message intents from a batch reply; a message the reply left out gets a ValueError"""
+    match = _JSON_OBJECT_RE.search(text or "")
+    try:
+        data = json.loads(match.group()) if match else None
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return [ValueError("Batch intent reply is not a JSON object")] * count
+    return [
+        parse_intent(data[str(number)]) if isinstance(data.get(str(number)), str)
+        else ValueError(f"Batch intent reply has no entry {number}")
+        for number in range(1, count + 1)
+    ]
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an unsorted sample (0.0 when empty)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def format_status_result(result: Dict) -> str:
+    """Render a status lookup result (or its error) as a chat reply"""
+    if "error" in result:
+        return f"Sorry, I couldn't find your complaint. {result['error']}"
+    return f"""Here's your complaint status:
+                    
+**Complaint ID:** {result['complaint_id']}
+**Name:** {result['name']}
+**Mobile:** {result['mobile']}
+**Status:** {result['status']}
+**Complaint:** {result['complaint_details']}
+**Registered on:** {result['created_at']}"""
+
+def format_registration_result(result: Dict, registration: Dict) -> str:
+    """Render a registration result (or its error) as a chat reply"""
+    if "error" in result:
+        return f"Sorry, there was an error registering your complaint: {result['error']}"
+    if result.get("duplicate"):
+        return f"""ℹ️ **You've already reported this issue.**
+
+It matches your open complaint **{result['id']}**, so I've added these details to it instead of opening a new one. You can check its progress with Complaint ID **{result['id']}**."""
+    return f"""✅ **Complaint Registered Successfully!**
+
+**Complaint ID:** {result['id']}
+**Name:** {registration['name']}
+**Mobile:** {registration['mobile']}
+**Issue:** {registration['complaint_details']}
+
+Please save your Complaint ID: **{result['id']}** for future reference. You can use it to check the status of your complaint anytime."""
+
+class ComplaintBackend:
+    """Where the chatbot registers and looks up complaints; results are API-shaped dicts"""
+    
+    def register_complaint(self, name: str, mobile: str, complaint_details: str) -> Dict:
+        raise NotImplementedError
+    
+    def get_complaint_status(self, mobile: str = None, complaint_id: int = None) -> Dict:
+        raise NotImplementedError
+
+class HTTPComplaintBackend(ComplaintBackend):
+    """Calls the grievance API over HTTP (keep-alive session)"""
+    
+    def __init__(self, base_url: str = API_BASE_URL, timeout: float = API_TIMEOUT):
+        self.base_url = base_url
+        self.timeout = timeout
+        import requests
         
-        try:
-            response = self.model.generate_content(prompt)
-            intent = response.text.strip().lower()
-            
-            if "complaint_registration" in intent:
-                return "complaint_registration"
-            elif "status_inquiry" in intent:
-                return "status_inquiry"
-            elif "greeting" in intent:
-                return "greeting"
-            else:
-                return "unknown"
-        except Exception as e:
-            print(f"Error in intent classification: {e}")
-            return "unknown"
-    
-    def _extract_information(self, user_message: str, info_type: str) -> Optional[str]:
-        """Extract specific information from user message using Gemini"""
-        prompts = {
-            "name": f"Extract the person's name from this message. Return only the name or 'None' if not found: {user_message}",
-            "mobile": f"Extract the mobile/phone number from this message. Return only the number or 'None' if not found: {user_message}",
-            "complaint_details": f"Extract the complaint or issue details from this message. Return the details or 'None' if not found: {user_message}"
-        }
-        
-        try:
-            response = self.model.generate_content(prompts[info_type])
-            extracted = response.text.strip()
-            return extracted if extracted.lower() != "none" else None
-        except Exception as e:
-            print(f"Error extracting {info_type}: {e}")
-            return None
+        self.session = requests.Session()
     
-    def _register_complaint_api(self, name: str, mobile: str, complaint_details: str) -> Dict:
+    def register_complaint(self, name: str, mobile: str, complaint_details: str) -> Dict:
         """Call API to register complaint"""
         try:
-            response = requests.post(
-                f"{API_BASE_URL}/register_complaint",
+            response = self.session.post(
+                f"{self.base_url}/register_complaint",
                 json={
                     "name": name,
                     "mobile": mobile,
                     "complaint_details": complaint_details
-                }
+                },
+                timeout=self.timeout
             )
             if response.status_code == 200:
                 return response.json()
@@ -113,13 +145,13 @@ class SimpleRAGChatbot:
         except Exception as e:
             return {"error": f"API call failed: {str(e)}"}
     
-    def _get_complaint_status_api(self, mobile: str = None, complaint_id: int = None) -> Dict:
+    def get_complaint_status(self, mobile: str = None, complaint_id: int = None) -> Dict:
         """Call API to get complaint status"""
         try:
             if complaint_id:
-                response = requests.get(f"{API_BASE_URL}/complaint_status/{complaint_id}")
+                response = self.session.get(f"{self.base_url}/complaint_status/{complaint_id}", timeout=self.timeout)
             elif mobile:
-                response = requests.get(f"{API_BASE_URL}/complaint_status_by_mobile/{mobile}")
+                response = self.session.get(f"{self.base_url}/complaint_status_by_mobile/{mobile}", timeout=self.timeout)
             else:
                 return {"error": "Either mobile number or complaint ID is required"}
             
@@ -129,99 +161,409 @@ class SimpleRAGChatbot:
                 return {"error": "Complaint not found"}
         except Exception as e:
             return {"error": f"API call failed: {str(e)}"}
+
+class InProcessComplaintBackend(ComplaintBackend):
+    """Runs the API's service logic directly against the database, skipping the HTTP hop"""
+    
+    def __init__(self, session_factory=None):
+        from database import SessionLocal, create_tables
+        
+        create_tables()
+        self.session_factory = session_factory or SessionLocal
+    
+    def register_complaint(self, name: str, mobile: str, complaint_details: str) -> Dict:
+        import services
+        
+        try:
+            with self.session_factory() as db:
+                grievance, is_duplicate = services.register_or_link_grievance(db, name, mobile, complaint_details)
+                return services.registration_payload(grievance, is_duplicate)
+        except Exception as e:
+            return {"error": f"Database call failed: {str(e)}"}
+    
+    def warm_up(self) -> None:
+        """Open a pooled connection and load the duplicate detector before the first registration"""
+        from sqlalchemy import text
+        from duplicates import get_duplicate_detector
+        
+        with self.session_factory() as db:
+            db.execute(text("SELECT 1"))
+        get_duplicate_detector()
+    
+    def get_complaint_status(self, mobile: str = None, complaint_id: int = None) -> Dict:
+        import services
+        
+        try:
+            with self.session_factory() as db:
+                if complaint_id:
+                    grievance = services.get_grievance(db, complaint_id)
+                elif mobile:
+                    grievance = services.get_latest_grievance_by_mobile(db, mobile)
+                else:
+                    return {"error": "Either mobile number or complaint ID is required"}
+                
+                if grievance:
+                    return services.status_payload(grievance)
+                else:
+                    return {"error": "Complaint not found"}
+        except Exception as e:
+            return {"error": f"Database call failed: {str(e)}"}
+
+def make_backend(kind: str = CHATBOT_BACKEND) -> ComplaintBackend:
+    """Build the complaint backend selected by CHATBOT_BACKEND ("http" or "inprocess")"""
+    if kind == "http":
+        return HTTPComplaintBackend()
+    if kind == "inprocess":
+        return InProcessComplaintBackend()
+    raise ValueError(f"Unknown chatbot backend: {kind}")
+
+class SimpleRAGChatbot:
+    def __init__(self, backend: Optional[ComplaintBackend] = None, sessions: Optional[SessionStore] = None,
+                 model=None):
+        if model is not None:
+            # Any object with generate_content(_async), e.g. the benchmark stand-in
+            self.model = model
+        else:
+            # Check API key
+            api_key = GEMINI_API_KEY or os.getenv("GEMINI_API_KEY", "")
+            if not api_key or api_key == "your_gemini_api_key_here":
+                raise ValueError("Gemini API key not found or not set properly.")
+            
+            # Configure Gemini (the SDK is imported here, not at module load)
+            configure_gemini(api_key)
+            # Responses are cached process-wide (and on disk) across chatbot instances; cache misses
+            # go through the shared rate-limited, retrying, circuit-broken client
+            self.model = CachedModel(get_resilient_model(GEMINI_MODEL), GEMINI_MODEL)
+        
+        # Retrieval over the ingested knowledge base (memory-mapped; see knowledge_base.py)
+        self.retriever = load_knowledge_index()
+        # Whether other messages get a generated answer (one Gemini call) or the canned reply
+        self.llm_answers = LLM_ANSWERS_ENABLED
+        
+        # Local classifier answers confident intents without a Gemini round trip
+        self.intent_classifier = IntentClassifier()
+        self.slot_extractor = SlotExtractor(self.model)
+        # Messages that do need Gemini at the same moment share one classification call
+        self.intent_batcher = MicroBatcher("intent", self._classify_batch)
+        
+        # HTTP to api.py, or the same service logic in-process
+        self.backend = backend or make_backend()
+        
+        # Conversation state, bounded and optionally shared across processes
+        self.sessions = sessions or make_session_store()
+        
+        # (time to first chunk, total time) of recent chat_stream turns, in seconds
+        self.stream_timings = deque(maxlen=STREAM_TIMING_WINDOW)
+    
+    def warm_up(self) -> Dict[str, float]:
+        """Pay one-off costs now rather than on the first turn: first inference through the
+        embedding model, the intent model and the backend's connection and duplicate index.
+        Returns the seconds each step took."""
+        steps = {
+            "retrieval": lambda: self.retriever.search("warm up"),
+            "intent": lambda: self.intent_classifier.predict("hello"),
+            "backend": getattr(self.backend, "warm_up", None),
+        }
+        timings = {}
+        for name, step in steps.items():
+            if step is None:
+                continue
+            start = time.perf_counter()
+            step()
+            timings[name] = time.perf_counter() - start
+        return timings
+    
+    @timed("retrieval")
+    def _get_relevant_context(self, query: str) -> str:
+        """Retrieve the most similar knowledge base passages by cosine similarity"""
+        hits = self.retriever.search(query, top_k=RETRIEVAL_TOP_K, min_score=RETRIEVAL_MIN_SCORE)
+        return " ".join(passage for _, passage, _ in hits)
     
+    @timed("intent")
+    def _classify_intent(self, user_message: str) -> str:
+        """Classify user intent locally, falling back to Gemini for low-confidence messages"""
+        intent = self.intent_classifier.classify(user_message)
+        if intent:
+            return intent
+        
+        try:
+            return self.intent_batcher.submit(user_message)
+        except Exception as e:
+            report_llm_failure("intent", e)
+            return self._fallback_intent(user_message)
+    
+    def _classify_batch(self, messages: List[str]) -> List:
+        """Classify messages in one Gemini call (a lone message uses the single-message prompt)"""
+        if len(messages) == 1:
+            response = self.model.generate_content(self._intent_prompt(messages[0]))
+            return [parse_intent(response.text)]
+        prompt = build_intent_batch_prompt(messages, self._get_relevant_contexts(messages))
+        return parse_intent_batch(self.model.generate_content(prompt).text, len(messages))
+    
+    def _fallback_intent(self, user_message: str) -> str:
+        """Without Gemini, take the local classifier's best guess even below its confidence threshold"""
+        intent, _ = self.intent_classifier.predict(user_message)
+        return intent or "unknown"
+    
+    def _fallback_answer(self, user_message: str) -> str:
+        """Without Gemini, answer with the retrieved knowledge base passages (deterministic)"""
+        context = self._get_relevant_context(user_message)
+        return context or BOT_RESPONSES["unknown"]
+    
+    @timed("retrieval")
+    def _get_relevant_contexts(self, queries: List[str]) -> List[str]:
+        """_get_relevant_context for several queries with one embedding call and matrix product"""
+        hits = self.retriever.search_batch(queries, top_k=RETRIEVAL_TOP_K, min_score=RETRIEVAL_MIN_SCORE)
+        return [" ".join(passage for _, passage, _ in row) for row in hits]
+    
+    def _intent_prompt(self, user_message: str) -> str:
+        """Build the Gemini intent classification prompt with retrieved context"""
+        context = self._get_relevant_context(user_message)
+        
+        return f"""
+        Analyze the following user message and classify the intent. Return only one of these intents:
+        - complaint_registration: User wants to register a new complaint
+        - status_inquiry: User wants to check complaint status
+        - greeting: User is greeting or asking general questions
+        - unknown: Intent is unclear
+        
+        Context: {context}
+        User message: "{user_message}"
+        
+        Intent:
+        """
+    
+    def _answer_prompt(self, user_message: str) -> str:
+        """Build the Gemini prompt for a free-form question, grounded in retrieved context"""
+        context = self._get_relevant_context(user_message)
+        
+        return f"""
+        You are a grievance management assistant. Answer the user's message briefly using the context.
+        If the message has nothing to do with the context, grievances or complaints, reply exactly with:
+        {BOT_RESPONSES["unknown"]}
+        
+        Context: {context}
+        User message: "{user_message}"
+        
+        Answer:
+        """
+    
+    @timed("answer")
+    def _generate_answer(self, user_message: str) -> str:
+        """Answer a message that isn't a registration or status request"""
+        try:
+            response = self.model.generate_content(self._answer_prompt(user_message))
+            return response.text.strip() or BOT_RESPONSES["unknown"]
+        except Exception as e:
+            report_llm_failure("answer", e)
+            return self._fallback_answer(user_message)
+    
+    def _generate_answer_stream(self, user_message: str) -> Iterator[str]:
+        """Streaming counterpart of _generate_answer: yields text chunks as Gemini produces them"""
+        produced = False
+        try:
+            response = self.model.generate_content(self._answer_prompt(user_message), stream=True)
+            for chunk in response:
+                text = chunk.text
+                if text:
+                    produced = True
+                    yield text
+        except Exception as e:
+            report_llm_failure("answer", e)
+            if not produced:
+                yield self._fallback_answer(user_message)
+                return
+        if not produced:
+            yield BOT_RESPONSES["unknown"]
+    
+    @timed("extraction")
+    def _extract_information(self, user_message: str, slots: List[str], expect: Optional[str] = None,
+                             need_all: bool = True) -> Dict:
+        """Extract slots with local extractors, then one structured Gemini call for the rest"""
+        return self.slot_extractor.extract(user_message, slots, expect=expect, need_all=need_all)
+    
+    @timed("api_register")
+    def _register_complaint_api(self, name: str, mobile: str, complaint_details: str) -> Dict:
+        """Register a complaint through the configured backend"""
+        return self.backend.register_complaint(name, mobile, complaint_details)
+    
+    @timed("api_status")
+    def _get_complaint_status_api(self, mobile: str = None, complaint_id: int = None) -> Dict:
+        """Look up complaint status through the configured backend"""
+        return self.backend.get_complaint_status(mobile=mobile, complaint_id=complaint_id)
+    
+    @timed("turn")
     def chat(self, user_message: str, session_id: str = "default") -> str:
         """Main chat function"""
-        # Initialize session state
-        if session_id not in self.conversation_state:
-            self.conversation_state[session_id] = {"step": "initial"}
+        session = self.sessions.get(session_id)
+        try:
+            return self._respond(user_message, session)
+        finally:
+            self.sessions.save(session)
+    
+    def chat_stream(self, user_message: str, session_id: str = "default") -> Iterator[str]:
+        """Like chat, but yields the reply in chunks as soon as they are available.
+        
+        Generated answers are streamed token by token from Gemini; templated replies
+        (registration prompts, status lookups) arrive as a single chunk.
+        """
+        started = time.perf_counter()
+        first_chunk = None
+        session = self.sessions.get(session_id)
+        try:
+            for chunk in self._respond_stream(user_message, session):
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - started
+                yield chunk
+        finally:
+            self.sessions.save(session)
+            if first_chunk is not None:
+                elapsed = time.perf_counter() - started
+                self.stream_timings.append((first_chunk, elapsed))
+                TTFT_SECONDS.observe(first_chunk)
+                STAGE_SECONDS.observe(elapsed, stage="turn")
+    
+    def _respond_stream(self, user_message: str, session: SessionRecord) -> Iterator[str]:
+        """Streaming counterpart of _respond"""
+        if session.registration is not None:
+            yield self._handle_complaint_registration(user_message, session)
+            return
         
+        intent = self._classify_intent(user_message)
+        if intent == "unknown" and self.llm_answers:
+            yield from self._generate_answer_stream(user_message)
+        else:
+            yield self._respond(user_message, session, intent)
+    
+    def batching_stats(self) -> Dict:
+        """Items per Gemini call for micro-batched intent classification and slot extraction"""
+        return {"intent": self.intent_batcher.stats(), "extraction": self.slot_extractor.batcher.stats()}
+    
+    def stream_stats(self) -> Dict:
+        """Time-to-first-chunk and total reply time of recent chat_stream turns, in milliseconds"""
+        timings = list(self.stream_timings)
+        first = [ttft for ttft, _ in timings]
+        total = [elapsed for _, elapsed in timings]
+        return {
+            "turns": len(timings),
+            "ttft_p50_ms": percentile(first, 0.50) * 1000,
+            "ttft_p95_ms": percentile(first, 0.95) * 1000,
+            "total_p50_ms": percentile(total, 0.50) * 1000,
+            "total_p95_ms": percentile(total, 0.95) * 1000,
+        }
+    
+    def _respond(self, user_message: str, session: SessionRecord, intent: Optional[str] = None) -> str:
+        """Produce the reply for one turn, updating the session record in place"""
         # Handle ongoing complaint registration
-        if session_id in self.pending_registrations:
-            return self._handle_complaint_registration(user_message, session_id)
+        if session.registration is not None:
+            return self._handle_complaint_registration(user_message, session)
         
         # Classify intent
-        intent = self._classify_intent(user_message)
+        if intent is None:
+            intent = self._classify_intent(user_message)
         
         if intent == "greeting":
             return BOT_RESPONSES["greeting"]
         
         elif intent == "complaint_registration":
-            # Start complaint registration process
-            self.pending_registrations[session_id] = {"step": "name"}
-            return "I'll help you register a complaint. Let me collect some information.\n\nFirst, could you please provide your full name?"
+            # Start complaint registration, keeping anything already given in this message
+            registration = self._extract_information(user_message, REGISTRATION_SLOTS)
+            session.registration = registration
+            if not registration:
+                registration["step"] = "name"
+                return REGISTRATION_START_PROMPT
+            return self._continue_registration(session)
         
         elif intent == "status_inquiry":
-            # Extract mobile number or complaint ID
-            mobile = self._extract_information(user_message, "mobile")
-            complaint_id_match = re.search(r'\b\d+\b', user_message)
-            complaint_id = int(complaint_id_match.group()) if complaint_id_match else None
+            # Extract mobile number or complaint ID in one pass
+            found = self._extract_information(user_message, ["complaint_id", "mobile"], need_all=False)
+            mobile = found.get("mobile")
+            complaint_id = found.get("complaint_id")
             
             if mobile or complaint_id:
                 result = self._get_complaint_status_api(mobile=mobile, complaint_id=complaint_id)
-                if "error" in result:
-                    return f"Sorry, I couldn't find your complaint. {result['error']}"
-                else:
-                    return f"""Here's your complaint status:
-                    
-**Complaint ID:** {result['complaint_id']}
-**Name:** {result['name']}
-**Mobile:** {result['mobile']}
-**Status:** {result['status']}
-**Complaint:** {result['complaint_details']}
-**Registered on:** {result['created_at']}"""
+                return format_status_result(result)
             else:
-                return "To check your complaint status, please provide your mobile number or complaint ID."
+                return STATUS_MISSING_PROMPT
+        
+        elif self.llm_answers:
+            return self._generate_answer(user_message)
         
         else:
             return BOT_RESPONSES["unknown"]
     
-    def _handle_complaint_registration(self, user_message: str, session_id: str) -> str:
+    def _is_complaint_description(self, user_message: str) -> bool:
+        """False when the reply to "describe your issue" is confidently a status request or a greeting"""
+        intent, confidence = self.intent_classifier.predict(user_message)
+        return not (intent in ("status_inquiry", "greeting") and confidence >= self.intent_classifier.threshold)
+    
+    def _handle_complaint_registration(self, user_message: str, session: SessionRecord) -> str:
         """Handle the complaint registration flow"""
-        registration = self.pending_registrations[session_id]
-        
-        if registration["step"] == "name":
-            name = self._extract_information(user_message, "name")
-            if name:
-                registration["name"] = name
-                registration["step"] = "mobile"
-                return f"Thank you, {name}! Now, please provide your mobile number."
-            else:
-                return "I couldn't extract your name. Please provide your full name clearly."
-        
-        elif registration["step"] == "mobile":
-            mobile = self._extract_information(user_message, "mobile")
-            if mobile and len(re.sub(r'\D', '', mobile)) >= 10:
-                registration["mobile"] = re.sub(r'\D', '', mobile)[-10:]  # Last 10 digits
-                registration["step"] = "complaint"
-                return "Got it! Now, please describe your complaint or issue in detail."
-            else:
-                return "Please provide a valid mobile number."
+        registration = session.registration
+        step = registration["step"]
+        if step == "complaint_details" and not self._is_complaint_description(user_message):
+            return DETAILS_REPROMPT
         
-        elif registration["step"] == "complaint":
-            complaint_details = self._extract_information(user_message, "complaint_details") or user_message
-            registration["complaint_details"] = complaint_details
-            
-            # Register the complaint
-            result = self._register_complaint_api(
-                name=registration["name"],
-                mobile=registration["mobile"],
-                complaint_details=complaint_details
-            )
-            
-            # Clean up
-            del self.pending_registrations[session_id]
-            
-            if "error" in result:
-                return f"Sorry, there was an error registering your complaint: {result['error']}"
-            else:
-                return f"""✅ **Complaint Registered Successfully!**
+        missing = [slot for slot in REGISTRATION_SLOTS if slot not in registration]
+        registration.update(self._extract_information(user_message, missing, expect=step))
+        
+        return self._registration_retry_prompt(registration, step, user_message) or self._continue_registration(session)
+    
+    def _registration_retry_prompt(self, registration: Dict, step: str, user_message: str) -> Optional[str]:
+        """Re-ask when the reply didn't contain the slot we asked for"""
+        if step == "name" and "name" not in registration:
+            return "I couldn't extract your name. Please provide your full name clearly."
+        elif step == "mobile" and "mobile" not in registration:
+            return "Please provide a valid mobile number."
+        elif step == "complaint_details" and "complaint_details" not in registration:
+            registration["complaint_details"] = user_message
+        return None
+    
+    def _next_registration_prompt(self, registration: Dict) -> Optional[str]:
+        """Ask for the next missing slot, or return None once everything is collected"""
+        if "name" not in registration:
+            registration["step"] = "name"
+            return "Thank you! Could you please provide your full name?"
+        
+        if "mobile" not in registration:
+            registration["step"] = "mobile"
+            return f"Thank you, {registration['name']}! Now, please provide your mobile number."
+        
+        if "complaint_details" not in registration:
+            registration["step"] = "complaint_details"
+            return "Got it! Now, please describe your complaint or issue in detail."
+        
+        return None
+    
+    def _continue_registration(self, session: SessionRecord) -> str:
+        """Ask for the next missing slot, or register once everything is collected"""
+        registration = session.registration
+        prompt = self._next_registration_prompt(registration)
+        if prompt:
+            return prompt
+        
+        # Register the complaint
+        result = self._register_complaint_api(
+            name=registration["name"],
+            mobile=registration["mobile"],
+            complaint_details=registration["complaint_details"]
+        )
+        
+        # Clean up
+        session.registration = None
+        
+        return format_registration_result(result, registration)
 
-**Complaint ID:** {result['id']}
-**Name:** {registration['name']}
-**Mobile:** {registration['mobile']}
-**Issue:** {complaint_details}
+_shared_chatbot: Optional[SimpleRAGChatbot] = None
+_shared_chatbot_lock = threading.Lock()
 
-Please save your Complaint ID: **{result['id']}** for future reference. You can use it to check the status of your complaint anytime."""
-        
-        return "Something went wrong. Please start over." 
\ No newline at end of file
+def get_shared_chatbot() -> SimpleRAGChatbot:
+    """The chatbot shared by every user of this process (conversations are keyed by session_id),
+    built and warmed up on the first call"""
+    global _shared_chatbot
+    with _shared_chatbot_lock:
+        if _shared_chatbot is None:
+            chatbot = SimpleRAGChatbot()
+            chatbot.warm_up()
+            _shared_chatbot = chatbot
+        return _shared_chatbot
@@ -0,0 +1,210 @@
+import hashlib
+import re
+import threading
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import EMBEDDING_BACKEND, EMBEDDING_MODEL, HASHING_EMBEDDING_DIM
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+@lru_cache(maxsize=65536)
+def _hash_feature(feature: str) -> Tuple[int, float]:
+    """Map a feature to a stable (bucket, sign) pair; blake2b keeps it identical across processes"""
+    digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest, 1.0 if digest >> 63 else -1.0
+
+
+class HashingEmbedder:
+    """Deterministic feature-hashing embedder (unigrams + bigrams) that runs fully offline"""
+
+    def __init__(self, dim: int = HASHING_EMBEDDING_DIM):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        tokens = _TOKEN_RE.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts into an (n, dim) float32 matrix of L2-normalized rows"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest, sign = _hash_feature(feature)
+                matrix[row, digest % self.dim] += sign
+        return _normalize(matrix)
+
+
+class SentenceTransformerEmbedder:
+    """Embedder backed by a SentenceTransformers model (EMBEDDING_MODEL by default)"""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts into an (n, dim) float32 matrix of L2-normalized rows"""
+        vectors = self.model.encode(list(texts), convert_to_numpy=True, normalize_embeddings=True)
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def make_embedder(backend: str = EMBEDDING_BACKEND):
+    """Build the configured embedder, falling back to hashing when the model can't be loaded"""
+    if backend == "hashing":
+        return HashingEmbedder()
+    if backend == "sentence-transformers":
+        try:
+            return SentenceTransformerEmbedder()
+        except Exception as e:
+            print(f"Error loading embedding model {EMBEDDING_MODEL}, using hashing embedder: {e}")
+            return HashingEmbedder()
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+_shared_embedders = {}
+_shared_embedders_lock = threading.Lock()
+
+
+def shared_embedder(backend: str = EMBEDDING_BACKEND):
+    """One embedder per backend in this process: the knowledge base index and the duplicate
+    detector would otherwise each load their own copy of the model"""
+    with _shared_embedders_lock:
+        if backend not in _shared_embedders:
+            _shared_embedders[backend] = make_embedder(backend)
+        return _shared_embedders[backend]
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+class VectorIndex:
+    """In-memory cosine-similarity index over a contiguous matrix of normalized embeddings.
+
+    The matrix is stored dimension-major (dim x passages): a query batch that only uses some
+    dimensions, as hashed embeddings do, reads just those rows instead of the whole matrix.
+    Appends write into spare capacity, which doubles when full, so adding N passages one at a
+    time copies O(N) columns rather than O(N^2).
+    """
+
+    # Score through the used rows only while they are at most this fraction of all dimensions
+    sparse_fraction = 0.5
+
+    def __init__(self, embedder=None, batch_size: int = 256):
+        self.embedder = embedder or shared_embedder()
+        self.batch_size = batch_size
+        self.ids: List[str] = []
+        self.passages: List[str] = []
+        self._buffer = np.zeros((self.embedder.dim, 0), dtype=np.float32)
+        self._count = 0
+
+    @classmethod
+    def from_vectors(cls, vectors: np.ndarray, passages: Sequence[str], ids: Sequence[str],
+                     embedder=None) -> "VectorIndex":
+        """Index over already-normalized (passages x dim) embeddings.
+
+        When vectors.T is already a C-contiguous float32 matrix, e.g. the transposed view
+        KnowledgeStore.load returns over its dimension-major memmap, it is used as is and stays
+        mapped; any other layout or dtype is copied into memory once.
+        """
+        if not (len(vectors) == len(passages) == len(ids)):
+            raise ValueError("vectors, passages and ids must have the same length")
+        index = cls(embedder)
+        if vectors.shape[1:] != (index.embedder.dim,):
+            raise ValueError(f"expected {index.embedder.dim}-dim vectors, got shape {vectors.shape}")
+        columns = vectors.T
+        if columns.dtype != np.float32 or not columns.flags.c_contiguous:
+            columns = np.ascontiguousarray(columns, dtype=np.float32)
+        index._buffer = columns
+        index._count = len(ids)
+        index.ids = list(ids)
+        index.passages = list(passages)
+        return index
+
+    @property
+    def _columns(self) -> np.ndarray:
+        """The live (dim x passages) matrix, a view of the buffer (BLAS takes its row stride as is)"""
+        return self._buffer[:, :self._count]
+
+    def _append(self, block: np.ndarray, passages: Sequence[str], ids: Sequence[str]) -> None:
+        needed = self._count + block.shape[1]
+        if needed > self._buffer.shape[1]:
+            grown = np.empty((self._buffer.shape[0], max(needed, 2 * self._buffer.shape[1], 64)), dtype=np.float32)
+            grown[:, :self._count] = self._buffer[:, :self._count]
+            self._buffer = grown
+        self._buffer[:, self._count:needed] = block
+        # Ids before the count, so a concurrent search never sees a column without its passage
+        self.ids.extend(ids)
+        self.passages.extend(passages)
+        self._count = needed
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    def add(self, passages: Iterable[str], ids: Optional[Iterable[str]] = None) -> None:
+        """Embed passages in batches and append them to the matrix"""
+        passages = list(passages)
+        if not passages:
+            return
+        ids = list(ids) if ids is not None else [str(len(self.ids) + i) for i in range(len(passages))]
+        if len(ids) != len(passages):
+            raise ValueError("ids and passages must have the same length")
+
+        # Embed everything first so a failing batch leaves the index unchanged
+        blocks = [self.embedder.embed(passages[start:start + self.batch_size]).T
+                  for start in range(0, len(passages), self.batch_size)]
+        self._append(np.hstack(blocks), passages, ids)
+
+    def add_vectors(self, vectors: np.ndarray, passages: Sequence[str], ids: Sequence[str]) -> None:
+        """Append precomputed embeddings (normalized here) without re-embedding"""
+        if not (len(vectors) == len(passages) == len(ids)):
+            raise ValueError("vectors, passages and ids must have the same length")
+        self._append(_normalize(np.asarray(vectors)).T, passages, ids)
+
+    def search(self, query: str, top_k: int = 3, min_score: float = 0.0) -> List[Tuple[str, str, float]]:
+        """Return up to top_k (id, passage, score) tuples for a single query"""
+        return self.search_batch([query], top_k=top_k, min_score=min_score)[0]
+
+    def search_batch(self, queries: Sequence[str], top_k: int = 3,
+                     min_score: float = 0.0) -> List[List[Tuple[str, str, float]]]:
+        """Score all queries with one matrix product (over the dimensions they use) and select top_k
+        per query via argpartition"""
+        if not queries:
+            return []
+        if len(self) == 0 or top_k <= 0:
+            return [[] for _ in queries]
+
+        query_matrix = self.embedder.embed(queries)
+        columns = self._columns
+        used = np.flatnonzero(query_matrix.any(axis=0))
+        if len(used) <= self.sparse_fraction * len(columns):
+            # Unused dimensions contribute nothing to any score
+            scores = query_matrix[:, used] @ columns[used]
+        else:
+            scores = query_matrix @ columns
+        n = scores.shape[1]
+        k = min(top_k, n)
+        if k < n:
+            # The k largest end up in the last k positions; partitioning scores avoids a negated copy
+            candidates = np.argpartition(scores, n - k, axis=1)[:, n - k:]
+        else:
+            candidates = np.broadcast_to(np.arange(k), (len(queries), k))
+
+        results = []
+        for row, cols in enumerate(candidates):
+            row_scores = scores[row, cols]
+            order = np.argsort(-row_scores)
+            results.append([
+                (self.ids[cols[i]], self.passages[cols[i]], float(row_scores[i]))
+                for i in order
+                if row_scores[i] >= min_score
+            ])
+        return results
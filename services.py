@@ -0,0 +1,447 @@
+import asyncio
+import base64
+import csv
+import io
+import json
+import re
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, insert, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config import BULK_CHUNK_SIZE, EXPORT_BATCH_SIZE
+from database import ComplaintDailyCount, DuplicateReport, Grievance
+from status_cache import status_cache
+from write_queue import get_registration_writer
+
+if TYPE_CHECKING:
+    # numpy and the embedder load on the first registration, not at import
+    from duplicates import DuplicateDetector
+
+
+def register_grievance(db: Session, name: str, mobile: str, complaint_details: str) -> Grievance:
+    """Insert a new grievance and return it with its assigned ID.
+
+    With the group commit writer running (WRITE_QUEUE_ENABLED), the insert is queued and shares a
+    transaction with concurrent registrations; the grievance returned is then detached from db.
+    """
+    writer = get_registration_writer()
+    if writer is not None:
+        return writer.register(name, mobile, complaint_details)
+    db_grievance = Grievance(
+        name=name,
+        mobile=mobile,
+        complaint_details=complaint_details
+    )
+    db.add(db_grievance)
+    db.commit()
+    db.refresh(db_grievance)
+    # The mobile's "latest complaint" just changed
+    status_cache.invalidate(mobiles=[mobile])
+    return db_grievance
+
+
+def register_or_link_grievance(db: Session, name: str, mobile: str, complaint_details: str,
+                               detector: Optional["DuplicateDetector"] = None) -> Tuple[Grievance, bool]:
+    """Register a grievance, or link it to an open near-duplicate from the same mobile.
+
+    Returns (grievance, is_duplicate); for a duplicate the grievance is the existing one.
+    """
+    if detector is None:
+        from duplicates import get_duplicate_detector
+
+        detector = get_duplicate_detector()
+    if detector is None:
+        return register_grievance(db, name, mobile, complaint_details), False
+
+    vector = detector.embed(complaint_details)
+    match = detector.match(db.execute(detector.candidates_query(mobile)).all(), vector)
+    if match is not None:
+        complaint_id, similarity = match
+        db.add(DuplicateReport(grievance_id=complaint_id, complaint_details=complaint_details,
+                               similarity=similarity))
+        db.commit()
+        return db.get(Grievance, complaint_id), True
+
+    grievance = register_grievance(db, name, mobile, complaint_details)
+    detector.add(grievance.id, vector)
+    return grievance, False
+
+
+def get_grievance(db: Session, complaint_id: int) -> Optional[Grievance]:
+    """Look up a grievance by ID (read-only; statuses are advanced by status_worker)"""
+    return db.query(Grievance).filter(Grievance.id == complaint_id).first()
+
+
+def get_latest_grievance_by_mobile(db: Session, mobile: str) -> Optional[Grievance]:
+    """Look up the most recent grievance for a mobile number"""
+    return db.query(Grievance).filter(
+        Grievance.mobile == mobile
+    ).order_by(Grievance.created_at.desc()).first()
+
+
+def register_grievances_bulk(db: Session, items: Sequence[Dict],
+                             chunk_size: int = BULK_CHUNK_SIZE) -> List[Dict]:
+    """Insert grievances one transaction per chunk; returns per-item {"id"} or {"error"} in input order"""
+    results: List[Dict] = []
+    for start in range(0, len(items), chunk_size):
+        chunk = [
+            {"name": item["name"], "mobile": item["mobile"], "complaint_details": item["complaint_details"]}
+            for item in items[start:start + chunk_size]
+        ]
+        try:
+            # A single multi-row INSERT ... RETURNING per chunk
+            ids = db.scalars(
+                insert(Grievance).returning(Grievance.id, sort_by_parameter_order=True),
+                chunk,
+            ).all()
+            db.commit()
+            status_cache.invalidate(mobiles={row["mobile"] for row in chunk})
+            results.extend({"id": grievance_id} for grievance_id in ids)
+        except Exception as e:
+            db.rollback()
+            results.extend({"error": f"Failed to register complaint: {e}"} for _ in chunk)
+    return results
+
+
+def get_grievances_by_ids(db: Session, complaint_ids: Sequence[int],
+                          chunk_size: int = BULK_CHUNK_SIZE) -> Dict[int, Grievance]:
+    """Resolve many IDs with one IN query per chunk"""
+    found: Dict[int, Grievance] = {}
+    unique_ids = list(dict.fromkeys(complaint_ids))
+    for start in range(0, len(unique_ids), chunk_size):
+        chunk = unique_ids[start:start + chunk_size]
+        for grievance in db.scalars(select(Grievance).where(Grievance.id.in_(chunk))):
+            found[grievance.id] = grievance
+    return found
+
+
+def get_latest_grievances_by_mobiles(db: Session, mobiles: Sequence[str],
+                                     chunk_size: int = BULK_CHUNK_SIZE) -> Dict[str, Grievance]:
+    """Latest grievance per mobile, one windowed IN query per chunk"""
+    found: Dict[str, Grievance] = {}
+    unique_mobiles = list(dict.fromkeys(mobiles))
+    for start in range(0, len(unique_mobiles), chunk_size):
+        chunk = unique_mobiles[start:start + chunk_size]
+        ranked = select(
+            Grievance.id,
+            func.row_number().over(
+                partition_by=Grievance.mobile,
+                order_by=(Grievance.created_at.desc(), Grievance.id.desc()),
+            ).label("rank"),
+        ).where(Grievance.mobile.in_(chunk)).subquery()
+        latest = select(Grievance).join(ranked, Grievance.id == ranked.c.id).where(ranked.c.rank == 1)
+        for grievance in db.scalars(latest):
+            found[grievance.mobile] = grievance
+    return found
+
+
+async def register_grievance_async(db: AsyncSession, name: str, mobile: str,
+                                   complaint_details: str) -> Grievance:
+    """Async counterpart of register_grievance"""
+    writer = get_registration_writer()
+    if writer is not None:
+        return await writer.register_async(name, mobile, complaint_details)
+    db_grievance = Grievance(
+        name=name,
+        mobile=mobile,
+        complaint_details=complaint_details
+    )
+    db.add(db_grievance)
+    # The ID is assigned at flush and the session doesn't expire on commit, so no refresh round trip
+    await db.commit()
+    status_cache.invalidate(mobiles=[mobile])
+    return db_grievance
+
+
+async def register_or_link_grievance_async(db: AsyncSession, name: str, mobile: str, complaint_details: str,
+                                           detector: Optional["DuplicateDetector"] = None) -> Tuple[Grievance, bool]:
+    """Async counterpart of register_or_link_grievance; embedding and matching run off the event loop"""
+    if detector is None:
+        from duplicates import get_duplicate_detector
+
+        detector = get_duplicate_detector()
+    if detector is None:
+        return await register_grievance_async(db, name, mobile, complaint_details), False
+
+    loop = asyncio.get_running_loop()
+    candidates = (await db.execute(detector.candidates_query(mobile))).all()
+    vector = await loop.run_in_executor(None, detector.embed, complaint_details)
+    match = await loop.run_in_executor(None, detector.match, candidates, vector)
+    if match is not None:
+        complaint_id, similarity = match
+        db.add(DuplicateReport(grievance_id=complaint_id, complaint_details=complaint_details,
+                               similarity=similarity))
+        await db.commit()
+        return await db.get(Grievance, complaint_id), True
+
+    grievance = await register_grievance_async(db, name, mobile, complaint_details)
+    await loop.run_in_executor(None, detector.add, grievance.id, vector)
+    return grievance, False
+
+
+async def get_grievance_async(db: AsyncSession, complaint_id: int) -> Optional[Grievance]:
+    """Async counterpart of get_grievance"""
+    return await db.get(Grievance, complaint_id)
+
+
+async def get_latest_grievance_by_mobile_async(db: AsyncSession, mobile: str) -> Optional[Grievance]:
+    """Async counterpart of get_latest_grievance_by_mobile"""
+    result = await db.scalars(
+        select(Grievance)
+        .where(Grievance.mobile == mobile)
+        .order_by(Grievance.created_at.desc())
+        .limit(1)
+    )
+    return result.first()
+
+
+_SEARCH_TERM_RE = re.compile(r"\w+\*?", re.UNICODE)
+SEARCH_SNIPPET_TOKENS = 12
+
+
+def fts_query(query: str, match_any: bool = False) -> str:
+    """Turn free text into a safe FTS5 query: each word quoted (a trailing * keeps prefix matching)"""
+    terms = []
+    for term in _SEARCH_TERM_RE.findall(query):
+        word = term.rstrip("*")
+        terms.append(f'"{word}"*' if term.endswith("*") else f'"{word}"')
+    return (" OR " if match_any else " ").join(terms)
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Opaque keyset pagination token for the sort key of the last row on a page"""
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List:
+    """Inverse of encode_cursor; raises ValueError for tokens that weren't produced by it"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def _db_timestamp(value: datetime) -> str:
+    # Matches how SQLAlchemy stores DateTime in SQLite, so comparisons stay on the text column
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def search_grievances(db: Session, query: str, status: Optional[str] = None,
+                      created_from: Optional[datetime] = None, created_to: Optional[datetime] = None,
+                      order: str = "rank", match_any: bool = False, limit: int = 20,
+                      cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """Full-text search over complaint_details with keyset pagination.
+
+    order="rank" sorts by bm25 relevance, order="newest" by complaint ID descending (cheaper on
+    very common terms since no scoring is needed). Returns (rows, cursor for the next page or None).
+    """
+    match = fts_query(query, match_any)
+    if not match:
+        return [], None
+
+    params = {"match": match, "limit": limit + 1, "tokens": SEARCH_SNIPPET_TOKENS}
+    conditions = ["grievances_fts MATCH :match"]
+    if status:
+        conditions.append("g.status = :status")
+        params["status"] = status
+    if created_from:
+        conditions.append("g.created_at >= :created_from")
+        params["created_from"] = _db_timestamp(created_from)
+    if created_to:
+        conditions.append("g.created_at < :created_to")
+        params["created_to"] = _db_timestamp(created_to)
+
+    after = decode_cursor(cursor) if cursor else None
+    if order == "rank":
+        if after:
+            conditions.append("(grievances_fts.rank > :after_rank OR "
+                              "(grievances_fts.rank = :after_rank AND g.id > :after_id))")
+            params["after_rank"], params["after_id"] = float(after[0]), int(after[1])
+        order_by = "grievances_fts.rank, g.id"
+    elif order == "newest":
+        # Sorting and seeking on the FTS rowid lets FTS5 walk its doclist backwards and stop at LIMIT
+        if after:
+            conditions.append("grievances_fts.rowid < :after_id")
+            params["after_id"] = int(after[0])
+        order_by = "grievances_fts.rowid DESC"
+    else:
+        raise ValueError(f"Unknown search order: {order}")
+
+    rows = db.execute(text(f"""
+        SELECT g.id, g.name, g.mobile, g.status, g.created_at, grievances_fts.rank AS score,
+               snippet(grievances_fts, 0, '<mark>', '</mark>', '…', :tokens) AS snippet
+        FROM grievances_fts JOIN grievances AS g ON g.id = grievances_fts.rowid
+        WHERE {" AND ".join(conditions)}
+        ORDER BY {order_by}
+        LIMIT :limit
+    """), params).mappings().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last["score"], last["id"]] if order == "rank" else [last["id"]])
+    return [dict(row) for row in rows], next_cursor
+
+
+EXPORT_COLUMNS = ("complaint_id", "name", "mobile", "complaint_details", "status", "created_at")
+
+
+def _grievance_filters(mobile: Optional[str], status: Optional[str], created_from: Optional[datetime],
+                       created_to: Optional[datetime]) -> List:
+    conditions = []
+    if mobile:
+        conditions.append(Grievance.mobile == mobile)
+    if status:
+        conditions.append(Grievance.status == status)
+    if created_from:
+        conditions.append(Grievance.created_at >= created_from)
+    if created_to:
+        conditions.append(Grievance.created_at < created_to)
+    return conditions
+
+
+def list_grievances(db: Session, mobile: Optional[str] = None, status: Optional[str] = None,
+                    created_from: Optional[datetime] = None, created_to: Optional[datetime] = None,
+                    order: str = "newest", limit: int = 50,
+                    cursor: Optional[str] = None) -> Tuple[List[Grievance], Optional[str]]:
+    """One page of complaints ordered by (created_at, id), seeking past the cursor rather than OFFSET"""
+    conditions = _grievance_filters(mobile, status, created_from, created_to)
+    key = tuple_(Grievance.created_at, Grievance.id)
+    if cursor:
+        after = decode_cursor(cursor)
+        try:
+            after_key = tuple_(datetime.fromisoformat(after[0]), int(after[1]))
+        except (IndexError, TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+        conditions.append(key < after_key if order == "newest" else key > after_key)
+
+    if order == "newest":
+        order_by = (Grievance.created_at.desc(), Grievance.id.desc())
+    elif order == "oldest":
+        order_by = (Grievance.created_at, Grievance.id)
+    else:
+        raise ValueError(f"Unknown order: {order}")
+
+    grievances = db.scalars(select(Grievance).where(*conditions).order_by(*order_by).limit(limit + 1)).all()
+    next_cursor = None
+    if len(grievances) > limit:
+        grievances = grievances[:limit]
+        last = grievances[-1]
+        next_cursor = encode_cursor([last.created_at.isoformat(), last.id])
+    return grievances, next_cursor
+
+
+def export_grievances(session_factory, fmt: str = "ndjson", mobile: Optional[str] = None,
+                      status: Optional[str] = None, created_from: Optional[datetime] = None,
+                      created_to: Optional[datetime] = None, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """Stream matching complaints as NDJSON or CSV text chunks, oldest first.
+
+    Rows come from a server-side cursor in batches of batch_size (yield_per), and plain column
+    tuples skip the ORM identity map, so memory stays flat however many rows are exported.
+    """
+    if fmt not in ("ndjson", "csv"):
+        raise ValueError(f"Unknown export format: {fmt}")
+    statement = (
+        select(Grievance.id, Grievance.name, Grievance.mobile, Grievance.complaint_details,
+               Grievance.status, Grievance.created_at)
+        .where(*_grievance_filters(mobile, status, created_from, created_to))
+        .order_by(Grievance.created_at, Grievance.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        yield buffer.getvalue()
+
+    with session_factory() as db:
+        for rows in db.execute(statement).partitions():
+            if fmt == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(row[:5] + (row[5].strftime("%Y-%m-%d %H:%M:%S"),) for row in rows)
+                yield buffer.getvalue()
+            else:
+                yield "".join(
+                    json.dumps(dict(zip(EXPORT_COLUMNS, row[:5] + (row[5].strftime("%Y-%m-%d %H:%M:%S"),))))
+                    + "\n"
+                    for row in rows
+                )
+
+
+def _daily_count_filters(date_from: Optional[date], date_to: Optional[date]) -> List:
+    # Zero rows are left behind when a day's last complaint in a status moves on
+    conditions = [ComplaintDailyCount.count != 0]
+    if date_from:
+        conditions.append(ComplaintDailyCount.day >= date_from)
+    if date_to:
+        conditions.append(ComplaintDailyCount.day <= date_to)
+    return conditions
+
+
+def daily_counts(db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None,
+                 status: Optional[str] = None) -> List[Dict]:
+    """Complaints per creation day (inclusive range), by current status, from the rollup table"""
+    conditions = _daily_count_filters(date_from, date_to)
+    if status:
+        conditions.append(ComplaintDailyCount.status == status)
+    rows = db.execute(
+        select(ComplaintDailyCount.day, ComplaintDailyCount.status, ComplaintDailyCount.count)
+        .where(*conditions)
+        .order_by(ComplaintDailyCount.day, ComplaintDailyCount.status)
+    ).all()
+
+    days: Dict[date, Dict] = {}
+    for day, row_status, count in rows:
+        entry = days.setdefault(day, {"day": day.isoformat(), "total": 0, "by_status": {}})
+        entry["by_status"][row_status] = count
+        entry["total"] += count
+    return list(days.values())
+
+
+def status_totals(db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None) -> Dict:
+    """Complaints created in the (inclusive) date range, by current status"""
+    rows = db.execute(
+        select(ComplaintDailyCount.status, func.sum(ComplaintDailyCount.count))
+        .where(*_daily_count_filters(date_from, date_to))
+        .group_by(ComplaintDailyCount.status)
+        .order_by(ComplaintDailyCount.status)
+    ).all()
+    by_status = {row_status: int(count) for row_status, count in rows if count}
+    return {"total": sum(by_status.values()), "by_status": by_status}
+
+
+def registration_message(complaint_id: int) -> str:
+    return f"Complaint registered successfully with ID: {complaint_id}"
+
+
+def duplicate_message(complaint_id: int) -> str:
+    return (f"This matches your open complaint {complaint_id}, so we've added it to that complaint "
+            f"instead of opening a new one")
+
+
+def registration_payload(grievance: Grievance, is_duplicate: bool) -> Dict:
+    """Body of a registration response: the ticket to track, and whether it already existed"""
+    message = duplicate_message(grievance.id) if is_duplicate else registration_message(grievance.id)
+    return {"id": grievance.id, "message": message, "duplicate": is_duplicate}
+
+
+def status_payload(grievance: Grievance) -> Dict:
+    """Serialize a grievance the way the status endpoints return it"""
+    return {
+        "complaint_id": grievance.id,
+        "name": grievance.name,
+        "mobile": grievance.mobile,
+        "complaint_details": grievance.complaint_details,
+        "status": grievance.status,
+        "created_at": grievance.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+    }
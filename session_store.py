@@ -0,0 +1,200 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from config import (
+    SESSION_STORE,
+    SESSION_TTL,
+    SESSION_MAX_SESSIONS,
+    SESSION_MAX_BYTES,
+    SESSION_DB_PATH,
+)
+
+
+class SessionRecord:
+    """Conversation state for one chat session"""
+
+    __slots__ = ("session_id", "registration", "last_seen")
+
+    def __init__(self, session_id: str, registration: Optional[Dict] = None, last_seen: float = 0.0):
+        self.session_id = session_id
+        # Slots collected so far plus "step" while a complaint registration is in progress
+        self.registration = registration
+        self.last_seen = last_seen or time.time()
+
+    def approximate_size(self) -> int:
+        """Rough byte cost used for the memory cap"""
+        size = 120 + len(self.session_id)
+        if self.registration:
+            size += sum(len(str(key)) + len(str(value)) + 100 for key, value in self.registration.items())
+        return size
+
+
+class SessionStore:
+    """Where the chatbot keeps per-session state; get() always returns a record"""
+
+    def get(self, session_id: str) -> SessionRecord:
+        raise NotImplementedError
+
+    def save(self, record: SessionRecord) -> None:
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store with LRU + TTL eviction under a session-count and memory cap"""
+
+    def __init__(self, ttl: float = SESSION_TTL, max_sessions: int = SESSION_MAX_SESSIONS,
+                 max_bytes: int = SESSION_MAX_BYTES):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.expired = 0
+        self.evicted = 0
+        self._records: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> SessionRecord:
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            record = self._records.get(session_id)
+            if record is None:
+                return SessionRecord(session_id, last_seen=now)
+            record.last_seen = now
+            self._records.move_to_end(session_id)
+            return record
+
+    def save(self, record: SessionRecord) -> None:
+        record.last_seen = time.time()
+        size = record.approximate_size()
+        with self._lock:
+            self._bytes += size - self._sizes.get(record.session_id, 0)
+            self._sizes[record.session_id] = size
+            self._records[record.session_id] = record
+            self._records.move_to_end(record.session_id)
+            while self._records and (len(self._records) > self.max_sessions or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._records)))
+                self.evicted += 1
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            if session_id in self._records:
+                self._remove(session_id)
+
+    def _expire(self, now: float) -> None:
+        # Records are ordered by last access, so expired ones are all at the front
+        cutoff = now - self.ttl
+        while self._records:
+            oldest = next(iter(self._records.values()))
+            if oldest.last_seen > cutoff:
+                break
+            self._remove(oldest.session_id)
+            self.expired += 1
+
+    def _remove(self, session_id: str) -> None:
+        del self._records[session_id]
+        self._bytes -= self._sizes.pop(session_id, 0)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._expire(time.time())
+            return {
+                "live_sessions": len(self._records),
+                "approximate_bytes": self._bytes,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """Store shared by every chatbot process on the host, with TTL expiry and a session cap"""
+
+    def __init__(self, path: str = SESSION_DB_PATH, ttl: float = SESSION_TTL,
+                 max_sessions: int = SESSION_MAX_SESSIONS, sweep_interval: float = 60.0):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        self.expired = 0
+        self.evicted = 0
+        self._next_sweep = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chat_sessions (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                last_seen REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_chat_sessions_last_seen ON chat_sessions (last_seen)")
+        self._conn.commit()
+
+    def get(self, session_id: str) -> SessionRecord:
+        now = time.time()
+        with self._lock:
+            self._maybe_sweep(now)
+            row = self._conn.execute(
+                "SELECT data FROM chat_sessions WHERE session_id = ? AND last_seen > ?",
+                (session_id, now - self.ttl),
+            ).fetchone()
+        if row is None:
+            return SessionRecord(session_id, last_seen=now)
+        return SessionRecord(session_id, registration=json.loads(row[0]).get("registration"), last_seen=now)
+
+    def save(self, record: SessionRecord) -> None:
+        record.last_seen = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions (session_id, data, last_seen) VALUES (?, ?, ?)",
+                (record.session_id, json.dumps({"registration": record.registration}), record.last_seen),
+            )
+            self._conn.commit()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def _maybe_sweep(self, now: float) -> None:
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval
+        self.expired += self._conn.execute(
+            "DELETE FROM chat_sessions WHERE last_seen <= ?", (now - self.ttl,)
+        ).rowcount
+        self.evicted += self._conn.execute(
+            """DELETE FROM chat_sessions WHERE session_id IN (
+                SELECT session_id FROM chat_sessions ORDER BY last_seen DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_sessions,),
+        ).rowcount
+        self._conn.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            live = self._conn.execute(
+                "SELECT COUNT(*) FROM chat_sessions WHERE last_seen > ?", (time.time() - self.ttl,)
+            ).fetchone()[0]
+        return {"live_sessions": live, "expired": self.expired, "evicted": self.evicted}
+
+
+def make_session_store(kind: str = SESSION_STORE) -> SessionStore:
+    """Build the store selected by SESSION_STORE ("memory" or "sqlite")"""
+    if kind == "memory":
+        return MemorySessionStore()
+    if kind == "sqlite":
+        return SQLiteSessionStore()
+    raise ValueError(f"Unknown session store: {kind}")
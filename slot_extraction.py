@@ -0,0 +1,279 @@
+import json
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from batching import MicroBatcher
+from config import LLM_BATCH_MAX_SIZE, LLM_BATCH_WINDOW
+from llm_client import report_llm_failure
+
+SLOT_DESCRIPTIONS = {
+    "name": "the person's full name",
+    "mobile": "the mobile/phone number",
+    "complaint_details": "a description of the complaint or issue",
+    "complaint_id": "a complaint/ticket ID number (not a phone number)",
+}
+
+# Runs of 10+ digits, optionally split by spaces/dashes and prefixed with a country code
+_PHONE_RE = re.compile(r"(?<!\d)\+?\d(?:[\s-]?\d){9,14}(?!\d)")
+# Keywords are whole words, so "did 3" or "paid 3" is not an ID
+_COMPLAINT_ID_RE = re.compile(
+    r"(?:\b(?:complaint|ticket|grievance|id)\b|#)\s*(?:\bid\b|\bno\b\.?|\bnumber\b)?\s*(?:is\b|:|#)?\s*(\d{1,9})\b",
+    re.IGNORECASE,
+)
+# A number with no keyword only counts as an ID in "status of 12" / "for 12", or on its own
+_BARE_NUMBER_RE = re.compile(r"(?:\b(?:of|for)\s+|^\s*)(\d{1,9})\b(?![\d-])", re.IGNORECASE)
+_NAME_RE = re.compile(
+    r"(?i:\bmy name is|\bname\s*[:\-]|\bi am|\bi'm|\bthis is)\s+"
+    r"([A-Z][a-zA-Z.'-]*(?:\s+[A-Z][a-zA-Z.'-]*){0,3})"
+)
+_BARE_NAME_RE = re.compile(r"^\s*([A-Za-z][A-Za-z.'-]*(?:\s+[A-Za-z][A-Za-z.'-]*){0,3})\s*[.!]?\s*$")
+# Words that mean a short reply is a sentence rather than a bare name
+_NOT_NAME_WORDS = frozenset(
+    "i me is am are was the a an it its not no to of for with and or my laptop "
+    "computer problem issue complaint status help please hello hi hey".split()
+)
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+# Label in front of a phone number ("my mobile number is"), dropped with the number
+_PHONE_LABEL_RE = re.compile(
+    r"\b(?:my\s+)?(?:(?:mobile|phone|contact|cell)(?:\s+(?:number|no\.?))?|number|no\.?)(?:\s+is)?\s*[:\-]?\s*$",
+    re.IGNORECASE,
+)
+_REGISTRATION_REQUEST_RE = re.compile(
+    r"\b(?:(?:i\s+(?:want|would\s+like|need)\s+to|please|can\s+you)\s+)?(?:register|file|lodge|raise|log)"
+    r"\s+(?:a\s+|my\s+)?(?:new\s+)?(?:complaint|grievance|ticket)\b",
+    re.IGNORECASE,
+)
+_SEPARATORS_RE = re.compile(r"(?:\s*[,;.:|]\s*)+")
+_DETAILS_EDGE_RE = re.compile(
+    r"^(?:[\s,;.:|!-]|\b(?:and|also|hi|hello|hey|for|about|regarding)\b)+|[\s,;:|-]+$", re.IGNORECASE
+)
+# Fewer words than this left over means the message held no description
+DETAILS_MIN_WORDS = 3
+
+
+def normalize_mobile(value: Optional[str]) -> Optional[str]:
+    """Keep the last 10 digits of a phone number, or None if it has fewer than 10"""
+    if not value:
+        return None
+    digits = re.sub(r"\D", "", str(value))
+    return digits[-10:] if len(digits) >= 10 else None
+
+
+def extract_local(message: str, slots: Iterable[str], expect: Optional[str] = None) -> Dict:
+    """Fill slots with precompiled regex extractors; `expect` is the slot the bot just asked for"""
+    slots = set(slots)
+    found = {}
+
+    phone_match = _PHONE_RE.search(message)
+    if "mobile" in slots and phone_match:
+        found["mobile"] = normalize_mobile(phone_match.group())
+
+    if "complaint_id" in slots:
+        without_phone = _PHONE_RE.sub(" ", message)
+        id_match = _COMPLAINT_ID_RE.search(without_phone) or _BARE_NUMBER_RE.search(without_phone)
+        if id_match:
+            found["complaint_id"] = int(id_match.group(1))
+
+    name_match = None
+    if "name" in slots:
+        name_match = _NAME_RE.search(message)
+        if not name_match and expect == "name":
+            name_match = _BARE_NAME_RE.match(message)
+            if name_match and _NOT_NAME_WORDS.intersection(name_match.group(1).lower().split()):
+                name_match = None
+        if name_match:
+            name = name_match.group(1).strip()
+            found["name"] = name.title() if name.islower() else name
+
+    if "complaint_details" in slots and expect == "complaint_details" and message.strip():
+        # The bot just asked for the issue, so the whole reply is the description
+        found["complaint_details"] = message.strip()
+    elif "complaint_details" in slots and (phone_match or (found.get("name") and name_match.re is _NAME_RE)):
+        # Name or number stated alongside other text ("I'm Asha, 98765 43210, my screen flickers"):
+        # whatever else the message says is the issue. A bare-name reply is only a name.
+        spans = []
+        if phone_match:
+            label = _PHONE_LABEL_RE.search(message, 0, phone_match.start())
+            spans.append((label.start() if label else phone_match.start(), phone_match.end()))
+        if found.get("name"):
+            spans.append(name_match.span())
+        found["complaint_details"] = _remaining_details(message, spans)
+
+    return {slot: value for slot, value in found.items() if value}
+
+
+def _remaining_details(message: str, spans: List[Tuple[int, int]]) -> Optional[str]:
+    """The message minus the matched name/phone spans and any "register a complaint" request"""
+    pieces = []
+    start = 0
+    for span_start, span_end in sorted(spans):
+        pieces.append(message[start:span_start])
+        start = max(start, span_end)
+    pieces.append(message[start:])
+    rest = _REGISTRATION_REQUEST_RE.sub("|", "|".join(pieces))
+    rest = _DETAILS_EDGE_RE.sub("", _SEPARATORS_RE.sub(", ", rest)).strip()
+    if len(re.findall(r"[A-Za-z]+", rest)) < DETAILS_MIN_WORDS:
+        return None
+    return rest[0].upper() + rest[1:]
+
+
+def build_extraction_prompt(message: str, slots: Iterable[str]) -> str:
+    """One prompt that asks Gemini to fill every missing slot as a JSON object"""
+    schema = {
+        "type": "object",
+        "properties": {
+            slot: {"type": ["integer" if slot == "complaint_id" else "string", "null"],
+                   "description": SLOT_DESCRIPTIONS[slot]}
+            for slot in slots
+        },
+        "required": list(slots),
+    }
+    return f"""
+        Extract the following fields from the user message. Respond with only a JSON object
+        that matches this JSON schema, using null for any field that is not present:
+        {json.dumps(schema)}
+
+        User message: "{message}"
+        """
+
+
+def build_batch_extraction_prompt(items: List[Tuple[str, Tuple[str, ...]]]) -> str:
+    """One prompt filling the missing slots of several (message, slots) requests at once"""
+    fields = sorted({slot for _, slots in items for slot in slots})
+    descriptions = "\n".join(f"        - {slot}: {SLOT_DESCRIPTIONS[slot]}" for slot in fields)
+    messages = "\n".join(
+        f'        {number}. Fields: {", ".join(slots)}\n           User message: {json.dumps(message)}'
+        for number, (message, slots) in enumerate(items, start=1)
+    )
+    return f"""
+        Extract the listed fields from each numbered user message. Respond with only a JSON object
+        that maps each message number to an object of its fields, using null for any field that is
+        not present, for example {{"1": {{"name": null, "mobile": "9876543210"}}}}.
+        Fields:
+{descriptions}
+
+        Messages:
+{messages}
+        """
+
+
+def _parse_json_object(text: str) -> Optional[Dict]:
+    match = _JSON_OBJECT_RE.search(text or "")
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group())
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def parse_batch_extraction_response(text: str, items: List[Tuple[str, Tuple[str, ...]]]) -> List:
+    """Per-item slot dicts from a batch reply; an item the reply left out gets a ValueError"""
+    data = _parse_json_object(text)
+    if data is None:
+        error = ValueError("Batch extraction reply is not a JSON object")
+        return [error] * len(items)
+    results = []
+    for number, (_, slots) in enumerate(items, start=1):
+        values = data.get(str(number))
+        results.append(_slot_values(values, slots) if isinstance(values, dict)
+                       else ValueError(f"Batch extraction reply has no entry {number}"))
+    return results
+
+
+def parse_extraction_response(text: str, slots: Iterable[str]) -> Dict:
+    """Parse the model's JSON reply, ignoring code fences and missing/null fields"""
+    data = _parse_json_object(text)
+    return _slot_values(data, slots) if data is not None else {}
+
+
+def _slot_values(data: Dict, slots: Iterable[str]) -> Dict:
+    found = {}
+    for slot in slots:
+        value = data.get(slot)
+        if value is None or str(value).strip().lower() in ("", "none", "null"):
+            continue
+        if slot == "mobile":
+            value = normalize_mobile(value)
+        elif slot == "complaint_id":
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                value = None
+        else:
+            value = str(value).strip()
+        if value:
+            found[slot] = value
+    return found
+
+
+class SlotExtractor:
+    """Local extractors first, then a single structured Gemini call for whatever is still missing.
+
+    Concurrent extractions that need Gemini are micro-batched into one call.
+    """
+
+    def __init__(self, model, window: float = LLM_BATCH_WINDOW, max_batch: int = LLM_BATCH_MAX_SIZE):
+        self.model = model
+        self.batcher = MicroBatcher("extraction", self._extract_batch, self._extract_batch_async,
+                                    window=window, max_batch=max_batch)
+
+    def _extract_batch(self, items: List[Tuple[str, Tuple[str, ...]]]) -> List:
+        if len(items) == 1:
+            message, slots = items[0]
+            response = self.model.generate_content(build_extraction_prompt(message, slots))
+            return [parse_extraction_response(response.text, slots)]
+        response = self.model.generate_content(build_batch_extraction_prompt(items))
+        return parse_batch_extraction_response(response.text, items)
+
+    async def _extract_batch_async(self, items: List[Tuple[str, Tuple[str, ...]]]) -> List:
+        if len(items) == 1:
+            message, slots = items[0]
+            response = await self.model.generate_content_async(build_extraction_prompt(message, slots))
+            return [parse_extraction_response(response.text, slots)]
+        response = await self.model.generate_content_async(build_batch_extraction_prompt(items))
+        return parse_batch_extraction_response(response.text, items)
+
+    def extract(self, message: str, slots: Iterable[str], expect: Optional[str] = None,
+                need_all: bool = True) -> Dict:
+        """Return the slots found.
+
+        The LLM call is skipped when every slot was found locally, when the `expect`ed slot was
+        found locally, or (with need_all=False) when any slot was found locally.
+        """
+        found, missing = self._extract_local(message, slots, expect, need_all)
+        if not missing:
+            return found
+
+        try:
+            found.update(self.batcher.submit((message, tuple(missing))))
+        except Exception as e:
+            # What the local extractors found is the fallback
+            report_llm_failure("extraction", e)
+        return found
+
+    async def extract_async(self, message: str, slots: Iterable[str], expect: Optional[str] = None,
+                            need_all: bool = True) -> Dict:
+        """Async counterpart of extract using generate_content_async"""
+        found, missing = self._extract_local(message, slots, expect, need_all)
+        if not missing:
+            return found
+
+        try:
+            found.update(await self.batcher.submit_async((message, tuple(missing))))
+        except Exception as e:
+            # What the local extractors found is the fallback
+            report_llm_failure("extraction", e)
+        return found
+
+    @staticmethod
+    def _extract_local(message: str, slots: Iterable[str], expect: Optional[str],
+                       need_all: bool) -> Tuple[Dict, List[str]]:
+        """Return (found, slots still needing the LLM); the second list is empty when we can stop"""
+        slots = list(slots)
+        found = extract_local(message, slots, expect=expect)
+        missing = [slot for slot in slots if slot not in found]
+        if not missing or expect in found or (found and not need_all):
+            return found, []
+        return found, missing
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from config import STATUS_CACHE_MAX_ENTRIES, STATUS_CACHE_TTL
+
+
+def make_etag(payload: Dict) -> str:
+    digest = hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+    return f'"{digest[:16]}"'
+
+
+class StatusCache:
+    """Bounded LRU of status payloads keyed by ("id", complaint_id) or ("mobile", mobile).
+
+    Writers in this process invalidate entries directly; the TTL bounds staleness for
+    changes made by other processes sharing the database.
+    """
+
+    def __init__(self, max_entries: int = STATUS_CACHE_MAX_ENTRIES, ttl: float = STATUS_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.generation = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict, str]]" = OrderedDict()
+        self._keys_by_id: Dict[int, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Tuple[Dict, str]]:
+        """Return (payload, etag) or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, payload: Dict, generation: int) -> Tuple[Dict, str]:
+        """Store a payload read at `generation`; skipped if an invalidation happened since"""
+        etag = make_etag(payload)
+        with self._lock:
+            if generation != self.generation:
+                return payload, etag
+            self._entries[key] = (time.monotonic() + self.ttl, payload, etag)
+            self._entries.move_to_end(key)
+            self._keys_by_id.setdefault(payload["complaint_id"], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+        return payload, etag
+
+    def invalidate(self, complaint_ids: Iterable[int] = (), mobiles: Iterable[str] = ()) -> None:
+        """Drop every entry for these complaints (including mobile entries pointing at them)"""
+        with self._lock:
+            self.generation += 1
+            for complaint_id in complaint_ids:
+                for key in self._keys_by_id.pop(complaint_id, ()):
+                    if self._entries.pop(key, None) is not None:
+                        self.invalidations += 1
+            for mobile in mobiles:
+                if ("mobile", mobile) in self._entries:
+                    self._drop(("mobile", mobile))
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._keys_by_id.clear()
+
+    def _drop(self, key: Hashable) -> None:
+        _, payload, _ = self._entries.pop(key)
+        keys = self._keys_by_id.get(payload["complaint_id"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_id[payload["complaint_id"]]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+status_cache = StatusCache()
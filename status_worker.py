@@ -0,0 +1,102 @@
+import random
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from config import STATUS_WORKER_INTERVAL, STATUS_WORKER_BATCH_SIZE
+from database import SessionLocal, Grievance, StatusHistory
+from status_cache import status_cache
+
+# Simulated progression: which statuses a complaint may move to next
+STATUS_TRANSITIONS = {
+    "Registered": ["In Progress", "Under Review"],
+}
+
+
+def advance_statuses(db: Session, batch_size: int = STATUS_WORKER_BATCH_SIZE) -> Dict[int, str]:
+    """Advance up to batch_size of the oldest eligible complaints in one write transaction.
+
+    Returns {complaint_id: new_status} for the rows actually changed.
+    """
+    candidates = db.execute(
+        select(Grievance.id, Grievance.status)
+        .where(Grievance.status.in_(list(STATUS_TRANSITIONS)))
+        .order_by(Grievance.created_at)
+        .limit(batch_size)
+    ).all()
+    if not candidates:
+        return {}
+
+    # Group by (from, to) so each transition is one bulk UPDATE
+    groups: Dict[tuple, List[int]] = defaultdict(list)
+    for complaint_id, status in candidates:
+        groups[(status, random.choice(STATUS_TRANSITIONS[status]))].append(complaint_id)
+
+    changed: Dict[int, str] = {}
+    history = []
+    now = datetime.utcnow()
+    for (from_status, to_status), ids in groups.items():
+        # The status guard skips rows another writer changed since the SELECT
+        updated_ids = db.scalars(
+            update(Grievance)
+            .where(Grievance.id.in_(ids), Grievance.status == from_status)
+            .values(status=to_status)
+            .returning(Grievance.id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        for complaint_id in updated_ids:
+            changed[complaint_id] = to_status
+            history.append({
+                "grievance_id": complaint_id,
+                "from_status": from_status,
+                "to_status": to_status,
+                "changed_at": now,
+            })
+
+    if history:
+        db.execute(insert(StatusHistory), history)
+    db.commit()
+    status_cache.invalidate(complaint_ids=changed)
+    return changed
+
+
+class StatusProgressionWorker:
+    """Background thread that periodically advances complaint statuses in bulk"""
+
+    def __init__(self, interval: float = STATUS_WORKER_INTERVAL, batch_size: int = STATUS_WORKER_BATCH_SIZE,
+                 session_factory=SessionLocal):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.session_factory = session_factory
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="status-progression", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def run_once(self) -> Dict[int, str]:
+        with self.session_factory() as db:
+            return advance_statuses(db, self.batch_size)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                changed = self.run_once()
+                # Keep draining full batches before sleeping again
+                while len(changed) >= self.batch_size and not self._stop.is_set():
+                    changed = self.run_once()
+            except Exception as e:
+                print(f"Error advancing complaint statuses: {e}")
@@ -1,6 +1,6 @@
 import streamlit as st
-import time
-from rag_chatbot import SimpleRAGChatbot
+import uuid
+from rag_chatbot import get_shared_chatbot
 from config import GEMINI_API_KEY
 
 # Configure Streamlit page
@@ -109,8 +109,9 @@ def initialize_chatbot():
     """Initialize the chatbot with error handling"""
     if 'chatbot' not in st.session_state:
         try:
+            # One warmed-up chatbot per process; only the first browser session waits for it
             with st.spinner("🔄 Initializing RAG chatbot... This may take a moment."):
-                st.session_state.chatbot = SimpleRAGChatbot()
+                st.session_state.chatbot = get_shared_chatbot()
                 st.session_state.initialized = True
         except Exception as e:
             st.error(f"❌ Failed to initialize chatbot: {str(e)}")
@@ -118,20 +119,34 @@ def initialize_chatbot():
             return False
     return True
 
-def display_message(message, is_user=False):
-    """Display a chat message with proper styling"""
+def message_html(message, is_user=False):
+    """HTML for one chat bubble"""
     if is_user:
-        st.markdown(f"""
+        return f"""
         <div class="chat-message user-message">
             <strong>👤 You:</strong><br>{message}
         </div>
-        """, unsafe_allow_html=True)
-    else:
-        st.markdown(f"""
+        """
+    return f"""
         <div class="chat-message bot-message">
             <strong>🤖 Assistant:</strong><br>{message}
         </div>
-        """, unsafe_allow_html=True)
+        """
+
+def display_message(message, is_user=False):
+    """Display a chat message with proper styling"""
+    st.markdown(message_html(message, is_user), unsafe_allow_html=True)
+
+def stream_reply(user_input):
+    """Render the bot reply chunk by chunk as it streams in and return the full text"""
+    placeholder = st.empty()
+    placeholder.markdown(message_html("🤖 Thinking..."), unsafe_allow_html=True)
+    reply = ""
+    for chunk in st.session_state.chatbot.chat_stream(user_input, st.session_state.session_id):
+        reply += chunk
+        placeholder.markdown(message_html(reply + " ▌"), unsafe_allow_html=True)
+    placeholder.markdown(message_html(reply), unsafe_allow_html=True)
+    return reply
 
 def main():
     # Header
@@ -178,10 +193,20 @@ def main():
         
         st.markdown("---")
         
+        # Response latency
+        if 'chatbot' in st.session_state:
+            timings = st.session_state.chatbot.stream_stats()
+            if timings["turns"]:
+                st.caption(
+                    f"⏱️ Time to first token: {timings['ttft_p50_ms']:.0f} ms (p50), "
+                    f"{timings['ttft_p95_ms']:.0f} ms (p95) over {timings['turns']} replies"
+                )
+                st.markdown("---")
+        
         # Clear chat button
         if st.button("🗑️ Clear Chat History"):
             st.session_state.messages = []
-            st.session_state.session_id = f"session_{int(time.time())}"
+            st.session_state.session_id = f"session_{uuid.uuid4().hex}"
             st.rerun()
     
     # Check API configuration
@@ -200,7 +225,7 @@ def main():
         st.session_state.messages = []
     
     if 'session_id' not in st.session_state:
-        st.session_state.session_id = f"session_{int(time.time())}"
+        st.session_state.session_id = f"session_{uuid.uuid4().hex}"
     
     # Initialize chatbot
     if not initialize_chatbot():
@@ -257,22 +282,18 @@ def main():
                 # Add user message to history
                 st.session_state.messages.append({"role": "user", "content": user_input})
                 
-                # Get bot response
-                with st.spinner("🤖 Thinking..."):
-                    try:
-                        bot_response = st.session_state.chatbot.chat(
-                            user_input, 
-                            st.session_state.session_id
-                        )
-                        
-                        # Add bot response to history
-                        st.session_state.messages.append({"role": "bot", "content": bot_response})
-                        
-                        # Rerun to update the display
-                        st.rerun()
-                        
-                    except Exception as e:
-                        st.error(f"❌ Error: {str(e)}")
+                # Stream bot response as it is generated
+                try:
+                    bot_response = stream_reply(user_input)
+                    
+                    # Add bot response to history
+                    st.session_state.messages.append({"role": "bot", "content": bot_response})
+                    
+                    # Rerun to update the display
+                    st.rerun()
+                    
+                except Exception as e:
+                    st.error(f"❌ Error: {str(e)}")
             else:
                 st.warning("Please enter a message before sending.")
 
@@ -0,0 +1,230 @@
+"""Group commit for registrations: one writer thread, many inserts per transaction.
+
+Callers queue a row and wait on a future. The writer takes the first queued row, collects more
+for up to `max_latency` seconds (or until `max_batch`), inserts them all in one transaction and
+only then resolves each future with its row's ID, so an acknowledged registration is committed.
+If the batch fails, its rows are retried one per transaction and only the bad ones fail. A
+caller that cancels before the writer takes its row is skipped; once taken, the row is committed.
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from config import WRITE_QUEUE_ENABLED, WRITE_QUEUE_MAX_BATCH, WRITE_QUEUE_MAX_LATENCY, WRITE_QUEUE_SYNCHRONOUS
+from database import Grievance, engine
+from metrics import DB_WRITE_BATCH_SIZE
+from status_cache import status_cache
+
+# Queued after the last accepted row; the writer drains everything before it and exits
+_STOP = object()
+
+
+def _claim(item) -> bool:
+    """Mark a queued row's future as running; False if its caller cancelled before the writer got to it.
+
+    A claimed future can no longer be cancelled, so a row is only inserted if its caller will be told.
+    """
+    return item[1].set_running_or_notify_cancel()
+
+
+def _resolve(future: Future, value) -> None:
+    try:
+        if isinstance(value, BaseException):
+            future.set_exception(value)
+        else:
+            future.set_result(value)
+    except InvalidStateError:
+        # Already resolved; must not stop the remaining callers from getting their results
+        pass
+
+
+class GroupCommitWriter:
+    """Single-writer queue for grievance inserts; start() it before submitting"""
+
+    def __init__(self, max_latency: float = WRITE_QUEUE_MAX_LATENCY, max_batch: int = WRITE_QUEUE_MAX_BATCH,
+                 bind=engine, synchronous: str = WRITE_QUEUE_SYNCHRONOUS):
+        self.max_latency = max_latency
+        self.max_batch = max_batch
+        self.bind = bind
+        self.synchronous = synchronous
+        self.batches = 0
+        self.rows = 0
+        self.failed = 0
+        self.largest_batch = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._accepting = False
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._accepting
+
+    def start(self) -> None:
+        with self._lock:
+            if self._accepting:
+                return
+            self._accepting = True
+            self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop accepting rows, commit everything already queued, then stop the thread"""
+        with self._lock:
+            if not self._accepting:
+                return
+            self._accepting = False
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def submit(self, row: Dict) -> Future:
+        """Queue one grievance row; the future resolves to its ID once committed"""
+        future: Future = Future()
+        with self._lock:
+            # Checked under the lock so no row is queued behind the stop marker
+            if not self._accepting:
+                raise RuntimeError("Group commit writer is not running")
+            self._queue.put((row, future))
+        return future
+
+    def register(self, name: str, mobile: str, complaint_details: str) -> Grievance:
+        """Insert through the queue and return the committed grievance (detached)"""
+        row = self._row(name, mobile, complaint_details)
+        return Grievance(id=self.submit(row).result(), **row)
+
+    async def register_async(self, name: str, mobile: str, complaint_details: str) -> Grievance:
+        """Async counterpart of register; waits on the event loop instead of blocking a thread"""
+        row = self._row(name, mobile, complaint_details)
+        return Grievance(id=await asyncio.wrap_future(self.submit(row)), **row)
+
+    @staticmethod
+    def _row(name: str, mobile: str, complaint_details: str) -> Dict:
+        # Set here rather than by column defaults so the returned grievance is complete
+        return {"name": name, "mobile": mobile, "complaint_details": complaint_details,
+                "status": "Registered", "created_at": datetime.utcnow()}
+
+    def _collect(self, first) -> Tuple[List, bool]:
+        """The batch starting at `first` (already claimed), and whether the stop marker was reached"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch:
+            try:
+                # Take what is already queued at once; then wait out the rest of the window
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is _STOP:
+                return batch, True
+            if _claim(item):
+                batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        try:
+            with self.bind.connect() as conn:
+                try:
+                    # Per connection: only the writer pays for a full fsync on every commit
+                    conn.exec_driver_sql(f"PRAGMA synchronous={self.synchronous}")
+                    conn.commit()
+                    self._drain(conn)
+                finally:
+                    # Close the connection instead of returning it to the pool with the writer's pragma
+                    conn.invalidate()
+        except Exception as e:
+            print(f"Group commit writer failed: {e}")
+            self._fail_queued(e)
+
+    def _drain(self, conn) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            if not _claim(first):
+                continue
+            batch, stopping = self._collect(first)
+            try:
+                self._commit(conn, batch)
+            except Exception as e:
+                # Never leave a caller waiting forever; rows already resolved keep their result
+                for _, future in batch:
+                    if not future.done():
+                        _resolve(future, e)
+
+    def _fail_queued(self, error: Exception) -> None:
+        """Writer is gone: refuse new rows and fail the waiting ones (none of them were committed)"""
+        with self._lock:
+            self._accepting = False
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP and _claim(item):
+                _resolve(item[1], error)
+
+    def _commit(self, conn, batch: List) -> None:
+        rows = [row for row, _ in batch]
+        statement = insert(Grievance).returning(Grievance.id, sort_by_parameter_order=True)
+        try:
+            # One multi-row INSERT ... RETURNING and one commit (one fsync) for the whole batch
+            ids = conn.execute(statement, rows).scalars().all()
+            conn.commit()
+            results = list(zip(batch, ids))
+        except Exception:
+            conn.rollback()
+            results = []
+            for item in batch:
+                try:
+                    complaint_id = conn.execute(statement, [item[0]]).scalar_one()
+                    conn.commit()
+                    results.append((item, complaint_id))
+                except Exception as e:
+                    conn.rollback()
+                    results.append((item, e))
+
+        committed = [(row, value) for (row, _), value in results if not isinstance(value, Exception)]
+        if committed:
+            status_cache.invalidate(mobiles={row["mobile"] for row, _ in committed})
+        with self._lock:
+            self.batches += 1
+            self.rows += len(committed)
+            self.failed += len(batch) - len(committed)
+            self.largest_batch = max(self.largest_batch, len(batch))
+        DB_WRITE_BATCH_SIZE.observe(len(batch))
+        for (_, future), value in results:
+            _resolve(future, value)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "running": self._accepting,
+                "queued": self._queue.qsize(),
+                "batches": self.batches,
+                "rows": self.rows,
+                "failed": self.failed,
+                "rows_per_batch": self.rows / self.batches if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+            }
+
+
+registration_writer = GroupCommitWriter()
+
+
+def get_registration_writer() -> Optional[GroupCommitWriter]:
+    """The running writer when WRITE_QUEUE_ENABLED (started by the API lifespan), else None"""
+    if WRITE_QUEUE_ENABLED and registration_writer.running:
+        return registration_writer
+    return None